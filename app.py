@@ -1,11 +1,26 @@
 import os
-from flask import Flask, request, jsonify
+import time
+import atexit
+import json
+import threading
+from contextlib import ExitStack
+from flask import Flask, Response, request, jsonify, g, abort, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 
 from config import Config
-from utils import setup_logger, allowed_file, validate_file_size, sanitize_filename
-from services import ImageProcessor, MediaPipeAnalyzer, ColorAnalyzer, GeminiService
+from utils import (
+    setup_logger, allowed_file, validate_file_size, validate_image_header, parse_lookbook_variants,
+    parse_catalog_query, sanitize_filename,
+    metrics, WorkerStats
+)
+from services import (
+    ImageProcessor, ColorAnalyzer, GeminiService, SkinMaskEngine, AnalysisStore,
+    NearDuplicateIndex, VisionPipeline, AdmissionController, AnalyzerPool, PoolTimeoutError,
+    ExecutorLane, LaneFullError, MemoryBudget, MemoryBudgetError, create_persistence, build_record,
+    create_shared_cache, PaletteEngine, load_catalog_index
+)
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='static', static_url_path='/static')
@@ -18,11 +33,194 @@ CORS(app)
 # Setup logger
 logger = setup_logger(__name__)
 
-# Initialize services
+# Fork-safe services (plain Python/NumPy state, shared copy-on-write)
 image_processor = ImageProcessor()
-mediapipe_analyzer = MediaPipeAnalyzer()
 color_analyzer = ColorAnalyzer()
-gemini_service = GeminiService()
+
+# Seasonal palettes, and the product catalog's color index (memory-mapped,
+# so workers share its pages); None until build_catalog_index.py has run
+palette_engine = PaletteEngine()
+catalog_index = load_catalog_index()
+
+# Pick a quality tier per request based on load
+admission_controller = AdmissionController()
+
+# Gemini calls of this process; requests wait on Gemini holding one of these,
+# not an admission slot, which only covers the CV work
+llm_slots = threading.BoundedSemaphore(Config.LLM_MAX_IN_FLIGHT)
+
+# Working-set budget shared by this process's concurrent analyses
+memory_budget = MemoryBudget()
+
+# Perceptual-hash index of analyzed images, so near-identical re-uploads skip the CV stages
+duplicate_index = NearDuplicateIndex() if Config.NEAR_DUPLICATE_ENABLED else None
+
+# Per-process services, built by init_services() after fork: MediaPipe graphs
+# own threads and the Gemini client owns sockets, neither survives a fork
+gemini_service = None
+analyzer_pool = None
+vision_pipeline = None
+persistence = None
+vision_lane = None
+analysis_store = None
+_services_lock = threading.Lock()
+
+# Request rate and RSS of this process, published for /metrics
+worker_stats = WorkerStats(Config.WORKER_STATS_DIR)
+
+
+def preload_shared_assets():
+    """
+    Load read-only assets in the server master before it forks
+
+    Workers then share these pages copy-on-write instead of each building
+    their own copy.
+    """
+    SkinMaskEngine.preload()
+
+
+def init_services():
+    """
+    Build the per-process services (MediaPipe graphs, Gemini client)
+
+    Safe to call more than once; only the first call in a process builds.
+    """
+    global gemini_service, analyzer_pool, vision_pipeline, persistence, vision_lane, analysis_store
+    
+    with _services_lock:
+        if vision_pipeline is not None:
+            return
+        
+        worker_stats.reset()
+        
+        # Analyses and Gemini outputs computed once per host, not per worker
+        shared_cache = create_shared_cache()
+        gemini_service = GeminiService(shared_cache)
+        
+        # Recent analyses, so personalization changes skip the upload and CV
+        # stages; kept in the shared cache so any worker can resolve an ID
+        analysis_store = AnalysisStore(shared_cache=shared_cache)
+        
+        # One exclusive MediaPipe analyzer per in-flight analysis (threaded servers)
+        analyzer_pool = AnalyzerPool()
+        atexit.register(analyzer_pool.close)
+        
+        # Analysis history, written behind the request by a background thread
+        persistence = create_persistence()
+        if persistence is not None:
+            atexit.register(persistence.close)
+        
+        # Near-duplicate index saved by the previous run
+        if duplicate_index is not None:
+            duplicate_index.load()
+            atexit.register(duplicate_index.save)
+        
+        # Threads reserved for vision-only requests
+        vision_lane = ExecutorLane('vision', Config.VISION_LANE_WORKERS, Config.VISION_LANE_MAX_QUEUE)
+        atexit.register(vision_lane.close)
+        
+        vision_pipeline = VisionPipeline(
+            image_processor,
+            color_analyzer=color_analyzer,
+            stage_observer=admission_controller.record_stage,
+            analyzer_pool=analyzer_pool,
+            memory_budget=memory_budget,
+            duplicate_index=duplicate_index,
+            shared_cache=shared_cache
+        )
+        logger.info(f"Services initialized in process {os.getpid()}")
+
+
+@app.before_request
+def start_request():
+    """Reject oversized bodies, make sure services exist and start the request clocks"""
+    # Refuse before Werkzeug buffers the body. Bodies without a Content-Length
+    # (chunked) are cut off by the form parser instead; its 413, like any
+    # HTTPException, is re-raised past the routes' generic error handling
+    if request.content_length is not None and request.content_length > Config.MAX_CONTENT_LENGTH:
+        abort(413)
+    
+    if vision_pipeline is None:
+        init_services()
+    
+    g.request_start = time.perf_counter()
+    g.request_cpu_start = time.thread_time()
+
+
+@app.after_request
+def finish_request(response):
+    """Record request wall/CPU time and count the request"""
+    if 'request_start' in g:
+        metrics.observe('request.wall_ms', (time.perf_counter() - g.request_start) * 1000.0)
+        metrics.observe('request.cpu_ms', (time.thread_time() - g.request_cpu_start) * 1000.0)
+    worker_stats.record_request()
+    return response
+
+
+def persist_result(endpoint, response):
+    """Queue a successful result for the analysis history (never blocks)"""
+    if persistence is None:
+        return
+    
+    persistence.submit(build_record(
+        endpoint,
+        response['analysis'],
+        recommendations=response.get('recommendations'),
+        personalization=response.get('personalization'),
+        dress_prompts=response.get('dress_prompts'),
+        quality_tier=response.get('quality_tier')
+    ))
+
+
+def dress_stream(head, designs):
+    """
+    NDJSON stream for /generate-dress-prompts?stream=1
+    
+    Sends the analysis and recommendations first, then one line per dress
+    design as its Gemini call finishes, then the assembled dress_prompts.
+    
+    Args:
+        head: Response dict without dress_prompts
+        designs: Iterator of (index, design) from GeminiService.iter_dress_designs
+    
+    Returns:
+        Response: Streamed application/x-ndjson response
+    """
+    def generate():
+        yield json.dumps({'type': 'analysis', **head}) + '\n'
+        
+        collected = {}
+        for index, design in designs:
+            collected[index] = design
+            yield json.dumps({'type': 'design', 'index': index, 'design': design}) + '\n'
+        
+        response = dict(head, dress_prompts={'dress_designs': [collected[i] for i in sorted(collected)]})
+        persist_result('/generate-dress-prompts', response)
+        yield json.dumps({'type': 'done', 'dress_prompts': response['dress_prompts'], 'status': 'success'}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def busy_response(filepath, error=None):
+    """
+    503 response for requests that could not get an analyzer, lane slot or memory in time
+    
+    Args:
+        filepath: Upload to remove (or None)
+        error: The capacity error, which picks the message
+    """
+    if filepath and os.path.exists(filepath):
+        os.remove(filepath)
+    
+    if isinstance(error, MemoryBudgetError):
+        message = 'Not enough memory free to analyze this image, please retry shortly'
+    else:
+        message = 'All analyzers are busy, please retry shortly'
+    
+    return jsonify({
+        'error': 'Service busy',
+        'message': message
+    }), 503
 
 
 @app.route('/', methods=['GET'])
@@ -41,6 +239,36 @@ def health_check():
     }), 200
 
 
+@app.route('/capabilities', methods=['GET'])
+def get_capabilities():
+    """
+    Upload contract for clients
+    
+    Clients downscale and re-encode photos to this size/format before
+    uploading, which the server then analyzes without resizing.
+    """
+    return jsonify({
+        'image': {
+            'max_width': Config.IMAGE_MAX_WIDTH,
+            'max_height': Config.IMAGE_MAX_HEIGHT,
+            'format': Config.CLIENT_IMAGE_FORMAT,
+            'quality': Config.CLIENT_IMAGE_QUALITY,
+            'max_file_size': Config.MAX_FILE_SIZE,
+            'allowed_extensions': sorted(Config.ALLOWED_EXTENSIONS)
+        }
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose process metrics (stage latencies, admission state)"""
+    snapshot = metrics.snapshot()
+    snapshot['quality_tier'] = admission_controller.current_tier['name']
+    snapshot['worker'] = worker_stats.local()
+    snapshot['workers'] = worker_stats.collect()
+    return jsonify(snapshot), 200
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze_fashion():
     """
@@ -69,6 +297,11 @@ def analyze_fashion():
         if not validate_file_size(file):
             return jsonify({'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'}), 400
         
+        # Check format and pixel dimensions from the header, before any decode
+        header, header_error = validate_image_header(file)
+        if header_error:
+            return jsonify({'error': header_error}), 400
+        
         # Save file temporarily
         filename = sanitize_filename(file.filename)
         filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
@@ -76,40 +309,44 @@ def analyze_fashion():
         
         logger.info(f"Processing image: {filename}")
         
-        # STEP 1: Load and preprocess image
-        image = image_processor.load_image(filepath)
-        rgb_image = image_processor.preprocess_for_mediapipe(image)
-        
-        # STEP 2: MediaPipe Analysis (Body & Face Shape)
-        mediapipe_results = mediapipe_analyzer.analyze(rgb_image)
-        
-        # STEP 3: Color Analysis (Skin Tone & Colors)
-        color_results = color_analyzer.analyze(rgb_image)
-        
-        # STEP 4: Combine analysis results
-        analysis_data = {
-            **mediapipe_results,
-            **color_results
-        }
-        
-        logger.info(f"Analysis complete: {analysis_data}")
+        with admission_controller.admit() as tier:
+            # STEP 1-4: Load, preprocess and analyze (body, face, colors)
+            analysis_data = vision_pipeline.analyze_file(filepath, tier, header)
+            analysis_id = analysis_store.put(analysis_data, tier['name'])
+            
+            logger.info(f"Analysis complete: {analysis_data}")
         
         # STEP 5: Generate AI recommendations using Gemini
-        recommendations = gemini_service.generate_recommendations(analysis_data)
+        with llm_slots, vision_pipeline.stage('llm'):
+            recommendations = gemini_service.generate_recommendations(
+                analysis_data,
+                llm_mode=tier['llm_mode']
+            )
         
         # Clean up uploaded file
         os.remove(filepath)
         
         # STEP 6: Return complete response
         response = {
+            'analysis_id': analysis_id,
             'analysis': analysis_data,
             'recommendations': recommendations,
+            'quality_tier': tier['name'],
             'status': 'success'
         }
         
+        persist_result('/analyze', response)
+        
         logger.info("Request processed successfully")
         return jsonify(response), 200
     
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(locals().get('filepath'), e)
+    
+    except HTTPException:
+        raise
+    
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         
@@ -123,6 +360,86 @@ def analyze_fashion():
         }), 500
 
 
+@app.route('/analyze/vision', methods=['POST'])
+def analyze_vision_only():
+    """
+    Fast endpoint: image analysis only, no LLM call
+    
+    Runs in its own executor lane, so it never queues behind LLM-bound
+    requests and keeps working when Gemini is down.
+    
+    Expected: multipart/form-data with 'image' file
+    
+    Returns:
+        JSON with body/face shape, skin tone, undertone and dominant colors
+    """
+    start = time.perf_counter()
+    try:
+        # Validate file presence
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image file provided'}), 400
+        
+        file = request.files['image']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        # Validate file type
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type. Allowed: jpg, jpeg, png'}), 400
+        
+        # Validate file size
+        if not validate_file_size(file):
+            return jsonify({'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'}), 400
+        
+        # Check format and pixel dimensions from the header, before any decode
+        header, header_error = validate_image_header(file)
+        if header_error:
+            return jsonify({'error': header_error}), 400
+        
+        # Save file temporarily
+        filename = sanitize_filename(file.filename)
+        filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
+        file.save(filepath)
+        
+        # Follow the load-based tier without taking an admission slot
+        tier = vision_pipeline.vision_only_tier(admission_controller.current_tier)
+        analysis_data = vision_lane.run(vision_pipeline.analyze_file, filepath, tier, header)
+        analysis_id = analysis_store.put(analysis_data, tier['name'])
+        
+        # Clean up
+        os.remove(filepath)
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        metrics.observe_slo('vision_only', elapsed_ms, Config.VISION_SLO_MS)
+        
+        return jsonify({
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'quality_tier': tier['name'],
+            'elapsed_ms': round(elapsed_ms, 1),
+            'status': 'success'
+        }), 200
+    
+    except (LaneFullError, PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"Vision lane busy: {str(e)}")
+        return busy_response(locals().get('filepath'), e)
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error in vision-only analysis: {str(e)}")
+        
+        if 'filepath' in locals() and os.path.exists(filepath):
+            os.remove(filepath)
+        
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
 @app.route('/generate-dress-prompts', methods=['POST'])
 def generate_dress_prompts():
     """
@@ -130,6 +447,8 @@ def generate_dress_prompts():
     
     Expected: multipart/form-data with 'image' file
     Optional form data: mood, occasion, weather, budget
+    Optional query: stream=1 for an NDJSON stream that delivers each dress
+    design as soon as it is generated
     
     Returns:
         JSON with analysis, recommendations, and dress design prompts
@@ -152,6 +471,11 @@ def generate_dress_prompts():
         if not validate_file_size(file):
             return jsonify({'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'}), 400
         
+        # Check format and pixel dimensions from the header, before any decode
+        header, header_error = validate_image_header(file)
+        if header_error:
+            return jsonify({'error': header_error}), 400
+        
         # Get personalization parameters from form data
         personalization = {
             'mood': request.form.get('mood'),
@@ -170,46 +494,71 @@ def generate_dress_prompts():
         
         logger.info(f"Generating dress prompts for: {filename}")
         logger.info(f"Personalization: {personalization}")
+        stream = request.args.get('stream') == '1'
         
-        # Process image
-        image = image_processor.load_image(filepath)
-        rgb_image = image_processor.preprocess_for_mediapipe(image)
+        with admission_controller.admit() as tier:
+            # Process and analyze image
+            analysis_data = vision_pipeline.analyze_file(filepath, tier, header)
+            analysis_id = analysis_store.put(analysis_data, tier['name'])
         
-        # Analyze
-        mediapipe_results = mediapipe_analyzer.analyze(rgb_image)
-        color_results = color_analyzer.analyze(rgb_image)
-        
-        analysis_data = {
-            **mediapipe_results,
-            **color_results
-        }
-        
-        # Generate regular recommendations first
-        recommendations = gemini_service.generate_recommendations(
-            analysis_data,
-            personalization
-        )
-        
-        # Generate dress design prompts
-        dress_prompts = gemini_service.generate_dress_prompts(
-            analysis_data,
-            personalization
-        )
+        with ExitStack() as held:
+            held.enter_context(llm_slots)
+            held.enter_context(vision_pipeline.stage('llm'))
+            
+            # Generate regular recommendations first
+            recommendations = gemini_service.generate_recommendations(
+                analysis_data,
+                personalization,
+                llm_mode=tier['llm_mode']
+            )
+            
+            if stream:
+                os.remove(filepath)
+                response = dress_stream({
+                    'analysis_id': analysis_id,
+                    'analysis': analysis_data,
+                    'recommendations': recommendations,
+                    'personalization': personalization,
+                    'quality_tier': tier['name']
+                }, gemini_service.iter_dress_designs(analysis_data, personalization, llm_mode=tier['llm_mode']))
+                
+                # The designs are generated while the response streams: keep
+                # the Gemini slot and the llm stage until it is closed
+                response.call_on_close(held.pop_all().close)
+                return response
+            
+            # Generate dress design prompts
+            dress_prompts = gemini_service.generate_dress_prompts(
+                analysis_data,
+                personalization,
+                llm_mode=tier['llm_mode']
+            )
         
         # Clean up
         os.remove(filepath)
         
         response = {
+            'analysis_id': analysis_id,
             'analysis': analysis_data,
             'recommendations': recommendations,
             'personalization': personalization,
             'dress_prompts': dress_prompts,
+            'quality_tier': tier['name'],
             'status': 'success'
         }
         
+        persist_result('/generate-dress-prompts', response)
+        
         logger.info("Dress prompts generated successfully")
         return jsonify(response), 200
     
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(locals().get('filepath'), e)
+    
+    except HTTPException:
+        raise
+    
     except Exception as e:
         logger.error(f"Error generating dress prompts: {str(e)}")
         
@@ -256,6 +605,11 @@ def personalize_recommendations():
         if not validate_file_size(file):
             return jsonify({'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'}), 400
         
+        # Check format and pixel dimensions from the header, before any decode
+        header, header_error = validate_image_header(file)
+        if header_error:
+            return jsonify({'error': header_error}), 400
+        
         # Get personalization parameters from form data
         personalization = {
             'mood': request.form.get('mood'),
@@ -275,38 +629,43 @@ def personalize_recommendations():
         logger.info(f"Processing personalized request: {filename}")
         logger.info(f"Personalization: {personalization}")
         
-        # Process image
-        image = image_processor.load_image(filepath)
-        rgb_image = image_processor.preprocess_for_mediapipe(image)
-        
-        # Analyze
-        mediapipe_results = mediapipe_analyzer.analyze(rgb_image)
-        color_results = color_analyzer.analyze(rgb_image)
-        
-        analysis_data = {
-            **mediapipe_results,
-            **color_results
-        }
+        with admission_controller.admit() as tier:
+            # Process and analyze image
+            analysis_data = vision_pipeline.analyze_file(filepath, tier, header)
+            analysis_id = analysis_store.put(analysis_data, tier['name'])
         
         # Generate personalized recommendations
-        recommendations = gemini_service.generate_personalized_recommendations(
-            analysis_data,
-            personalization
-        )
+        with llm_slots, vision_pipeline.stage('llm'):
+            recommendations = gemini_service.generate_personalized_recommendations(
+                analysis_data,
+                personalization,
+                llm_mode=tier['llm_mode']
+            )
         
         # Clean up
         os.remove(filepath)
         
         response = {
+            'analysis_id': analysis_id,
             'analysis': analysis_data,
             'personalization': personalization,
             'recommendations': recommendations,
+            'quality_tier': tier['name'],
             'status': 'success'
         }
         
+        persist_result('/personalize', response)
+        
         logger.info("Personalized request processed successfully")
         return jsonify(response), 200
     
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(locals().get('filepath'), e)
+    
+    except HTTPException:
+        raise
+    
     except Exception as e:
         logger.error(f"Error processing personalized request: {str(e)}")
         
@@ -319,6 +678,329 @@ def personalize_recommendations():
         }), 500
 
 
+@app.route('/lookbook', methods=['POST'])
+def generate_lookbook():
+    """
+    Recommendations for several occasions/weather conditions from one upload
+    
+    The image is analyzed once and all variants are generated together
+    (one Gemini call per LOOKBOOK_BATCH_SIZE uncached variants).
+    
+    Expected: multipart/form-data with 'image' file and 'variants', a JSON list:
+    [
+        {"id": "work", "occasion": "work", "weather": "cold"},
+        {"id": "date", "occasion": "date night", "mood": "romantic"}
+    ]
+    
+    Returns:
+        JSON with the analysis and recommendations keyed by variant id
+    """
+    try:
+        # Validate file presence
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image file provided'}), 400
+        
+        file = request.files['image']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        # Validate file
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type. Allowed: jpg, jpeg, png'}), 400
+        
+        if not validate_file_size(file):
+            return jsonify({'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'}), 400
+        
+        # Check format and pixel dimensions from the header, before any decode
+        header, header_error = validate_image_header(file)
+        if header_error:
+            return jsonify({'error': header_error}), 400
+        
+        variants, variants_error = parse_lookbook_variants(request.form.get('variants'))
+        if variants_error:
+            return jsonify({'error': variants_error}), 400
+        
+        # Save file temporarily
+        filename = sanitize_filename(file.filename)
+        filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
+        file.save(filepath)
+        
+        logger.info(f"Processing lookbook request: {filename} ({len(variants)} variants)")
+        
+        with admission_controller.admit() as tier:
+            # One vision pass for every variant
+            analysis_data = vision_pipeline.analyze_file(filepath, tier, header)
+            analysis_id = analysis_store.put(analysis_data, tier['name'])
+        
+        with llm_slots, vision_pipeline.stage('llm'):
+            lookbook = gemini_service.generate_lookbook(
+                analysis_data,
+                variants,
+                llm_mode=tier['llm_mode']
+            )
+        
+        # Clean up
+        os.remove(filepath)
+        
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'lookbook': {
+                variant_id: {
+                    'personalization': variants[variant_id],
+                    'recommendations': recommendations
+                }
+                for variant_id, recommendations in lookbook.items()
+            },
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+        
+        persist_result('/lookbook', {
+            'analysis': analysis_data,
+            'recommendations': lookbook,
+            'personalization': {'variants': variants},
+            'quality_tier': tier['name']
+        })
+        
+        logger.info("Lookbook request processed successfully")
+        return jsonify(response), 200
+    
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(locals().get('filepath'), e)
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error processing lookbook request: {str(e)}")
+        
+        if 'filepath' in locals() and os.path.exists(filepath):
+            os.remove(filepath)
+        
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+def stored_analysis_request():
+    """
+    Read analysis_id and personalization from a JSON body
+
+    Returns:
+        tuple: (analysis_id, analysis_data, personalization, None) on success,
+            or (None, None, None, error response)
+    """
+    payload = request.get_json(silent=True) or {}
+    analysis_id = payload.get('analysis_id')
+    if not analysis_id:
+        return None, None, None, (jsonify({'error': 'analysis_id is required'}), 400)
+    
+    analysis_data = analysis_store.get(analysis_id)
+    if analysis_data is None:
+        # Expired or evicted: the client re-uploads
+        return None, None, None, (jsonify({
+            'error': 'Analysis not found',
+            'message': 'Unknown or expired analysis_id, please upload the image again'
+        }), 404)
+    
+    personalization = {
+        'mood': payload.get('mood'),
+        'occasion': payload.get('occasion'),
+        'weather': payload.get('weather'),
+        'budget': payload.get('budget')
+    }
+    
+    # Remove None values
+    personalization = {k: v for k, v in personalization.items() if v}
+    
+    return analysis_id, analysis_data, personalization, None
+
+
+@app.route('/recommendations', methods=['POST'])
+def recommend_from_analysis():
+    """
+    Personalized recommendations for a stored analysis (no upload, no CV work)
+    
+    Expected JSON:
+    {
+        "analysis_id": "string (from a previous upload)",
+        "mood": "string",
+        "occasion": "string",
+        "weather": "string",
+        "budget": "string"
+    }
+    
+    Returns:
+        JSON with personalized recommendations
+    """
+    try:
+        analysis_id, analysis_data, personalization, error = stored_analysis_request()
+        if error:
+            return error
+        
+        logger.info(f"Re-recommending from stored analysis, personalization: {personalization}")
+        
+        # No CV work: follow the load-based tier without taking an admission slot
+        tier = admission_controller.current_tier
+        with llm_slots, vision_pipeline.stage('llm'):
+            recommendations = gemini_service.generate_personalized_recommendations(
+                analysis_data,
+                personalization,
+                llm_mode=tier['llm_mode']
+            )
+        
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'personalization': personalization,
+            'recommendations': recommendations,
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+        
+        persist_result('/recommendations', response)
+        
+        return jsonify(response), 200
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error re-recommending from stored analysis: {str(e)}")
+        
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/dress-prompts', methods=['POST'])
+def dress_prompts_from_analysis():
+    """
+    Recommendations and dress design prompts for a stored analysis
+    
+    Expected JSON: same as /recommendations
+    
+    Returns:
+        JSON with recommendations and dress design prompts
+    """
+    try:
+        analysis_id, analysis_data, personalization, error = stored_analysis_request()
+        if error:
+            return error
+        
+        logger.info(f"Dress prompts from stored analysis, personalization: {personalization}")
+        
+        # No CV work: follow the load-based tier without taking an admission slot
+        tier = admission_controller.current_tier
+        with llm_slots, vision_pipeline.stage('llm'):
+            recommendations = gemini_service.generate_recommendations(
+                analysis_data,
+                personalization,
+                llm_mode=tier['llm_mode']
+            )
+            
+            dress_prompts = gemini_service.generate_dress_prompts(
+                analysis_data,
+                personalization,
+                llm_mode=tier['llm_mode']
+            )
+        
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'recommendations': recommendations,
+            'personalization': personalization,
+            'dress_prompts': dress_prompts,
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+        
+        persist_result('/dress-prompts', response)
+        
+        return jsonify(response), 200
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error generating dress prompts from stored analysis: {str(e)}")
+        
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/catalog/match', methods=['POST'])
+def match_catalog():
+    """
+    Catalog products closest to a set of colors
+    
+    Expected JSON:
+    {
+        "colors": ["#rrggbb", ...]  or  "analysis_id": "string",
+        "source": "recommended | dominant (with analysis_id, default recommended)",
+        "k": "products per color",
+        "category": "string",
+        "min_price": "number",
+        "max_price": "number"
+    }
+    
+    Returns:
+        JSON with the matching products of each color
+    """
+    if catalog_index is None:
+        return jsonify({'error': 'Catalog color index is not available'}), 503
+    
+    query, error = parse_catalog_query(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    colors = query.get('colors')
+    if colors is None:
+        analysis_data = analysis_store.get(query['analysis_id'])
+        if analysis_data is None:
+            return jsonify({
+                'error': 'Analysis not found',
+                'message': 'Unknown or expired analysis_id, please upload the image again'
+            }), 404
+        if query['source'] == 'dominant':
+            colors = analysis_data.get('dominant_colors') or []
+        else:
+            colors = [color['hex'] for color in palette_engine.recommend(analysis_data)]
+    
+    try:
+        matches = catalog_index.search(colors, query['k'], **query['filters'])
+        return jsonify({
+            'matches': [{'color': color, 'products': products} for color, products in matches.items()],
+            'status': 'success'
+        }), 200
+    
+    except HTTPException:
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error matching catalog colors: {str(e)}")
+        
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """Handle bodies over MAX_CONTENT_LENGTH (rejected before buffering)"""
+    return jsonify({
+        'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'
+    }), 413
+
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
@@ -338,10 +1020,14 @@ if __name__ == '__main__':
     logger.info(f"Server running on: http://{Config.HOST}:{Config.PORT}")
     logger.info(f"Web Interface: http://localhost:{Config.PORT}")
     logger.info(f"Health Check: http://localhost:{Config.PORT}/health")
+    logger.info("Development server - use gunicorn -c gunicorn.conf.py app:app in production")
     logger.info("=" * 60)
     logger.info("Press CTRL+C to stop the server")
     logger.info("=" * 60)
     
+    preload_shared_assets()
+    init_services()
+    
     app.run(
         host=Config.HOST,
         port=Config.PORT,
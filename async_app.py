@@ -0,0 +1,898 @@
+"""
+Async serving mode
+
+Same API as app.py, served by Quart on an event loop. Gemini calls use the
+SDK's async client (one long-lived, multiplexed gRPC channel per process), so
+a request waiting on the LLM holds no thread. CPU-bound vision stages run on a
+small thread pool sized to the MediaPipe analyzer pool.
+
+Run with:
+    hypercorn async_app:app --bind 0.0.0.0:5000
+"""
+import os
+import json
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, Response, request, jsonify, abort
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+
+from config import Config
+from utils import (
+    setup_logger, allowed_file, validate_file_size, validate_image_header, parse_lookbook_variants,
+    parse_catalog_query, sanitize_filename, metrics
+)
+from services import (
+    ImageProcessor, ColorAnalyzer, GeminiService, AnalysisStore,
+    NearDuplicateIndex, VisionPipeline, AdmissionController, AnalyzerPool, PoolTimeoutError,
+    ExecutorLane, LaneFullError, MemoryBudget, MemoryBudgetError, create_persistence, build_record,
+    create_shared_cache, PaletteEngine, load_catalog_index
+)
+
+# Initialize Quart app
+app = Quart(__name__, static_folder='static', static_url_path='/static')
+app.config.from_object(Config)
+Config.init_app(app)
+
+# Enable CORS
+app = cors(app, allow_origin='*')
+
+# Setup logger
+logger = setup_logger(__name__)
+
+# Initialize services
+image_processor = ImageProcessor()
+color_analyzer = ColorAnalyzer()
+# Analyses and Gemini outputs computed once per host, not per worker
+shared_cache = create_shared_cache()
+gemini_service = GeminiService(shared_cache)
+
+# Vision stages are CPU-bound: one executor thread per pooled analyzer
+analyzer_pool = AnalyzerPool(Config.VISION_EXECUTOR_WORKERS)
+vision_executor = ThreadPoolExecutor(
+    max_workers=Config.VISION_EXECUTOR_WORKERS,
+    thread_name_prefix='vision'
+)
+
+# Admission gates the vision stage; LLM calls only wait on I/O and get their own limit
+admission_controller = AdmissionController(max_concurrent=Config.VISION_EXECUTOR_WORKERS)
+# Perceptual-hash index of analyzed images, so near-identical re-uploads skip the CV stages
+duplicate_index = NearDuplicateIndex() if Config.NEAR_DUPLICATE_ENABLED else None
+if duplicate_index is not None:
+    duplicate_index.load()
+
+# Large images wait for memory on their executor thread instead of decoding at once
+memory_budget = MemoryBudget()
+vision_pipeline = VisionPipeline(
+    image_processor,
+    color_analyzer=color_analyzer,
+    stage_observer=admission_controller.record_stage,
+    analyzer_pool=analyzer_pool,
+    memory_budget=memory_budget,
+    duplicate_index=duplicate_index,
+    shared_cache=shared_cache
+)
+llm_slots = asyncio.Semaphore(Config.LLM_MAX_IN_FLIGHT)
+
+# Threads reserved for vision-only requests
+vision_lane = ExecutorLane('vision', Config.VISION_LANE_WORKERS, Config.VISION_LANE_MAX_QUEUE)
+
+# Recent analyses, so personalization changes skip the upload and CV stages;
+# kept in the shared cache so any worker can resolve an ID
+analysis_store = AnalysisStore(shared_cache=shared_cache)
+
+# Analysis history, written behind the request by a background thread
+persistence = create_persistence()
+
+# Seasonal palettes, and the product catalog's color index (memory-mapped);
+# None until build_catalog_index.py has run
+palette_engine = PaletteEngine()
+catalog_index = load_catalog_index()
+
+
+async def analyze_upload(filepath):
+    """
+    Run the vision pipeline on the executor
+
+    Args:
+        filepath: Path to the saved upload
+
+    Returns:
+        tuple: (analysis dict, quality tier dict)
+    """
+    async with admission_controller.admit_async() as tier:
+        loop = asyncio.get_running_loop()
+        analysis_data = await loop.run_in_executor(
+            vision_executor, vision_pipeline.analyze_file, filepath, tier
+        )
+    return analysis_data, tier
+
+
+async def read_upload():
+    """
+    Validate and save the uploaded image
+
+    Returns:
+        tuple: (filepath, filename, None) on success, or (None, None, error response)
+    """
+    try:
+        files = await request.files
+    except RequestEntityTooLarge:
+        # Body without Content-Length that grew past MAX_CONTENT_LENGTH
+        return None, None, (jsonify({'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'}), 413)
+
+    # Validate file presence
+    if 'image' not in files:
+        return None, None, (jsonify({'error': 'No image file provided'}), 400)
+
+    file = files['image']
+
+    if file.filename == '':
+        return None, None, (jsonify({'error': 'No file selected'}), 400)
+
+    # Validate file type
+    if not allowed_file(file.filename):
+        return None, None, (jsonify({'error': 'Invalid file type. Allowed: jpg, jpeg, png'}), 400)
+
+    # Validate file size
+    if not validate_file_size(file):
+        return None, None, (jsonify({'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'}), 400)
+
+    # Check format and pixel dimensions from the header, before any decode
+    header, header_error = validate_image_header(file)
+    if header_error:
+        return None, None, (jsonify({'error': header_error}), 400)
+
+    # Save file temporarily
+    filename = sanitize_filename(file.filename)
+    filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
+    await file.save(filepath)
+
+    return filepath, filename, None
+
+
+def personalization_from(values):
+    """Personalization parameters from form/JSON values, without empty values"""
+    personalization = {
+        'mood': values.get('mood'),
+        'occasion': values.get('occasion'),
+        'weather': values.get('weather'),
+        'budget': values.get('budget')
+    }
+    return {k: v for k, v in personalization.items() if v}
+
+
+async def read_personalization():
+    """Personalization parameters from form data"""
+    return personalization_from(await request.form)
+
+
+async def read_stored_analysis():
+    """
+    Read analysis_id and personalization from a JSON body
+
+    Returns:
+        tuple: (analysis_id, analysis_data, personalization, None) on success,
+            or (None, None, None, error response)
+    """
+    payload = await request.get_json(silent=True) or {}
+    analysis_id = payload.get('analysis_id')
+    if not analysis_id:
+        return None, None, None, (jsonify({'error': 'analysis_id is required'}), 400)
+
+    analysis_data = await asyncio.to_thread(analysis_store.get, analysis_id)
+    if analysis_data is None:
+        # Expired or evicted: the client re-uploads
+        return None, None, None, (jsonify({
+            'error': 'Analysis not found',
+            'message': 'Unknown or expired analysis_id, please upload the image again'
+        }), 404)
+
+    return analysis_id, analysis_data, personalization_from(payload), None
+
+
+def persist_result(endpoint, response):
+    """Queue a successful result for the analysis history (never blocks)"""
+    if persistence is None:
+        return
+
+    persistence.submit(build_record(
+        endpoint,
+        response['analysis'],
+        recommendations=response.get('recommendations'),
+        personalization=response.get('personalization'),
+        dress_prompts=response.get('dress_prompts'),
+        quality_tier=response.get('quality_tier')
+    ))
+
+
+def remove_upload(filepath):
+    """Delete a temporary upload if it still exists"""
+    if filepath and os.path.exists(filepath):
+        os.remove(filepath)
+
+
+def dress_stream(head, analysis_data, personalization, llm_mode):
+    """
+    NDJSON stream for /generate-dress-prompts?stream=1
+
+    Sends the analysis and recommendations first, then one line per dress
+    design as its Gemini call finishes, then the assembled dress_prompts.
+
+    Args:
+        head: Response dict without dress_prompts
+        analysis_data: Physical attribute analysis
+        personalization: Personalization parameters
+        llm_mode: Tier's LLM mode
+
+    Returns:
+        Response: Streamed application/x-ndjson response
+    """
+    async def generate():
+        yield json.dumps({'type': 'analysis', **head}) + '\n'
+
+        collected = {}
+        # Held for the whole stream, like the concurrent calls of the JSON response
+        async with llm_slots:
+            with vision_pipeline.stage('llm'):
+                async for index, design in gemini_service.iter_dress_designs_async(
+                    analysis_data, personalization, llm_mode
+                ):
+                    collected[index] = design
+                    yield json.dumps({'type': 'design', 'index': index, 'design': design}) + '\n'
+
+        response = dict(head, dress_prompts={'dress_designs': [collected[i] for i in sorted(collected)]})
+        persist_result('/generate-dress-prompts', response)
+        yield json.dumps({'type': 'done', 'dress_prompts': response['dress_prompts'], 'status': 'success'}) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+def busy_response(filepath, error=None):
+    """
+    503 response for requests that could not get an analyzer, lane slot or memory in time
+
+    Args:
+        filepath: Upload to remove (or None)
+        error: The capacity error, which picks the message
+    """
+    remove_upload(filepath)
+
+    if isinstance(error, MemoryBudgetError):
+        message = 'Not enough memory free to analyze this image, please retry shortly'
+    else:
+        message = 'All analyzers are busy, please retry shortly'
+
+    return jsonify({
+        'error': 'Service busy',
+        'message': message
+    }), 503
+
+
+@app.route('/', methods=['GET'])
+async def index():
+    """Serve the web interface"""
+    return await app.send_static_file('index.html')
+
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint"""
+    return jsonify({
+        'status': 'healthy',
+        'service': 'Outfevibe Vision AI',
+        'version': '1.0.0',
+        'mode': 'async'
+    }), 200
+
+
+@app.route('/capabilities', methods=['GET'])
+async def get_capabilities():
+    """
+    Upload contract for clients
+
+    Clients downscale and re-encode photos to this size/format before
+    uploading, which the server then analyzes without resizing.
+    """
+    return jsonify({
+        'image': {
+            'max_width': Config.IMAGE_MAX_WIDTH,
+            'max_height': Config.IMAGE_MAX_HEIGHT,
+            'format': Config.CLIENT_IMAGE_FORMAT,
+            'quality': Config.CLIENT_IMAGE_QUALITY,
+            'max_file_size': Config.MAX_FILE_SIZE,
+            'allowed_extensions': sorted(Config.ALLOWED_EXTENSIONS)
+        }
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Expose process metrics (stage latencies, admission state)"""
+    snapshot = metrics.snapshot()
+    snapshot['quality_tier'] = admission_controller.current_tier['name']
+    return jsonify(snapshot), 200
+
+
+@app.route('/analyze', methods=['POST'])
+async def analyze_fashion():
+    """
+    Main endpoint: Analyze uploaded image and generate fashion recommendations
+
+    Expected: multipart/form-data with 'image' file
+
+    Returns:
+        JSON with complete analysis and recommendations
+    """
+    filepath = None
+    try:
+        filepath, filename, error = await read_upload()
+        if error:
+            return error
+
+        logger.info(f"Processing image: {filename}")
+
+        # STEP 1-4: Load, preprocess and analyze (body, face, colors)
+        analysis_data, tier = await analyze_upload(filepath)
+        analysis_id = await asyncio.to_thread(analysis_store.put, analysis_data, tier['name'])
+
+        logger.info(f"Analysis complete: {analysis_data}")
+
+        # STEP 5: Generate AI recommendations using Gemini
+        async with llm_slots:
+            with vision_pipeline.stage('llm'):
+                recommendations = await gemini_service.generate_recommendations_async(
+                    analysis_data,
+                    llm_mode=tier['llm_mode']
+                )
+
+        # Clean up uploaded file
+        remove_upload(filepath)
+
+        # STEP 6: Return complete response
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'recommendations': recommendations,
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+
+        persist_result('/analyze', response)
+
+        logger.info("Request processed successfully")
+        return jsonify(response), 200
+
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(filepath, e)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        remove_upload(filepath)
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/analyze/vision', methods=['POST'])
+async def analyze_vision_only():
+    """
+    Fast endpoint: image analysis only, no LLM call
+
+    Runs in its own executor lane, so it never queues behind LLM-bound
+    requests and keeps working when Gemini is down.
+
+    Expected: multipart/form-data with 'image' file
+
+    Returns:
+        JSON with body/face shape, skin tone, undertone and dominant colors
+    """
+    start = time.perf_counter()
+    filepath = None
+    try:
+        filepath, filename, error = await read_upload()
+        if error:
+            return error
+
+        # Follow the load-based tier without taking an admission slot
+        tier = vision_pipeline.vision_only_tier(admission_controller.current_tier)
+        analysis_data = await vision_lane.run_async(vision_pipeline.analyze_file, filepath, tier)
+        analysis_id = await asyncio.to_thread(analysis_store.put, analysis_data, tier['name'])
+
+        # Clean up
+        remove_upload(filepath)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        metrics.observe_slo('vision_only', elapsed_ms, Config.VISION_SLO_MS)
+
+        return jsonify({
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'quality_tier': tier['name'],
+            'elapsed_ms': round(elapsed_ms, 1),
+            'status': 'success'
+        }), 200
+
+    except (LaneFullError, PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"Vision lane busy: {str(e)}")
+        return busy_response(filepath, e)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error in vision-only analysis: {str(e)}")
+        remove_upload(filepath)
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/generate-dress-prompts', methods=['POST'])
+async def generate_dress_prompts():
+    """
+    Generate detailed dress design prompts for image generation
+
+    Expected: multipart/form-data with 'image' file
+    Optional form data: mood, occasion, weather, budget
+    Optional query: stream=1 for an NDJSON stream that delivers each dress
+    design as soon as it is generated
+
+    Returns:
+        JSON with analysis, recommendations, and dress design prompts
+    """
+    filepath = None
+    try:
+        filepath, filename, error = await read_upload()
+        if error:
+            return error
+
+        personalization = await read_personalization()
+
+        logger.info(f"Generating dress prompts for: {filename}")
+        logger.info(f"Personalization: {personalization}")
+
+        # Process and analyze image
+        analysis_data, tier = await analyze_upload(filepath)
+        analysis_id = await asyncio.to_thread(analysis_store.put, analysis_data, tier['name'])
+
+        if request.args.get('stream') == '1':
+            async with llm_slots:
+                with vision_pipeline.stage('llm'):
+                    recommendations = await gemini_service.generate_recommendations_async(
+                        analysis_data,
+                        personalization,
+                        llm_mode=tier['llm_mode']
+                    )
+            remove_upload(filepath)
+
+            return dress_stream({
+                'analysis_id': analysis_id,
+                'analysis': analysis_data,
+                'recommendations': recommendations,
+                'personalization': personalization,
+                'quality_tier': tier['name']
+            }, analysis_data, personalization, tier['llm_mode'])
+
+        # Recommendations and dress prompts are independent: run both calls concurrently
+        async with llm_slots:
+            with vision_pipeline.stage('llm'):
+                recommendations, dress_prompts = await asyncio.gather(
+                    gemini_service.generate_recommendations_async(
+                        analysis_data,
+                        personalization,
+                        llm_mode=tier['llm_mode']
+                    ),
+                    gemini_service.generate_dress_prompts_async(
+                        analysis_data,
+                        personalization,
+                        llm_mode=tier['llm_mode']
+                    )
+                )
+
+        # Clean up
+        remove_upload(filepath)
+
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'recommendations': recommendations,
+            'personalization': personalization,
+            'dress_prompts': dress_prompts,
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+
+        persist_result('/generate-dress-prompts', response)
+
+        logger.info("Dress prompts generated successfully")
+        return jsonify(response), 200
+
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(filepath, e)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error generating dress prompts: {str(e)}")
+        remove_upload(filepath)
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/personalize', methods=['POST'])
+async def personalize_recommendations():
+    """
+    BONUS: Generate personalized recommendations
+
+    Expected: multipart/form-data with 'image' file
+    Optional form data: mood, occasion, weather, budget
+
+    Returns:
+        JSON with personalized recommendations
+    """
+    filepath = None
+    try:
+        filepath, filename, error = await read_upload()
+        if error:
+            return error
+
+        personalization = await read_personalization()
+
+        logger.info(f"Processing personalized request: {filename}")
+        logger.info(f"Personalization: {personalization}")
+
+        # Process and analyze image
+        analysis_data, tier = await analyze_upload(filepath)
+        analysis_id = await asyncio.to_thread(analysis_store.put, analysis_data, tier['name'])
+
+        # Generate personalized recommendations
+        async with llm_slots:
+            with vision_pipeline.stage('llm'):
+                recommendations = await gemini_service.generate_personalized_recommendations_async(
+                    analysis_data,
+                    personalization,
+                    llm_mode=tier['llm_mode']
+                )
+
+        # Clean up
+        remove_upload(filepath)
+
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'personalization': personalization,
+            'recommendations': recommendations,
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+
+        persist_result('/personalize', response)
+
+        logger.info("Personalized request processed successfully")
+        return jsonify(response), 200
+
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(filepath, e)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error processing personalized request: {str(e)}")
+        remove_upload(filepath)
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/lookbook', methods=['POST'])
+async def generate_lookbook():
+    """
+    Recommendations for several occasions/weather conditions from one upload
+
+    Expected: multipart/form-data with 'image' file and 'variants' (JSON list
+    of objects with optional id, mood, occasion, weather, budget)
+
+    Returns:
+        JSON with the analysis and recommendations keyed by variant id
+    """
+    filepath = None
+    try:
+        filepath, filename, error = await read_upload()
+        if error:
+            return error
+
+        variants, variants_error = parse_lookbook_variants((await request.form).get('variants'))
+        if variants_error:
+            remove_upload(filepath)
+            return jsonify({'error': variants_error}), 400
+
+        logger.info(f"Processing lookbook request: {filename} ({len(variants)} variants)")
+
+        # One vision pass for every variant
+        analysis_data, tier = await analyze_upload(filepath)
+        analysis_id = await asyncio.to_thread(analysis_store.put, analysis_data, tier['name'])
+
+        async with llm_slots:
+            with vision_pipeline.stage('llm'):
+                lookbook = await gemini_service.generate_lookbook_async(
+                    analysis_data,
+                    variants,
+                    llm_mode=tier['llm_mode']
+                )
+
+        # Clean up
+        remove_upload(filepath)
+
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'lookbook': {
+                variant_id: {
+                    'personalization': variants[variant_id],
+                    'recommendations': recommendations
+                }
+                for variant_id, recommendations in lookbook.items()
+            },
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+
+        persist_result('/lookbook', {
+            'analysis': analysis_data,
+            'recommendations': lookbook,
+            'personalization': {'variants': variants},
+            'quality_tier': tier['name']
+        })
+
+        logger.info("Lookbook request processed successfully")
+        return jsonify(response), 200
+
+    except (PoolTimeoutError, MemoryBudgetError) as e:
+        logger.warning(f"No capacity for analysis: {str(e)}")
+        return busy_response(filepath, e)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error processing lookbook request: {str(e)}")
+        remove_upload(filepath)
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/recommendations', methods=['POST'])
+async def recommend_from_analysis():
+    """
+    Personalized recommendations for a stored analysis (no upload, no CV work)
+
+    Expected JSON: analysis_id plus optional mood, occasion, weather, budget
+
+    Returns:
+        JSON with personalized recommendations
+    """
+    try:
+        analysis_id, analysis_data, personalization, error = await read_stored_analysis()
+        if error:
+            return error
+
+        logger.info(f"Re-recommending from stored analysis, personalization: {personalization}")
+
+        tier = admission_controller.current_tier
+        async with llm_slots:
+            with vision_pipeline.stage('llm'):
+                recommendations = await gemini_service.generate_personalized_recommendations_async(
+                    analysis_data,
+                    personalization,
+                    llm_mode=tier['llm_mode']
+                )
+
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'personalization': personalization,
+            'recommendations': recommendations,
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+
+        persist_result('/recommendations', response)
+
+        return jsonify(response), 200
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error re-recommending from stored analysis: {str(e)}")
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/dress-prompts', methods=['POST'])
+async def dress_prompts_from_analysis():
+    """
+    Recommendations and dress design prompts for a stored analysis
+
+    Expected JSON: same as /recommendations
+
+    Returns:
+        JSON with recommendations and dress design prompts
+    """
+    try:
+        analysis_id, analysis_data, personalization, error = await read_stored_analysis()
+        if error:
+            return error
+
+        logger.info(f"Dress prompts from stored analysis, personalization: {personalization}")
+
+        tier = admission_controller.current_tier
+        async with llm_slots:
+            with vision_pipeline.stage('llm'):
+                recommendations, dress_prompts = await asyncio.gather(
+                    gemini_service.generate_recommendations_async(
+                        analysis_data,
+                        personalization,
+                        llm_mode=tier['llm_mode']
+                    ),
+                    gemini_service.generate_dress_prompts_async(
+                        analysis_data,
+                        personalization,
+                        llm_mode=tier['llm_mode']
+                    )
+                )
+
+        response = {
+            'analysis_id': analysis_id,
+            'analysis': analysis_data,
+            'recommendations': recommendations,
+            'personalization': personalization,
+            'dress_prompts': dress_prompts,
+            'quality_tier': tier['name'],
+            'status': 'success'
+        }
+
+        persist_result('/dress-prompts', response)
+
+        return jsonify(response), 200
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error generating dress prompts from stored analysis: {str(e)}")
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.route('/catalog/match', methods=['POST'])
+async def match_catalog():
+    """
+    Catalog products closest to a set of colors
+
+    Expected JSON: see app.py
+
+    Returns:
+        JSON with the matching products of each color
+    """
+    if catalog_index is None:
+        return jsonify({'error': 'Catalog color index is not available'}), 503
+
+    query, error = parse_catalog_query(await request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+
+    colors = query.get('colors')
+    if colors is None:
+        analysis_data = await asyncio.to_thread(analysis_store.get, query['analysis_id'])
+        if analysis_data is None:
+            return jsonify({
+                'error': 'Analysis not found',
+                'message': 'Unknown or expired analysis_id, please upload the image again'
+            }), 404
+        if query['source'] == 'dominant':
+            colors = analysis_data.get('dominant_colors') or []
+        else:
+            colors = [color['hex'] for color in palette_engine.recommend(analysis_data)]
+
+    try:
+        # Off the loop: a cold index page faults on disk reads
+        matches = await asyncio.to_thread(catalog_index.search, colors, query['k'], **query['filters'])
+        return jsonify({
+            'matches': [{'color': color, 'products': products} for color, products in matches.items()],
+            'status': 'success'
+        }), 200
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Error matching catalog colors: {str(e)}")
+
+        return jsonify({
+            'error': 'Internal server error',
+            'message': str(e)
+        }), 500
+
+
+@app.before_request
+async def reject_oversized_body():
+    """Refuse bodies over MAX_CONTENT_LENGTH before they are read"""
+    if request.content_length is not None and request.content_length > Config.MAX_CONTENT_LENGTH:
+        abort(413)
+
+
+@app.errorhandler(413)
+async def request_too_large(error):
+    """Handle bodies over MAX_CONTENT_LENGTH"""
+    return jsonify({
+        'error': f'File too large. Maximum size: {Config.MAX_FILE_SIZE / (1024*1024)}MB'
+    }), 413
+
+
+@app.errorhandler(404)
+async def not_found(error):
+    """Handle 404 errors"""
+    return jsonify({'error': 'Endpoint not found'}), 404
+
+
+@app.errorhandler(500)
+async def internal_error(error):
+    """Handle 500 errors"""
+    return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.after_serving
+async def shutdown():
+    """Release vision threads and MediaPipe models, flush the history and duplicate index"""
+    vision_executor.shutdown(wait=True)
+    vision_lane.close()
+    analyzer_pool.close()
+    if persistence is not None:
+        persistence.close()
+    if duplicate_index is not None:
+        duplicate_index.save()
+
+
+if __name__ == '__main__':
+    logger.info("=" * 60)
+    logger.info("🎨 Outfevibe Vision AI - Starting Async Server")
+    logger.info("=" * 60)
+    logger.info(f"Server running on: http://{Config.HOST}:{Config.PORT}")
+    logger.info(f"Vision executor threads: {Config.VISION_EXECUTOR_WORKERS}")
+    logger.info(f"LLM calls in flight (max): {Config.LLM_MAX_IN_FLIGHT}")
+    logger.info("=" * 60)
+
+    app.run(
+        host=Config.HOST,
+        port=Config.PORT,
+        debug=(Config.FLASK_ENV == 'development')
+    )
@@ -0,0 +1,365 @@
+"""
+Run the vision pipeline over local image files, without the web server
+
+Paths are streamed from directories (walked recursively) or a list file
+('-' for stdin). Reader threads decode each image at the tier's frame size;
+worker processes, each with its own MediaPipe analyzers, analyze them.
+Results are written as they finish, one record per image, so an interrupted
+run resumes where it stopped: images already in the output are skipped.
+
+Usage:
+    python batch_analyze.py photos/ --out analyses.jsonl [--workers 8] [--tier reduced]
+    python batch_analyze.py --list paths.txt --out analyses/ --format parquet
+    python batch_analyze.py photos/ --out analyses.jsonl --recommendations
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from config import Config
+from utils.image_probe import probe_file
+from services.image_processing import ImageProcessor
+
+# Analysis fields stored as Parquet columns
+ANALYSIS_FIELDS = ('body_shape', 'face_shape', 'skin_tone', 'undertone', 'dominant_colors')
+
+
+def iter_paths(sources, list_file=None):
+    """
+    Image paths to analyze, streamed
+
+    Args:
+        sources: Files and directories (walked recursively, sorted)
+        list_file: Optional file of paths, one per line ('-' for stdin)
+
+    Yields:
+        str: Image paths with an allowed extension
+    """
+    if list_file:
+        stream = sys.stdin if list_file == '-' else open(list_file)
+        with stream:
+            for line in stream:
+                if line.strip():
+                    yield line.strip()
+
+    for source in sources:
+        if not os.path.isdir(source):
+            yield source
+            continue
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.rsplit('.', 1)[-1].lower() in Config.ALLOWED_EXTENSIONS:
+                    yield os.path.join(root, name)
+
+
+def read_image(path, tier):
+    """Decode an image at the tier's frame size (reader threads; OpenCV releases the GIL)"""
+    header = probe_file(path)
+    reduction = ImageProcessor.decode_reduction(header, tier['max_width'], tier['max_height'])
+    image = ImageProcessor.load_image(path, reduction)
+    return ImageProcessor.resize_image(image, tier['max_width'], tier['max_height'])
+
+
+def decode_ahead(paths, tier, readers):
+    """
+    Decode images on reader threads, a bounded number ahead of the consumer
+
+    Yields:
+        tuple: (path, image, None) or (path, None, error message), in path order
+    """
+    with ThreadPoolExecutor(readers, thread_name_prefix='reader') as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(read_image, path, tier)))
+            if len(pending) >= readers * 2:
+                yield _decoded(*pending.popleft())
+        while pending:
+            yield _decoded(*pending.popleft())
+
+
+def _decoded(path, future):
+    try:
+        return path, future.result(), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+# Worker process state, built by init_worker()
+_worker = {}
+
+
+def init_worker(tier, verbose):
+    """Build this process's pipeline; one OpenCV thread, the pool already uses every core"""
+    import cv2
+    from services.pipeline import VisionPipeline
+
+    cv2.setNumThreads(1)
+    # Ctrl-C is handled by the main process, which lets running analyses finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if not verbose:
+        logging.disable(logging.WARNING)
+    _worker['tier'] = tier
+    _worker['pipeline'] = VisionPipeline()
+
+
+def analyze(image):
+    """
+    Analyze one decoded image in a worker process
+
+    Returns:
+        tuple: (analysis, elapsed_ms)
+    """
+    start = time.perf_counter()
+    analysis = _worker['pipeline'].analyze_image(image, _worker['tier'])
+    return analysis, round((time.perf_counter() - start) * 1000.0, 1)
+
+
+class JsonlWriter:
+    """Results as JSON lines, appended to one file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def completed(self):
+        """
+        Paths already in the output
+
+        A line cut short by an interrupted run is removed first.
+
+        Returns:
+            set: Image paths
+        """
+        if not os.path.exists(self.path):
+            return set()
+
+        with open(self.path, 'rb+') as f:
+            data_end = f.seek(0, os.SEEK_END)
+            if data_end:
+                f.seek(data_end - 1)
+                if f.read(1) != b'\n':
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b'\n') + 1)
+
+        with open(self.path) as f:
+            return {json.loads(line)['path'] for line in f if line.strip()}
+
+    def write(self, record):
+        if self._file is None:
+            # Line buffered: a killed run loses at most the line being written
+            self._file = open(self.path, 'a', buffering=1)
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class ParquetWriter:
+    """Results as a directory of Parquet part files (needs pyarrow)
+
+    Records are buffered and written batch_size at a time, each batch a new
+    part file, so a resumed run never rewrites earlier parts.
+    """
+
+    def __init__(self, path, batch_size):
+        # Optional dependency, only needed for this output format
+        import pyarrow
+        import pyarrow.parquet
+
+        self.path = path
+        self.batch_size = batch_size
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._records = []
+        os.makedirs(path, exist_ok=True)
+        self._parts = len(self._part_files())
+
+    def _part_files(self):
+        return sorted(name for name in os.listdir(self.path) if name.endswith('.parquet'))
+
+    def completed(self):
+        paths = set()
+        for name in self._part_files():
+            table = self._pq.read_table(os.path.join(self.path, name), columns=['path'])
+            paths.update(table.column('path').to_pylist())
+        return paths
+
+    def write(self, record):
+        analysis = record.get('analysis') or {}
+        row = {'path': record['path'], 'error': record.get('error'), 'elapsed_ms': record.get('elapsed_ms')}
+        row.update({field: analysis.get(field) for field in ANALYSIS_FIELDS})
+        if 'recommendations' in record:
+            row['recommendations'] = json.dumps(record['recommendations'])
+        self._records.append(row)
+        if len(self._records) >= self.batch_size:
+            self._write_part()
+
+    def _write_part(self):
+        if not self._records:
+            return
+        table = self._pa.Table.from_pylist(self._records)
+        # Written under a temporary name, so a crash never leaves a partial part
+        name = os.path.join(self.path, f"part-{self._parts:06d}.parquet")
+        self._pq.write_table(table, name + '.tmp')
+        os.rename(name + '.tmp', name)
+        self._parts += 1
+        self._records = []
+
+    def close(self):
+        self._write_part()
+
+
+class Progress:
+    """Counts and periodic progress lines on stderr"""
+
+    def __init__(self, interval, workers):
+        self.interval = interval
+        self.workers = workers
+        self.analyzed = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    def record(self, ok):
+        if ok:
+            self.analyzed += 1
+        else:
+            self.failed += 1
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            rate = self.analyzed / (now - self.start)
+            print(f"{self.analyzed} analyzed, {self.failed} failed, {rate:.1f} images/s "
+                  f"({rate / self.workers:.2f}/s per worker)", file=sys.stderr)
+
+
+def cpu_seconds():
+    """CPU time of this process and its exited children"""
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze image files in bulk")
+    parser.add_argument('sources', nargs='*', help="Image files or directories")
+    parser.add_argument('--list', help="File of image paths, one per line ('-' for stdin)")
+    parser.add_argument('--out', required=True, help="Output .jsonl file, or directory for parquet")
+    parser.add_argument('--format', choices=('jsonl', 'parquet'), default='jsonl')
+    parser.add_argument('--tier', default=Config.QUALITY_TIERS[0]['name'],
+                        choices=[tier['name'] for tier in Config.QUALITY_TIERS], help="Quality tier")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Analysis processes")
+    parser.add_argument('--readers', type=int, default=4, help="Decoding threads")
+    parser.add_argument('--recommendations', action='store_true',
+                        help="Also generate Gemini recommendations (cached, see SHARED_CACHE_PATH)")
+    parser.add_argument('--llm-workers', type=int, default=8, help="Concurrent Gemini calls")
+    parser.add_argument('--batch-size', type=int, default=10000, help="Records per Parquet part file")
+    parser.add_argument('--progress-interval', type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument('--verbose', action='store_true', help="Keep per-image pipeline logs")
+    args = parser.parse_args()
+
+    if not args.sources and not args.list:
+        parser.print_help()
+        sys.exit(1)
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    tier = next(tier for tier in Config.QUALITY_TIERS if tier['name'] == args.tier)
+    writer = ParquetWriter(args.out, args.batch_size) if args.format == 'parquet' else JsonlWriter(args.out)
+    completed = writer.completed()
+    if completed:
+        print(f"Resuming: {len(completed)} images already in {args.out}", file=sys.stderr)
+    paths = (path for path in iter_paths(args.sources, args.list) if path not in completed)
+
+    gemini_service = None
+    llm_executor = None
+    if args.recommendations:
+        from services import GeminiService, create_shared_cache
+        # Recommendations depend only on the analysis attributes, so most are cache hits
+        gemini_service = GeminiService(create_shared_cache())
+        llm_executor = ThreadPoolExecutor(args.llm_workers, thread_name_prefix='llm')
+
+    progress = Progress(args.progress_interval, args.workers)
+    window = args.workers * 2
+    analyzing = {}
+    recommending = {}
+
+    def finish(record):
+        writer.write(record)
+        progress.record('error' not in record)
+
+    def collect(block):
+        """Write finished analyses (and recommendations); block until one finishes if asked"""
+        if block:
+            wait(list(analyzing) + list(recommending), return_when=FIRST_COMPLETED)
+        for future in [f for f in analyzing if f.done()]:
+            path = analyzing.pop(future)
+            try:
+                analysis, elapsed_ms = future.result()
+            except Exception as e:
+                finish({'path': path, 'error': str(e)})
+                continue
+            record = {'path': path, 'analysis': analysis, 'elapsed_ms': elapsed_ms}
+            if gemini_service is None:
+                finish(record)
+            else:
+                recommending[llm_executor.submit(gemini_service.generate_recommendations, analysis)] = record
+        for future in [f for f in recommending if f.done()]:
+            record = recommending.pop(future)
+            try:
+                record['recommendations'] = future.result()
+            except Exception as e:
+                record['error'] = f"recommendations: {str(e)}"
+            finish(record)
+
+    # Spawned, not forked: a fork would copy the reader threads' held locks
+    context = multiprocessing.get_context('spawn')
+    interrupted = False
+    with ProcessPoolExecutor(args.workers, mp_context=context, initializer=init_worker,
+                             initargs=(tier, args.verbose)) as executor:
+        try:
+            for path, image, error in decode_ahead(paths, tier, args.readers):
+                if error:
+                    finish({'path': path, 'error': error})
+                    continue
+                while len(analyzing) + len(recommending) >= window:
+                    collect(block=True)
+                analyzing[executor.submit(analyze, image)] = path
+                collect(block=False)
+
+            while analyzing or recommending:
+                collect(block=True)
+        except KeyboardInterrupt:
+            # Everything written so far is kept; rerun the same command to resume
+            interrupted = True
+            executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            writer.close()
+            if llm_executor is not None:
+                llm_executor.shutdown(wait=not interrupted, cancel_futures=interrupted)
+
+    elapsed = time.perf_counter() - progress.start
+    cpu = cpu_seconds()
+    images = progress.analyzed
+    print(f"\n{'Interrupted' if interrupted else 'Done'}: {images} analyzed, "
+          f"{progress.failed} failed, {len(completed)} already in the output")
+    print(f"Wall time:  {elapsed:.1f} s with {args.workers} workers")
+    if images:
+        print(f"Throughput: {images / elapsed:.2f} images/s, "
+              f"{images / elapsed / args.workers:.2f} images/s per worker")
+        print(f"CPU:        {cpu / images * 1000.0:.0f} ms per image, "
+              f"{images / cpu:.2f} images per CPU-second (images/s per fully busy core)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Build the product catalog color index used by /catalog/match
+
+Reads a catalog (CSV with a header row, or JSON lines) of products with sku,
+image (path, relative to the catalog file), category and price. Products that
+already list their colors ('#rrggbb' separated by spaces in CSV, a list in
+JSON lines) skip image analysis; the others are analyzed in parallel worker
+processes.
+
+Usage:
+    python build_catalog_index.py catalog.csv [--out data/catalog_index] [--workers 8]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+
+
+def read_catalog(path):
+    """
+    Products of a CSV or JSON lines catalog
+
+    Returns:
+        list: Dicts with sku, image, category, price and colors (may be empty)
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    products = []
+    for row in rows:
+        colors = row.get('colors') or []
+        if isinstance(colors, str):
+            colors = colors.split()
+        image = row.get('image')
+        products.append({
+            'sku': row['sku'],
+            'image': os.path.join(base, image) if image else None,
+            'category': row.get('category') or None,
+            'price': row.get('price') or None,
+            'colors': [color.lower() for color in colors]
+        })
+    return products
+
+
+def init_worker():
+    """One thread per process: the pool already uses every core"""
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def analyze(image_path):
+    """Colors of one product image, or the error message"""
+    from services.catalog_index import extract_product_colors
+
+    try:
+        return extract_product_colors(image_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the catalog color index")
+    parser.add_argument('catalog', help="Catalog CSV or JSON lines file")
+    parser.add_argument('--out', default=Config.CATALOG_INDEX_PATH, help="Index directory")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Image analysis processes")
+    parser.add_argument('--cell-size', type=float, default=Config.CATALOG_CELL_SIZE,
+                        help="Lab units per index grid cell")
+    args = parser.parse_args()
+
+    if not args.out:
+        print("No index path: pass --out or set CATALOG_INDEX_PATH")
+        sys.exit(1)
+
+    # K-means threads inside each worker would oversubscribe the cores
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    from services.catalog_index import CatalogColorIndex
+
+    products = read_catalog(args.catalog)
+    pending = [product for product in products if not product['colors'] and product['image']]
+    print(f"{len(products)} products, {len(pending)} images to analyze")
+
+    start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(args.workers, initializer=init_worker) as executor:
+        chunksize = max(1, len(pending) // (args.workers * 16))
+        results = executor.map(analyze, [product['image'] for product in pending], chunksize=chunksize)
+        for product, (colors, error) in zip(pending, results):
+            if error:
+                failed += 1
+                print(f"Skipping {product['sku']}: {error}")
+            else:
+                product['colors'] = colors
+
+    elapsed = time.perf_counter() - start
+    if pending:
+        print(f"Analyzed {len(pending) - failed} images in {elapsed:.1f} s "
+              f"({len(pending) / max(elapsed, 1e-9):.0f} images/s), {failed} failed")
+
+    indexed = CatalogColorIndex.build(products, args.out, args.cell_size)
+    print(f"Indexed {indexed} products in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
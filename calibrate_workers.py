@@ -0,0 +1,99 @@
+"""
+Measure per-request CPU time and suggest prefork worker/thread counts
+
+Either read live numbers from a running server's /metrics, or time the vision
+pipeline locally on sample images (LLM wait time is then an estimate).
+
+Usage:
+    python calibrate_workers.py --url http://localhost:5000/metrics
+    python calibrate_workers.py --image photo.jpg [--runs 10] [--llm-ms 3000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+from utils import plan_workers
+
+
+def from_metrics(url):
+    """
+    Mean request CPU and wall time from a server's /metrics
+
+    Returns:
+        tuple: (cpu_ms, wall_ms)
+    """
+    with urllib.request.urlopen(url, timeout=10) as response:
+        snapshot = json.load(response)
+
+    histograms = snapshot.get('histograms', {})
+    cpu = histograms.get('request.cpu_ms', {})
+    wall = histograms.get('request.wall_ms', {})
+    if not cpu.get('count'):
+        raise ValueError("No request.cpu_ms observations yet - send some traffic first")
+
+    return cpu['mean'], wall['mean']
+
+
+def from_pipeline(image_path, runs, llm_ms):
+    """
+    Time the vision pipeline locally
+
+    Returns:
+        tuple: (cpu_ms, wall_ms) where wall_ms adds the estimated LLM wait
+    """
+    from services import VisionPipeline, SkinMaskEngine
+
+    SkinMaskEngine.preload()
+    pipeline = VisionPipeline()
+    pipeline.analyze_file(image_path)  # Warm-up: model loading is not per request
+
+    cpu_total = 0.0
+    wall_total = 0.0
+    for _ in range(runs):
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        pipeline.analyze_file(image_path)
+        cpu_total += time.process_time() - cpu_start
+        wall_total += time.perf_counter() - wall_start
+
+    cpu_ms = cpu_total / runs * 1000.0
+    wall_ms = wall_total / runs * 1000.0 + llm_ms
+    return cpu_ms, wall_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggest gunicorn workers/threads")
+    parser.add_argument('--url', help="A running server's /metrics URL")
+    parser.add_argument('--image', help="Sample image for a local measurement")
+    parser.add_argument('--runs', type=int, default=10, help="Local measurement runs")
+    parser.add_argument('--llm-ms', type=float, default=3000.0,
+                        help="Estimated LLM wait per request for local measurements")
+    parser.add_argument('--cpus', type=int, default=os.cpu_count() or 1,
+                        help="Cores the server will run on")
+    args = parser.parse_args()
+
+    if args.url:
+        cpu_ms, wall_ms = from_metrics(args.url)
+    elif args.image:
+        cpu_ms, wall_ms = from_pipeline(args.image, args.runs, args.llm_ms)
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+    plan = plan_workers(args.cpus, cpu_ms, wall_ms)
+
+    print(f"CPU per request:  {cpu_ms:.1f} ms")
+    print(f"Wall per request: {wall_ms:.1f} ms")
+    print(f"Cores:            {args.cpus}")
+    print(f"\nWorkers: {plan['workers']}, threads per worker: {plan['threads']}")
+    print(f"Estimated CPU-bound capacity: {plan['capacity_rps']} req/s")
+    print(f"\n# .env")
+    print(f"REQUEST_CPU_MS={cpu_ms:.0f}")
+    print(f"REQUEST_WALL_MS={wall_ms:.0f}")
+
+
+if __name__ == "__main__":
+    main()
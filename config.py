@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,18 +15,207 @@ class Config:
     # File Upload
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 10485760))  # 10MB default
+    # Request body limit enforced by the server before the upload is buffered
+    # (file plus form fields and multipart framing)
+    MAX_CONTENT_LENGTH = MAX_FILE_SIZE + 64 * 1024
+    # Decoded-size limit checked from the image header before decoding
+    MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 50_000_000))
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png'}
     
     # Image Processing
     IMAGE_MAX_WIDTH = 800
     IMAGE_MAX_HEIGHT = 1200
     
+    # Upload contract advertised at /capabilities: clients downscale to
+    # IMAGE_MAX_WIDTH x IMAGE_MAX_HEIGHT and re-encode before uploading
+    CLIENT_IMAGE_FORMAT = os.getenv('CLIENT_IMAGE_FORMAT', 'image/jpeg')
+    CLIENT_IMAGE_QUALITY = float(os.getenv('CLIENT_IMAGE_QUALITY', 0.85))
+    
+    # Per-stage target sizes (max width, max height); smaller sizes are served
+    # from the frame's downscale pyramid. Tune with resolution_sweep.py.
+    STAGE_RESOLUTIONS = {
+        'pose': (IMAGE_MAX_WIDTH, IMAGE_MAX_HEIGHT),
+        'face': (IMAGE_MAX_WIDTH, IMAGE_MAX_HEIGHT),
+        'skin': (400, 600),
+        'clothing': (IMAGE_MAX_WIDTH, IMAGE_MAX_HEIGHT)
+    }
+    
+    # Color Analysis
+    SKIN_MASK_SCALE = int(os.getenv('SKIN_MASK_SCALE', 2))  # Downscale factor for skin segmentation
+    SKIN_MASK_LANDMARK_REGIONS = os.getenv('SKIN_MASK_LANDMARK_REGIONS', 'false').lower() == 'true'
+    COLOR_MAX_SAMPLES = int(os.getenv('COLOR_MAX_SAMPLES', 20000))  # Garment pixels clustered per request
+    
+    # Adaptive quality tiers, ordered from best to cheapest.
+    # The admission controller moves new requests down this list under load.
+    QUALITY_TIERS = [
+        {
+            'name': 'full',
+            'pose_complexity': 2,
+            'max_width': IMAGE_MAX_WIDTH,
+            'max_height': IMAGE_MAX_HEIGHT,
+            'color_max_samples': None,
+            'llm_mode': 'live'
+        },
+        {
+            'name': 'reduced',
+            'pose_complexity': 1,
+            'max_width': 600,
+            'max_height': 900,
+            'color_max_samples': 20000,
+            'llm_mode': 'live'
+        },
+        {
+            'name': 'minimal',
+            'pose_complexity': 0,
+            'max_width': 400,
+            'max_height': 600,
+            'color_max_samples': 5000,
+            'llm_mode': 'cached'
+        }
+    ]
+    
+    # Admission control
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 8))
+    ADMISSION_DEGRADE_QUEUE_DEPTH = int(os.getenv('ADMISSION_DEGRADE_QUEUE_DEPTH', 4))
+    ADMISSION_RECOVER_QUEUE_DEPTH = int(os.getenv('ADMISSION_RECOVER_QUEUE_DEPTH', 1))
+    ADMISSION_DEGRADE_IN_FLIGHT = int(os.getenv('ADMISSION_DEGRADE_IN_FLIGHT', 6))  # Below ADMISSION_MAX_CONCURRENT
+    ADMISSION_RECOVER_IN_FLIGHT = int(os.getenv('ADMISSION_RECOVER_IN_FLIGHT', 4))
+    ADMISSION_DEGRADE_LATENCY_MS = float(os.getenv('ADMISSION_DEGRADE_LATENCY_MS', 3000))
+    ADMISSION_RECOVER_LATENCY_MS = float(os.getenv('ADMISSION_RECOVER_LATENCY_MS', 1500))
+    ADMISSION_MIN_DWELL_SECONDS = float(os.getenv('ADMISSION_MIN_DWELL_SECONDS', 10))
+    
+    # MediaPipe analyzer pool (one exclusive instance per in-flight analysis)
+    ANALYZER_POOL_SIZE = int(os.getenv('ANALYZER_POOL_SIZE', 2))
+    ANALYZER_POOL_TIMEOUT = float(os.getenv('ANALYZER_POOL_TIMEOUT', 10))
+    
+    # Memory budget for in-flight analyses (per process). Each analysis
+    # reserves its estimated peak working set before decoding: the decoded
+    # image plus MEMORY_BYTES_PER_FRAME_PIXEL for every pixel of the resized
+    # frame (RGB/YCrCb copies, pyramid, masks, clustering samples) plus a
+    # fixed overhead. Calibrate against memory.peak_to_estimate in /metrics.
+    MEMORY_BUDGET_MB = int(os.getenv('MEMORY_BUDGET_MB', 1024))
+    MEMORY_BUDGET_TIMEOUT = float(os.getenv('MEMORY_BUDGET_TIMEOUT', 30))
+    MEMORY_BYTES_PER_FRAME_PIXEL = int(os.getenv('MEMORY_BYTES_PER_FRAME_PIXEL', 32))
+    MEMORY_REQUEST_OVERHEAD_MB = int(os.getenv('MEMORY_REQUEST_OVERHEAD_MB', 16))
+    
+    # Vision-only endpoint (/analyze/vision): its own threads, so it never
+    # waits behind LLM-bound requests, and a sampled color clustering
+    VISION_LANE_WORKERS = int(os.getenv('VISION_LANE_WORKERS', 2))
+    VISION_LANE_MAX_QUEUE = int(os.getenv('VISION_LANE_MAX_QUEUE', 16))
+    VISION_ONLY_COLOR_SAMPLES = int(os.getenv('VISION_ONLY_COLOR_SAMPLES', 5000))
+    
+    # Latency objectives (milliseconds) reported under "slos" in /metrics
+    VISION_SLO_MS = float(os.getenv('VISION_SLO_MS', 100))
+    LLM_SLO_MS = float(os.getenv('LLM_SLO_MS', 8000))
+    
+    # Async serving mode (async_app.py): CPU-bound vision stages run on a
+    # small executor while LLM calls wait on the event loop
+    VISION_EXECUTOR_WORKERS = int(os.getenv('VISION_EXECUTOR_WORKERS', 2))
+    LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', 256))
+    
+    # Prefork server (gunicorn.conf.py). 0 = size from CPU count and the
+    # measured per-request CPU/wall time (see calibrate_workers.py)
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 0))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 0))
+    REQUEST_CPU_MS = float(os.getenv('REQUEST_CPU_MS', 0)) or None
+    REQUEST_WALL_MS = float(os.getenv('REQUEST_WALL_MS', 0)) or None
+    WORKER_STATS_DIR = os.getenv('WORKER_STATS_DIR', os.path.join(tempfile.gettempdir(), 'outfevibe-workers'))
+    
+    # Stored analyses for re-recommendation without re-uploading (per process)
+    ANALYSIS_STORE_SIZE = int(os.getenv('ANALYSIS_STORE_SIZE', 10000))
+    ANALYSIS_STORE_TTL = float(os.getenv('ANALYSIS_STORE_TTL', 3600))
+    
+    # Near-duplicate uploads (re-compressed, resized, lightly cropped or
+    # edited) reuse a stored analysis found by perceptual-hash distance
+    NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+    NEAR_DUPLICATE_RADIUS = int(os.getenv('NEAR_DUPLICATE_RADIUS', 6))  # Bits out of 64
+    # A hash match is only reused if the images' aspect ratios and color
+    # thumbnails agree too (mean per-channel difference, 0-255)
+    NEAR_DUPLICATE_MAX_COLOR_DIFF = float(os.getenv('NEAR_DUPLICATE_MAX_COLOR_DIFF', 6))
+    NEAR_DUPLICATE_MAX_ASPECT_DIFF = float(os.getenv('NEAR_DUPLICATE_MAX_ASPECT_DIFF', 0.02))  # Relative
+    NEAR_DUPLICATE_INDEX_SIZE = int(os.getenv('NEAR_DUPLICATE_INDEX_SIZE', 50000))
+    NEAR_DUPLICATE_INDEX_PATH = os.getenv('NEAR_DUPLICATE_INDEX_PATH', 'data/near_duplicates.json')
+    
+    # Host-wide cache of analyses and Gemini outputs shared by all worker
+    # processes (SQLite in WAL mode); empty path disables it
+    SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'outfevibe-cache.db'))
+    SHARED_CACHE_MAX_ENTRIES = int(os.getenv('SHARED_CACHE_MAX_ENTRIES', 50000))
+    SHARED_CACHE_LEASE_SECONDS = float(os.getenv('SHARED_CACHE_LEASE_SECONDS', 60))
+    SHARED_CACHE_POLL_INTERVAL = float(os.getenv('SHARED_CACHE_POLL_INTERVAL', 0.05))
+    
+    # Dress design generation: 'parallel' (one Gemini call per design, each
+    # with its own style direction) or 'single' (all designs in one call)
+    DRESS_GENERATION_MODE = os.getenv('DRESS_GENERATION_MODE', 'parallel')
+    DRESS_DESIGN_COUNT = int(os.getenv('DRESS_DESIGN_COUNT', 3))
+    DRESS_PARALLEL_WORKERS = int(os.getenv('DRESS_PARALLEL_WORKERS', 16))
+    DRESS_STYLE_DIRECTIONS = [
+        'classic and elegant, timeless tailoring',
+        'modern minimalist, clean architectural lines',
+        'romantic and expressive, soft textures and statement details',
+        'relaxed bohemian, flowing layers',
+        'bold contemporary, striking color blocking'
+    ]
+    
+    # Local palette engine: recommended_colors come from seasonal color tables
+    # instead of Gemini, which then only generates categories and tips
+    PALETTE_ENGINE_ENABLED = os.getenv('PALETTE_ENGINE_ENABLED', 'true').lower() == 'true'
+    PALETTE_SIZE = int(os.getenv('PALETTE_SIZE', 8))
+    
+    # Product catalog color index (/catalog/match), built offline with
+    # build_catalog_index.py; empty path or no index disables the endpoint
+    CATALOG_INDEX_PATH = os.getenv('CATALOG_INDEX_PATH', 'data/catalog_index')
+    CATALOG_CELL_SIZE = float(os.getenv('CATALOG_CELL_SIZE', 6))  # Lab units per grid cell
+    CATALOG_MAX_DELTA_E = float(os.getenv('CATALOG_MAX_DELTA_E', 20))  # Farthest match searched
+    CATALOG_MATCHES_PER_COLOR = int(os.getenv('CATALOG_MATCHES_PER_COLOR', 5))
+    CATALOG_MAX_MATCHES = int(os.getenv('CATALOG_MAX_MATCHES', 50))
+    CATALOG_MAX_COLORS = int(os.getenv('CATALOG_MAX_COLORS', 16))  # Query colors per request
+    CATALOG_COLORS_PER_PRODUCT = int(os.getenv('CATALOG_COLORS_PER_PRODUCT', 3))
+    CATALOG_COLOR_SAMPLES = int(os.getenv('CATALOG_COLOR_SAMPLES', 2000))
+    CATALOG_IMAGE_SIZE = int(os.getenv('CATALOG_IMAGE_SIZE', 256))
+    
+    # Lookbook (/lookbook): personalization variants per request, and how
+    # many variants one Gemini call generates
+    LOOKBOOK_MAX_VARIANTS = int(os.getenv('LOOKBOOK_MAX_VARIANTS', 12))
+    LOOKBOOK_BATCH_SIZE = int(os.getenv('LOOKBOOK_BATCH_SIZE', 6))
+    
+    # Recommendation cache (per process)
+    RECOMMENDATION_CACHE_SIZE = int(os.getenv('RECOMMENDATION_CACHE_SIZE', 1024))
+    
     # API Keys
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'models/gemini-flash-latest')
+    
+    # Structured output: Gemini returns JSON constrained to each generation's
+    # response schema. Output caps bound generation length per kind (thinking
+    # models count their thinking tokens against the cap too).
+    GEMINI_STRUCTURED_OUTPUT = os.getenv('GEMINI_STRUCTURED_OUTPUT', 'true').lower() == 'true'
+    GEMINI_MAX_OUTPUT_TOKENS = {
+        'recommendations': int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS_RECOMMENDATIONS', 2048)),
+        'dress': int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS_DRESS', 4096)),
+        'dress_design': int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS_DRESS_DESIGN', 2048)),
+        'lookbook': int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS_LOOKBOOK', 4096))
+    }
+    
+    # Store the constant prompt instructions as Gemini context caches instead
+    # of sending them with every call. Needs a model version with caching
+    # support and instructions above its minimum cache size; otherwise the
+    # service falls back to plain system instructions.
+    GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'false').lower() == 'true'
+    GEMINI_CONTEXT_CACHE_TTL = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', 3600))
     
     # Supabase (Optional)
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+    SUPABASE_TABLE = os.getenv('SUPABASE_TABLE', 'analyses')
+    
+    # Analysis history (write-behind): 'sqlite', 'supabase' or 'none'
+    PERSISTENCE_BACKEND = os.getenv('PERSISTENCE_BACKEND', 'sqlite')
+    PERSISTENCE_SQLITE_PATH = os.getenv('PERSISTENCE_SQLITE_PATH', 'data/analyses.db')
+    PERSISTENCE_QUEUE_SIZE = int(os.getenv('PERSISTENCE_QUEUE_SIZE', 1000))
+    PERSISTENCE_BATCH_SIZE = int(os.getenv('PERSISTENCE_BATCH_SIZE', 100))
+    PERSISTENCE_FLUSH_INTERVAL = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', 1.0))
+    PERSISTENCE_OVERFLOW = os.getenv('PERSISTENCE_OVERFLOW', 'spill')  # or 'drop'
+    PERSISTENCE_SPILL_PATH = os.getenv('PERSISTENCE_SPILL_PATH', 'data/persistence_spill.jsonl')
     
     # Server
     HOST = os.getenv('HOST', '0.0.0.0')
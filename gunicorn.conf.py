@@ -0,0 +1,67 @@
+"""
+Production launcher settings
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master imports the app and preloads read-only assets (skin lookup table,
+imported libraries) once; workers share those pages copy-on-write. MediaPipe
+graphs and the Gemini client are built in each worker after fork.
+
+Worker/thread counts come from WEB_WORKERS / WEB_THREADS, or are sized from
+the CPU count and REQUEST_CPU_MS / REQUEST_WALL_MS (measure them with
+calibrate_workers.py).
+
+Graceful reload:
+    kill -HUP <master>    re-fork workers (new settings, fresh models)
+    kill -USR2 <master>   start a new master with new code, then
+    kill -QUIT <old>      drain and stop the old one
+"""
+import gc
+import os
+
+from config import Config
+from utils import plan_workers, WorkerStats
+
+_plan = plan_workers(os.cpu_count() or 1, Config.REQUEST_CPU_MS, Config.REQUEST_WALL_MS)
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.WEB_WORKERS or _plan['workers']
+threads = Config.WEB_THREADS or _plan['threads']
+worker_class = 'gthread'
+
+# Import the app in the master so preloaded assets are shared
+preload_app = True
+
+# Requests wait on the LLM for several seconds
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth
+max_requests = 1000
+max_requests_jitter = 100
+
+
+def when_ready(server):
+    """Master is up: preload shared assets before the first fork"""
+    from app import preload_shared_assets
+
+    preload_shared_assets()
+    # Keep the garbage collector from touching (and copying) preloaded pages
+    gc.freeze()
+    server.log.info(
+        f"Serving with {workers} worker(s) x {threads} thread(s)"
+        + (f", estimated CPU capacity {_plan['capacity_rps']} req/s" if _plan['capacity_rps'] else "")
+    )
+
+
+def post_fork(server, worker):
+    """Build MediaPipe graphs and the LLM client inside the worker"""
+    from app import init_services
+
+    init_services()
+
+
+def child_exit(server, worker):
+    """Forget the stats of a worker that exited"""
+    WorkerStats(Config.WORKER_STATS_DIR).remove(worker.pid)
@@ -0,0 +1,216 @@
+"""
+Sweep per-stage resolutions over a set of sample images
+
+For every stage (pose, face, skin, clothing) and every candidate size, the
+stage is re-run at that size while the other stages stay at full resolution.
+The report shows how often the categorical outputs match the full-resolution
+baseline, the mean dominant-color distance (CIE76 delta E) and the stage
+latency, so Config.STAGE_RESOLUTIONS can be tuned with evidence.
+
+Usage:
+    python resolution_sweep.py /path/to/images [--sizes 800x1200,400x600,200x300]
+                               [--stages pose,face,skin,clothing] [--limit 100]
+                               [--json report.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from config import Config
+from services import ImageProcessor, MediaPipeAnalyzer, ColorAnalyzer, ResolutionPolicy
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+def parse_sizes(text):
+    """Parse "800x1200,400x600" into [(800, 1200), (400, 600)]"""
+    sizes = []
+    for item in text.split(','):
+        width, height = item.lower().split('x')
+        sizes.append((int(width), int(height)))
+    return sizes
+
+
+def list_images(image_dir, limit=None):
+    """Image files in a directory, sorted for repeatable runs"""
+    paths = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+    return paths[:limit] if limit else paths
+
+
+def hex_to_lab(hex_colors):
+    """Convert hex colors to an (N, 3) CIE Lab array"""
+    rgb = np.array(
+        [[int(h[i:i + 2], 16) for i in (1, 3, 5)] for h in hex_colors],
+        dtype=np.float32
+    ).reshape(-1, 1, 3) / 255.0
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2Lab).reshape(-1, 3)
+
+
+def color_distance(baseline_hex, candidate_hex):
+    """Symmetric mean nearest-color delta E between two palettes"""
+    if not baseline_hex or not candidate_hex:
+        return None
+
+    a = hex_to_lab(baseline_hex)
+    b = hex_to_lab(candidate_hex)
+    distances = np.linalg.norm(a[:, None, :] - b[None, :, :], axis=2)
+    return float((distances.min(axis=1).mean() + distances.min(axis=0).mean()) / 2)
+
+
+class StageRunner:
+    """Run single analysis stages at a chosen resolution"""
+
+    def __init__(self):
+        self.mediapipe_analyzer = MediaPipeAnalyzer()
+        self.color_analyzer = ColorAnalyzer()
+
+    def run(self, image, stage, size, pose_landmarks):
+        """
+        Run one stage on a fresh frame
+
+        Args:
+            image: Decoded BGR image
+            stage: Stage name
+            size: (max_width, max_height) for the stage
+            pose_landmarks: Baseline pose landmarks for dependent stages
+
+        Returns:
+            tuple: (stage outputs dict, elapsed milliseconds)
+        """
+        frame = ImageProcessor.create_frame(image)
+        frame.rgb  # Decode-side conversion is not part of the stage cost
+        policy = ResolutionPolicy({stage: size})
+
+        start = time.perf_counter()
+        if stage == 'pose':
+            body_shape, _ = self.mediapipe_analyzer.analyze_pose(policy.image(frame, 'pose'))
+            outputs = {'body_shape': body_shape}
+        elif stage == 'face':
+            face_shape = self.mediapipe_analyzer.analyze_face_shape(policy.image(frame, 'face'), pose_landmarks)
+            outputs = {'face_shape': face_shape}
+        elif stage == 'skin':
+            skin_tone, undertone = self.color_analyzer.analyze_skin(
+                frame, None, pose_landmarks, policy.level(frame, 'skin')
+            )
+            outputs = {'skin_tone': skin_tone, 'undertone': undertone}
+        else:
+            colors = self.color_analyzer.analyze_clothing(
+                frame, None, pose_landmarks, policy.level(frame, 'clothing'),
+                ResolutionPolicy().level(frame, 'skin')
+            )
+            outputs = {'dominant_colors': [ColorAnalyzer.rgb_to_hex(c) for c in colors]}
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        return outputs, elapsed_ms
+
+
+def sweep(paths, stages, sizes):
+    """
+    Run the sweep
+
+    Returns:
+        list: One report row per (stage, size)
+    """
+    runner = StageRunner()
+    full_size = (Config.IMAGE_MAX_WIDTH, Config.IMAGE_MAX_HEIGHT)
+    rows = {(stage, size): {'latencies': [], 'matches': {}, 'distances': []}
+            for stage in stages for size in sizes}
+
+    for index, path in enumerate(paths, 1):
+        image = ImageProcessor.load_image(path)
+
+        # Full-resolution baseline (pose landmarks feed the dependent stages)
+        baseline_frame = ImageProcessor.create_frame(image)
+        _, pose_landmarks = runner.mediapipe_analyzer.analyze_pose(baseline_frame.rgb)
+        baseline = {}
+        for stage in stages:
+            outputs, _ = runner.run(image, stage, full_size, pose_landmarks)
+            baseline.update(outputs)
+
+        for stage in stages:
+            for size in sizes:
+                outputs, elapsed_ms = runner.run(image, stage, size, pose_landmarks)
+                row = rows[(stage, size)]
+                row['latencies'].append(elapsed_ms)
+
+                for key, value in outputs.items():
+                    if key == 'dominant_colors':
+                        distance = color_distance(baseline[key], value)
+                        if distance is not None:
+                            row['distances'].append(distance)
+                    else:
+                        row['matches'].setdefault(key, []).append(value == baseline[key])
+
+        print(f"  [{index}/{len(paths)}] {os.path.basename(path)}", file=sys.stderr)
+
+    report = []
+    for (stage, size), row in rows.items():
+        entry = {
+            'stage': stage,
+            'size': f"{size[0]}x{size[1]}",
+            'images': len(row['latencies']),
+            'latency_ms_mean': round(float(np.mean(row['latencies'])), 2) if row['latencies'] else None,
+            'latency_ms_p95': round(float(np.percentile(row['latencies'], 95)), 2) if row['latencies'] else None
+        }
+        for key, values in row['matches'].items():
+            entry[f'{key}_agreement'] = round(float(np.mean(values)), 4)
+        if row['distances']:
+            entry['dominant_colors_delta_e'] = round(float(np.mean(row['distances'])), 2)
+        report.append(entry)
+
+    return report
+
+
+def print_report(report):
+    """Print the sweep as a table"""
+    print(f"\n{'stage':<10}{'size':>11}{'mean ms':>10}{'p95 ms':>10}  outputs vs full resolution")
+    print("-" * 80)
+    for entry in report:
+        quality = ", ".join(
+            f"{key}={value}" for key, value in entry.items()
+            if key.endswith('_agreement') or key.endswith('_delta_e')
+        )
+        print(f"{entry['stage']:<10}{entry['size']:>11}{entry['latency_ms_mean']:>10}{entry['latency_ms_p95']:>10}  {quality}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage resolution accuracy vs latency sweep")
+    parser.add_argument('image_dir', help="Directory of sample images")
+    parser.add_argument('--sizes', default="800x1200,600x900,400x600,200x300",
+                        help="Comma-separated WIDTHxHEIGHT targets")
+    parser.add_argument('--stages', default=",".join(ResolutionPolicy.STAGES),
+                        help="Comma-separated stages to sweep")
+    parser.add_argument('--limit', type=int, help="Maximum number of images")
+    parser.add_argument('--json', help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    paths = list_images(args.image_dir, args.limit)
+    if not paths:
+        print(f"✗ No images found in {args.image_dir}")
+        sys.exit(1)
+
+    stages = [s.strip() for s in args.stages.split(',')]
+    unknown = set(stages) - set(ResolutionPolicy.STAGES)
+    if unknown:
+        print(f"✗ Unknown stages: {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    report = sweep(paths, stages, parse_sizes(args.sizes))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
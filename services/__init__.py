@@ -1,6 +1,31 @@
+from .frame import Frame
 from .image_processing import ImageProcessor
 from .mediapipe_analysis import MediaPipeAnalyzer
 from .color_analysis import ColorAnalyzer
+from .skin_mask import SkinMaskEngine
+from .palette_engine import PaletteEngine
 from .gemini_service import GeminiService
+from .resolution import ResolutionPolicy
+from .pipeline import VisionPipeline
+from .admission import AdmissionController
+from .analyzer_pool import AnalyzerPool, PoolTimeoutError
+from .analysis_result import AnalysisResult
+from .analysis_store import AnalysisStore
+from .duplicate_index import NearDuplicateIndex
+from .catalog_index import CatalogColorIndex, extract_product_colors, load_catalog_index
+from .shared_cache import SharedCache, create_shared_cache
+from .lanes import ExecutorLane, LaneFullError
+from .memory_budget import MemoryBudget, MemoryBudgetError, MemoryReservation
+from .persistence import (
+    AnalysisPersistence, SQLiteBackend, SupabaseBackend, create_persistence, build_record
+)
 
-__all__ = ['ImageProcessor', 'MediaPipeAnalyzer', 'ColorAnalyzer', 'GeminiService']
+__all__ = [
+    'ImageProcessor', 'MediaPipeAnalyzer', 'ColorAnalyzer', 'PaletteEngine', 'GeminiService',
+    'VisionPipeline', 'AdmissionController', 'SkinMaskEngine', 'Frame',
+    'ResolutionPolicy', 'AnalyzerPool', 'PoolTimeoutError',
+    'AnalysisResult', 'AnalysisStore', 'NearDuplicateIndex',
+    'CatalogColorIndex', 'extract_product_colors', 'load_catalog_index', 'SharedCache', 'create_shared_cache', 'ExecutorLane', 'LaneFullError',
+    'MemoryBudget', 'MemoryBudgetError', 'MemoryReservation',
+    'AnalysisPersistence', 'SQLiteBackend', 'SupabaseBackend', 'create_persistence', 'build_record'
+]
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics, RollingWindow
+
+logger = setup_logger(__name__)
+
+class AdmissionController:
+    """Admit requests and pick a quality tier based on current load"""
+
+    # Recent samples per stage used for the latency signal
+    LATENCY_WINDOW = 64
+
+    # Stages that wait on upstream services rather than this server's CPU;
+    # Gemini latency alone would otherwise degrade an idle server (it is
+    # tracked separately by the llm SLO)
+    UPSTREAM_STAGES = frozenset({'llm'})
+
+    def __init__(self, tiers=None, max_concurrent=None):
+        """
+        Initialize the controller
+
+        Args:
+            tiers: Ordered list of tier dicts, best first (defaults to Config.QUALITY_TIERS)
+            max_concurrent: Requests processed at once; the rest queue
+        """
+        self.tiers = tiers or Config.QUALITY_TIERS
+        self.max_concurrent = max_concurrent or Config.ADMISSION_MAX_CONCURRENT
+        # In-flight requests never exceed max_concurrent, so a threshold at or
+        # above it could never trigger
+        self.degrade_in_flight = min(Config.ADMISSION_DEGRADE_IN_FLIGHT, max(self.max_concurrent - 1, 1))
+        self.recover_in_flight = min(Config.ADMISSION_RECOVER_IN_FLIGHT, self.degrade_in_flight)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        # Created on first use so it binds to the serving event loop
+        self._async_slots = None
+        self._lock = threading.Lock()
+        self._queue_depth = 0
+        self._in_flight = 0
+        self._tier_index = 0
+        self._last_change = time.monotonic()
+        self._stage_windows = {}
+
+    @property
+    def current_tier(self):
+        """Tier that new requests are currently admitted at"""
+        return self.tiers[self._tier_index]
+
+    def record_stage(self, stage, elapsed_ms):
+        """
+        Record a stage latency for the pressure signal
+
+        Upstream stages (UPSTREAM_STAGES) are ignored.
+
+        Args:
+            stage: Stage name (decode, pose, face, color, llm)
+            elapsed_ms: Stage duration in milliseconds
+        """
+        if stage in self.UPSTREAM_STAGES:
+            return
+        with self._lock:
+            window = self._stage_windows.get(stage)
+            if window is None:
+                window = RollingWindow(self.LATENCY_WINDOW)
+                self._stage_windows[stage] = window
+        window.add(elapsed_ms)
+
+    def _stage_latency_ms(self):
+        """Sum of recent p95 latencies of the local (CPU) stages"""
+        return sum(window.percentile(95) for window in self._stage_windows.values())
+
+    def _evaluate(self):
+        """
+        Move one tier down or up if pressure crosses the thresholds
+
+        Degrading happens as soon as any signal is above its degrade threshold.
+        Recovering requires every signal to be at or below its (lower) recover
+        threshold, and both directions respect a minimum dwell time.
+        """
+        now = time.monotonic()
+        if now - self._last_change < Config.ADMISSION_MIN_DWELL_SECONDS:
+            return
+
+        latency_ms = self._stage_latency_ms()
+
+        overloaded = (
+            self._queue_depth > Config.ADMISSION_DEGRADE_QUEUE_DEPTH or
+            self._in_flight > self.degrade_in_flight or
+            latency_ms > Config.ADMISSION_DEGRADE_LATENCY_MS
+        )
+        relaxed = (
+            self._queue_depth <= Config.ADMISSION_RECOVER_QUEUE_DEPTH and
+            self._in_flight <= self.recover_in_flight and
+            latency_ms <= Config.ADMISSION_RECOVER_LATENCY_MS
+        )
+
+        new_index = self._tier_index
+        if overloaded and self._tier_index < len(self.tiers) - 1:
+            new_index = self._tier_index + 1
+        elif relaxed and self._tier_index > 0:
+            new_index = self._tier_index - 1
+
+        if new_index != self._tier_index:
+            logger.warning(
+                f"Quality tier {self.tiers[self._tier_index]['name']} -> {self.tiers[new_index]['name']} "
+                f"(queue: {self._queue_depth}, in flight: {self._in_flight}, stage p95 sum: {latency_ms:.0f}ms)"
+            )
+            self._tier_index = new_index
+            self._last_change = now
+            # Measure the new tier on its own latencies
+            self._stage_windows = {}
+            metrics.set_gauge('admission.tier_index', new_index)
+
+    def _enqueue(self):
+        """Count a waiting request and pick its tier"""
+        with self._lock:
+            self._queue_depth += 1
+            self._evaluate()
+            tier = self.current_tier
+            metrics.set_gauge('admission.queue_depth', self._queue_depth)
+        return tier
+
+    def _start(self, tier):
+        """Move a request from the queue to in flight"""
+        with self._lock:
+            self._queue_depth -= 1
+            self._in_flight += 1
+            metrics.set_gauge('admission.queue_depth', self._queue_depth)
+            metrics.set_gauge('admission.in_flight', self._in_flight)
+        metrics.incr(f"admission.tier.{tier['name']}")
+
+    def _finish(self):
+        """Count a request as done"""
+        with self._lock:
+            self._in_flight -= 1
+            metrics.set_gauge('admission.in_flight', self._in_flight)
+
+    @contextmanager
+    def admit(self):
+        """
+        Wait for a processing slot and pick the tier for this request
+
+        Yields:
+            dict: Quality tier settings for the request
+        """
+        tier = self._enqueue()
+        self._slots.acquire()
+        self._start(tier)
+
+        try:
+            yield tier
+        finally:
+            self._slots.release()
+            self._finish()
+
+    @asynccontextmanager
+    async def admit_async(self):
+        """
+        Async variant of admit() that waits without blocking the event loop
+
+        Yields:
+            dict: Quality tier settings for the request
+        """
+        tier = self._enqueue()
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrent)
+
+        try:
+            await self._async_slots.acquire()
+        except BaseException:
+            # Cancelled while queued
+            with self._lock:
+                self._queue_depth -= 1
+                metrics.set_gauge('admission.queue_depth', self._queue_depth)
+            raise
+        self._start(tier)
+
+        try:
+            yield tier
+        finally:
+            self._async_slots.release()
+            self._finish()
@@ -0,0 +1,160 @@
+import struct
+
+# Label tables: a label's code is its index, so never reorder, only append
+BODY_SHAPES = ('unknown', 'rectangle', 'triangle', 'inverted_triangle', 'oval', 'hourglass')
+FACE_SHAPES = ('unknown', 'oval', 'round', 'square', 'heart', 'long')
+SKIN_TONES = ('unknown', 'very_light', 'light', 'medium', 'tan', 'dark', 'very_dark')
+UNDERTONES = ('unknown', 'warm', 'cool', 'neutral')
+
+_CODES = {
+    table: {label: code for code, label in enumerate(table)}
+    for table in (BODY_SHAPES, FACE_SHAPES, SKIN_TONES, UNDERTONES)
+}
+
+
+def _code(table, label, field):
+    try:
+        return _CODES[table][label]
+    except KeyError:
+        raise ValueError(f"Unknown {field}: {label!r}") from None
+
+
+class AnalysisResult:
+    """Compact form of a physical attribute analysis
+
+    Labels are small-int codes into the tables above and dominant colors are
+    24-bit RGB ints. The binary layout is fixed:
+
+        byte 0   body shape code
+        byte 1   face shape code
+        byte 2   skin tone code
+        byte 3   undertone code
+        byte 4   number of colors (n)
+        5..5+3n  colors, 3 bytes each, big-endian RGB
+
+    so an analysis with three colors is 14 bytes. to_dict() returns exactly
+    the JSON shape the analyzers produce.
+    """
+
+    __slots__ = ('body_shape', 'face_shape', 'skin_tone', 'undertone', 'colors')
+
+    HEADER = struct.Struct('5B')
+
+    def __init__(self, body_shape=0, face_shape=0, skin_tone=0, undertone=0, colors=()):
+        """
+        Args:
+            body_shape: Code into BODY_SHAPES
+            face_shape: Code into FACE_SHAPES
+            skin_tone: Code into SKIN_TONES
+            undertone: Code into UNDERTONES
+            colors: Dominant colors as 0xRRGGBB ints
+        """
+        self.body_shape = body_shape
+        self.face_shape = face_shape
+        self.skin_tone = skin_tone
+        self.undertone = undertone
+        self.colors = tuple(colors)
+
+    @classmethod
+    def from_dict(cls, analysis):
+        """
+        Build from the analyzers' dict
+
+        Args:
+            analysis: Dict with body_shape, face_shape, skin_tone, undertone
+                and dominant_colors ('#rrggbb' strings)
+
+        Returns:
+            AnalysisResult
+
+        Raises:
+            ValueError: If a label is not in its table or a color is not '#rrggbb'
+        """
+        colors = []
+        for color in analysis.get('dominant_colors', []):
+            if len(color) != 7 or color[0] != '#':
+                raise ValueError(f"Invalid color: {color!r}")
+            colors.append(int(color[1:], 16))
+
+        return cls(
+            _code(BODY_SHAPES, analysis.get('body_shape', 'unknown'), 'body shape'),
+            _code(FACE_SHAPES, analysis.get('face_shape', 'unknown'), 'face shape'),
+            _code(SKIN_TONES, analysis.get('skin_tone', 'unknown'), 'skin tone'),
+            _code(UNDERTONES, analysis.get('undertone', 'unknown'), 'undertone'),
+            colors
+        )
+
+    def to_dict(self):
+        """
+        Expand to the JSON response shape
+
+        Returns:
+            dict: body_shape, face_shape, skin_tone, undertone, dominant_colors
+        """
+        return {
+            'body_shape': BODY_SHAPES[self.body_shape],
+            'face_shape': FACE_SHAPES[self.face_shape],
+            'skin_tone': SKIN_TONES[self.skin_tone],
+            'undertone': UNDERTONES[self.undertone],
+            'dominant_colors': ['#{:06x}'.format(color) for color in self.colors]
+        }
+
+    def to_bytes(self):
+        """
+        Encode to the fixed binary layout
+
+        Returns:
+            bytes: 5 + 3 * len(colors) bytes
+        """
+        header = self.HEADER.pack(
+            self.body_shape, self.face_shape, self.skin_tone, self.undertone, len(self.colors)
+        )
+        return header + b''.join(color.to_bytes(3, 'big') for color in self.colors)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Decode the fixed binary layout
+
+        Args:
+            data: Bytes from to_bytes()
+
+        Returns:
+            AnalysisResult
+
+        Raises:
+            ValueError: If the data is truncated or a code is out of range
+        """
+        if len(data) < cls.HEADER.size:
+            raise ValueError("Truncated analysis record")
+        body, face, skin, undertone, count = cls.HEADER.unpack_from(data)
+        end = cls.HEADER.size + 3 * count
+        if len(data) < end:
+            raise ValueError("Truncated analysis record")
+        if body >= len(BODY_SHAPES) or face >= len(FACE_SHAPES) or \
+                skin >= len(SKIN_TONES) or undertone >= len(UNDERTONES):
+            raise ValueError("Unknown code in analysis record")
+
+        colors = [int.from_bytes(data[i:i + 3], 'big') for i in range(cls.HEADER.size, end, 3)]
+        return cls(body, face, skin, undertone, colors)
+
+    @classmethod
+    def encode(cls, analysis):
+        """Analyzer dict straight to bytes (codec interface for caches)"""
+        return cls.from_dict(analysis).to_bytes()
+
+    @classmethod
+    def decode(cls, data):
+        """Bytes straight to the analyzer dict (codec interface for caches)"""
+        return cls.from_bytes(data).to_dict()
+
+    def __eq__(self, other):
+        if not isinstance(other, AnalysisResult):
+            return NotImplemented
+        return self.to_bytes() == other.to_bytes()
+
+    def __hash__(self):
+        return hash(self.to_bytes())
+
+    def __repr__(self):
+        return f"AnalysisResult({self.to_dict()})"
@@ -0,0 +1,131 @@
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from .analysis_result import AnalysisResult
+
+logger = setup_logger(__name__)
+
+
+class StoredAnalysis:
+    """Shared cache codec for AnalysisStore entries
+
+    Layout: expiry (unix time, 8-byte float), tier name length and UTF-8
+    bytes, then the AnalysisResult bytes.
+    """
+
+    HEADER = struct.Struct('!dB')
+
+    @classmethod
+    def encode(cls, entry):
+        """(analysis dict, quality tier, expiry) to bytes"""
+        analysis, quality_tier, expires = entry
+        tier = (quality_tier or '').encode()
+        return cls.HEADER.pack(expires, len(tier)) + tier + AnalysisResult.encode(analysis)
+
+    @classmethod
+    def decode(cls, data):
+        """Inverse of encode()"""
+        expires, length = cls.HEADER.unpack_from(data)
+        start = cls.HEADER.size
+        tier = data[start:start + length].decode() or None
+        return AnalysisResult.decode(data[start + length:]), tier, expires
+
+
+class AnalysisStore:
+    """Bounded store of recent analyses, keyed by analysis_id
+
+    Lets clients ask for new recommendations with different personalization
+    without re-uploading the image. Entries expire after a TTL and the least
+    recently used entry is evicted when the store is full. Analyses are kept
+    in AnalysisResult's binary form (tens of bytes each).
+
+    With a shared cache the entries live in its SQLite file, so an ID issued
+    by one worker process resolves on every other worker of the host (and
+    the cache's own size limit applies). Without one, or while the file is
+    unavailable, entries are kept in this process only.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, shared_cache=None):
+        """
+        Args:
+            max_entries: Maximum stored analyses in process (defaults to Config.ANALYSIS_STORE_SIZE)
+            ttl_seconds: Lifetime of an entry (defaults to Config.ANALYSIS_STORE_TTL)
+            shared_cache: Optional SharedCache holding the entries for all workers
+        """
+        self.max_entries = max_entries or Config.ANALYSIS_STORE_SIZE
+        self.ttl_seconds = ttl_seconds or Config.ANALYSIS_STORE_TTL
+        self.shared_cache = shared_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, analysis, quality_tier=None):
+        """
+        Store an analysis
+
+        Args:
+            analysis: Physical attribute analysis
+            quality_tier: Name of the tier that produced it
+
+        Returns:
+            str: New analysis_id
+        """
+        analysis_id = uuid.uuid4().hex
+        if self.shared_cache is not None:
+            try:
+                key = self.shared_cache.make_key('analysis_id', analysis_id)
+                entry = (analysis, quality_tier, time.time() + self.ttl_seconds)
+                self.shared_cache.put(key, entry, StoredAnalysis)
+                return analysis_id
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Shared cache unavailable, storing analysis in process: {str(e)}")
+                metrics.incr('analysis_store.errors')
+
+        # (encoded analysis, quality tier, expiry)
+        entry = (AnalysisResult.encode(analysis), quality_tier, time.monotonic() + self.ttl_seconds)
+
+        with self._lock:
+            self._entries[analysis_id] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr('analysis_store.evicted')
+            metrics.set_gauge('analysis_store.size', len(self._entries))
+
+        return analysis_id
+
+    def get(self, analysis_id):
+        """
+        Look up a stored analysis
+
+        Args:
+            analysis_id: ID returned by put()
+
+        Returns:
+            dict: Stored analysis, or None if unknown or expired
+        """
+        if self.shared_cache is not None:
+            try:
+                key = self.shared_cache.make_key('analysis_id', analysis_id)
+                entry = self.shared_cache.get(key, StoredAnalysis)
+                if entry is not None and entry[2] >= time.time():
+                    metrics.incr('analysis_store.hits')
+                    return entry[0]
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Shared cache unavailable, looking up analysis in process: {str(e)}")
+                metrics.incr('analysis_store.errors')
+
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is not None and entry[2] < time.monotonic():
+                del self._entries[analysis_id]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(analysis_id)
+
+        metrics.incr('analysis_store.hits' if entry else 'analysis_store.misses')
+        return AnalysisResult.decode(entry[0]) if entry else None
@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from .mediapipe_analysis import MediaPipeAnalyzer
+
+logger = setup_logger(__name__)
+
+class PoolTimeoutError(Exception):
+    """Raised when no analyzer is free within the check-out timeout"""
+
+
+class AnalyzerPool:
+    """Fixed-size pool of MediaPipeAnalyzer instances for threaded servers
+
+    MediaPipe graphs are not safe to share between threads, so each request
+    checks out an exclusive analyzer and returns it when done.
+    """
+
+    def __init__(self, size=None, factory=MediaPipeAnalyzer, timeout=None):
+        """
+        Build every analyzer up front
+
+        Args:
+            size: Number of analyzers (defaults to Config.ANALYZER_POOL_SIZE)
+            factory: Zero-argument callable creating an analyzer
+            timeout: Default check-out timeout in seconds
+                (defaults to Config.ANALYZER_POOL_TIMEOUT)
+        """
+        self.size = size or Config.ANALYZER_POOL_SIZE
+        self.timeout = timeout if timeout is not None else Config.ANALYZER_POOL_TIMEOUT
+
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+        for _ in range(self.size):
+            analyzer = factory()
+            self._all.append(analyzer)
+            self._idle.put(analyzer)
+
+        metrics.set_gauge('analyzer_pool.size', self.size)
+        metrics.set_gauge('analyzer_pool.available', self.size)
+        logger.info(f"Analyzer pool ready with {self.size} instance(s)")
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        Borrow an analyzer for the duration of a block
+
+        Args:
+            timeout: Seconds to wait for a free analyzer (defaults to the pool's)
+
+        Yields:
+            MediaPipeAnalyzer: Analyzer reserved for the caller
+
+        Raises:
+            PoolTimeoutError: If none becomes free in time or the pool is closed
+        """
+        if self._closed:
+            raise PoolTimeoutError("Analyzer pool is closed")
+
+        start = time.perf_counter()
+        try:
+            analyzer = self._idle.get(timeout=self.timeout if timeout is None else timeout)
+        except queue.Empty:
+            metrics.incr('analyzer_pool.timeouts')
+            raise PoolTimeoutError("Timed out waiting for a free analyzer")
+        finally:
+            metrics.observe('analyzer_pool.wait_ms', (time.perf_counter() - start) * 1000.0)
+
+        metrics.set_gauge('analyzer_pool.available', self._idle.qsize())
+        try:
+            yield analyzer
+        finally:
+            with self._lock:
+                if self._closed:
+                    analyzer.close()
+                else:
+                    self._idle.put(analyzer)
+            metrics.set_gauge('analyzer_pool.available', self._idle.qsize())
+
+    def close(self):
+        """Close idle analyzers now and checked-out ones when they are returned"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+
+        logger.info("Analyzer pool closed")
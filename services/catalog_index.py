@@ -0,0 +1,366 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+from config import Config
+from utils.color_space import hex_to_lab, ciede2000
+from utils.image_probe import probe_file
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from .color_analysis import ColorAnalyzer
+from .image_processing import ImageProcessor
+
+logger = setup_logger(__name__)
+
+FORMAT_VERSION = 1
+
+# Lower corner and extent of the Lab grid (OpenCV float Lab: L 0..100, a/b about -128..127)
+GRID_ORIGIN = np.array([0.0, -128.0, -128.0], dtype=np.float32)
+GRID_EXTENT = np.array([100.0, 256.0, 256.0], dtype=np.float32)
+
+# Pixels this close (RGB distance) to the image border's median color are background
+BACKGROUND_TOLERANCE = 30.0
+
+
+def extract_product_colors(image_path, n_colors=None, max_samples=None):
+    """
+    Dominant colors of a catalog product image
+
+    Uses the same K-means as uploads (ColorAnalyzer.get_dominant_color) on a
+    reduced decode, ignoring the studio background (pixels close to the
+    border color) when enough foreground remains.
+
+    Args:
+        image_path: Path to the product image
+        n_colors: Colors per product (defaults to Config.CATALOG_COLORS_PER_PRODUCT)
+        max_samples: Pixels clustered (defaults to Config.CATALOG_COLOR_SAMPLES)
+
+    Returns:
+        list: '#rrggbb' strings
+    """
+    size = Config.CATALOG_IMAGE_SIZE
+    reduction = ImageProcessor.decode_reduction(probe_file(image_path), size, size)
+    image = ImageProcessor.resize_image(ImageProcessor.load_image(image_path, reduction), size, size)
+    rgb = ImageProcessor.convert_to_rgb(image)
+
+    border = np.concatenate([rgb[0], rgb[-1], rgb[:, 0], rgb[:, -1]]).astype(np.float32)
+    background = np.median(border, axis=0)
+    distance = np.linalg.norm(rgb.astype(np.float32) - background, axis=2)
+    mask = (distance > BACKGROUND_TOLERANCE).astype(np.uint8) * 255
+    if np.count_nonzero(mask) < mask.size // 10:
+        mask = None
+
+    colors = ColorAnalyzer.get_dominant_color(
+        rgb, mask,
+        n_colors=n_colors or Config.CATALOG_COLORS_PER_PRODUCT,
+        max_samples=max_samples or Config.CATALOG_COLOR_SAMPLES
+    )
+    return [ColorAnalyzer.rgb_to_hex(color) for color in colors]
+
+
+class CatalogColorIndex:
+    """Nearest-color search over a product catalog, memory-mapped from disk
+
+    Every product color is a point in CIELAB. The points are bucketed into a
+    uniform grid of cells (CATALOG_CELL_SIZE Lab units) and stored sorted by
+    cell, b index innermost, so the cells of one (L, a) row are a single
+    contiguous slice. A query scans the cube of cells around its color and
+    grows the cube one ring at a time until k products lie within the
+    radius the cube is guaranteed to cover (or CATALOG_MAX_DELTA_E is
+    reached). Those candidates are ranked by CIEDE2000.
+
+    The arrays are .npy files opened with mmap_mode='r': every worker
+    process shares the page cache and only touches the cells it queries.
+    """
+
+    # Per color entry, sorted by cell: lab, rgb, product and the product's
+    # category and price (copied so filters read the same slices as lab);
+    # per product: sku, category, price
+    ARRAYS = ('lab', 'rgb', 'product', 'color_category', 'color_price', 'sku', 'category', 'price')
+
+    # Nearest entries per requested product reranked by CIEDE2000
+    SHORTLIST = 8
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: Index directory written by build()
+                (defaults to Config.CATALOG_INDEX_PATH)
+
+        Raises:
+            ValueError: If the directory holds a different format version
+        """
+        self.path = path or Config.CATALOG_INDEX_PATH
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog index version: {meta.get('version')}")
+
+        self.cell_size = meta['cell_size']
+        self.grid = np.array(meta['grid'])
+        self.categories = meta['categories']
+        self._category_codes = {name: code for code, name in enumerate(self.categories)}
+
+        # Offsets are small and hit on every query: keep them in memory
+        self._cell_start = np.load(os.path.join(self.path, 'cell_start.npy'))
+        arrays = {
+            name: np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r') for name in self.ARRAYS
+        }
+        self._lab = arrays['lab']
+        self._rgb = arrays['rgb']
+        self._product = arrays['product']
+        self._color_category = arrays['color_category']
+        self._color_price = arrays['color_price']
+        self._sku = arrays['sku']
+        self._category = arrays['category']
+        self._price = arrays['price']
+
+        logger.info(f"Catalog color index: {len(self._sku)} products, {len(self._lab)} colors")
+
+    def __len__(self):
+        return len(self._sku)
+
+    @staticmethod
+    def grid_shape(cell_size):
+        """Cells along L, a and b"""
+        return np.ceil(GRID_EXTENT / cell_size).astype(np.int64)
+
+    @staticmethod
+    def cells_of(lab, cell_size, grid):
+        """(n, 3) grid coordinates of (n, 3) Lab points"""
+        return np.clip(((lab - GRID_ORIGIN) // cell_size).astype(np.int64), 0, grid - 1)
+
+    def _ring(self, cell, ring):
+        """Color entry indices in the cube of cells within ring of cell"""
+        low = np.maximum(cell - ring, 0)
+        high = np.minimum(cell + ring, self.grid - 1)
+        l_cells, a_cells = np.meshgrid(
+            np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing='ij'
+        )
+        rows = (l_cells.ravel() * self.grid[1] + a_cells.ravel()) * self.grid[2]
+
+        starts = self._cell_start[rows + low[2]]
+        lengths = self._cell_start[rows + high[2] + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        # Concatenated aranges of every (start, length) slice
+        return np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+
+    def _filter(self, entries, category, min_price, max_price):
+        """Mask of color entries whose product passes the filters"""
+        keep = np.ones(len(entries), dtype=bool)
+        if category is not None:
+            keep &= self._color_category[entries] == self._category_codes[category]
+        if min_price is not None or max_price is not None:
+            price = self._color_price[entries]
+            # Unknown (NaN) prices fail any price filter
+            if min_price is not None:
+                keep &= price >= min_price
+            if max_price is not None:
+                keep &= price <= max_price
+        return keep
+
+    def _closest_products(self, products, distance, k):
+        """
+        Indices of the closest color of each of the nearest products
+
+        Only the SHORTLIST * k nearest entries are deduplicated and later
+        reranked by CIEDE2000; all entries are used if that shortlist holds
+        fewer than k distinct products.
+        """
+        shortlist = self.SHORTLIST * k
+        candidates = np.arange(len(distance))
+        if len(distance) > shortlist:
+            candidates = np.argpartition(distance, shortlist)[:shortlist]
+        while True:
+            order = candidates[np.argsort(distance[candidates], kind='stable')]
+            _, first = np.unique(products[order], return_index=True)
+            if len(first) >= k or len(candidates) == len(distance):
+                return order[first]
+            candidates = np.arange(len(distance))
+
+    def nearest(self, hex_color, k=None, category=None, min_price=None, max_price=None, max_distance=None):
+        """
+        Products with a color closest to a query color
+
+        Args:
+            hex_color: '#rrggbb' query color
+            k: Products to return (defaults to Config.CATALOG_MATCHES_PER_COLOR)
+            category: Only products of this category
+            min_price: Only products at or above this price
+            max_price: Only products at or below this price
+            max_distance: Largest Lab distance searched (defaults to Config.CATALOG_MAX_DELTA_E)
+
+        Returns:
+            list: [{"sku", "category", "price", "color", "delta_e"}, ...] closest
+                first (delta_e is CIEDE2000)
+        """
+        k = k or Config.CATALOG_MATCHES_PER_COLOR
+        max_distance = max_distance or Config.CATALOG_MAX_DELTA_E
+        if category is not None and category not in self._category_codes:
+            return []
+
+        query = hex_to_lab([hex_color])[0]
+        cell = self.cells_of(query[None, :], self.cell_size, self.grid)[0]
+        max_ring = int(np.ceil(max_distance / self.cell_size))
+
+        for ring in range(1, max_ring + 1):
+            entries = self._ring(cell, ring)
+            if category is not None or min_price is not None or max_price is not None:
+                entries = entries[self._filter(entries, category, min_price, max_price)]
+            products = self._product[entries]
+
+            lab = self._lab[entries]
+            distance = np.linalg.norm(lab - query, axis=1)
+            # Everything within ring * cell_size of the query lies inside the cube
+            within = distance <= min(ring * self.cell_size, max_distance)
+            entries, products, lab, distance = entries[within], products[within], lab[within], distance[within]
+
+            best = self._closest_products(products, distance, k)
+            if len(best) >= k or ring == max_ring:
+                break
+
+        if len(best) == 0:
+            return []
+
+        delta_e = ciede2000(lab[best], query)
+        top = best[np.argsort(delta_e, kind='stable')[:k]]
+        delta_e = np.sort(delta_e, kind='stable')[:k]
+
+        matches = []
+        for index, score in zip(top, delta_e):
+            product = int(products[index])
+            price = float(self._price[product])
+            matches.append({
+                'sku': str(self._sku[product]),
+                'category': self.categories[self._category[product]] or None,
+                'price': None if np.isnan(price) else round(price, 2),
+                'color': '#{:06x}'.format(int(self._rgb[entries[index]])),
+                'delta_e': round(float(score), 2)
+            })
+        return matches
+
+    def search(self, hex_colors, k=None, category=None, min_price=None, max_price=None):
+        """
+        Nearest products for each of several colors
+
+        Args:
+            hex_colors: '#rrggbb' query colors
+            k: Products per color
+            category: Only products of this category
+            min_price: Only products at or above this price
+            max_price: Only products at or below this price
+
+        Returns:
+            dict: {query color: matches (see nearest())}
+        """
+        start = time.perf_counter()
+        results = {
+            color: self.nearest(color, k, category, min_price, max_price) for color in hex_colors
+        }
+        metrics.observe('catalog.query_ms', (time.perf_counter() - start) * 1000.0)
+        return results
+
+    @classmethod
+    def build(cls, products, path=None, cell_size=None):
+        """
+        Write an index directory
+
+        The new index is written next to the old one and swapped in with a
+        rename; processes that already mapped the old files keep reading
+        them until they reopen the index.
+
+        Args:
+            products: Iterable of dicts with sku, colors ('#rrggbb' list) and
+                optional category and price; products without colors are skipped
+            path: Index directory (defaults to Config.CATALOG_INDEX_PATH)
+            cell_size: Grid cell size in Lab units (defaults to Config.CATALOG_CELL_SIZE)
+
+        Returns:
+            int: Number of indexed products
+        """
+        path = path or Config.CATALOG_INDEX_PATH
+        cell_size = float(cell_size or Config.CATALOG_CELL_SIZE)
+
+        skus, categories, prices, colors, color_product = [], [], [], [], []
+        category_codes = {}
+        for product in products:
+            if not product.get('colors'):
+                continue
+            row = len(skus)
+            skus.append(str(product['sku']))
+            categories.append(category_codes.setdefault(product.get('category') or '', len(category_codes)))
+            price = product.get('price')
+            prices.append(float(price) if price not in (None, '') else np.nan)
+            colors.extend(product['colors'])
+            color_product.extend([row] * len(product['colors']))
+
+        if not skus:
+            raise ValueError("No products with colors to index")
+
+        grid = cls.grid_shape(cell_size)
+        lab = hex_to_lab(colors)
+        coords = cls.cells_of(lab, cell_size, grid)
+        cells = (coords[:, 0] * grid[1] + coords[:, 1]) * grid[2] + coords[:, 2]
+        order = np.argsort(cells, kind='stable')
+
+        color_product = np.array(color_product, dtype=np.int32)[order]
+        categories = np.array(categories, dtype=np.int16)
+        prices = np.array(prices, dtype=np.float32)
+        arrays = {
+            'lab': lab[order],
+            'rgb': np.array([int(color[1:], 16) for color in colors], dtype=np.uint32)[order],
+            'product': color_product,
+            'color_category': categories[color_product],
+            'color_price': prices[color_product],
+            'cell_start': np.searchsorted(cells[order], np.arange(int(np.prod(grid)) + 1)).astype(np.int64),
+            'sku': np.array(skus),
+            'category': categories,
+            'price': prices
+        }
+        meta = {
+            'version': FORMAT_VERSION,
+            'cell_size': cell_size,
+            'grid': grid.tolist(),
+            'categories': list(category_codes),
+            'products': len(skus),
+            'colors': len(colors)
+        }
+
+        temp_path = f"{path.rstrip(os.sep)}.{os.getpid()}.tmp"
+        os.makedirs(temp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_path, f'{name}.npy'), array)
+        with open(os.path.join(temp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        old_path = None
+        if os.path.exists(path):
+            old_path = f"{path.rstrip(os.sep)}.{os.getpid()}.old"
+            os.rename(path, old_path)
+        os.rename(temp_path, path)
+        if old_path:
+            shutil.rmtree(old_path)
+
+        logger.info(f"Built catalog color index at {path}: {len(skus)} products, {len(colors)} colors")
+        return len(skus)
+
+
+def load_catalog_index():
+    """
+    Open the configured catalog index
+
+    Returns:
+        CatalogColorIndex: The index, or None if CATALOG_INDEX_PATH is empty,
+            not built yet or unreadable
+    """
+    path = Config.CATALOG_INDEX_PATH
+    if not path or not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    try:
+        return CatalogColorIndex(path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not open catalog color index: {str(e)}")
+        return None
@@ -1,26 +1,80 @@
 import cv2
 import numpy as np
 from sklearn.cluster import KMeans
+from config import Config
 from utils.logger import setup_logger
+from .skin_mask import SkinMaskEngine
+from .frame import Frame
 
 logger = setup_logger(__name__)
 
 class ColorAnalyzer:
     """Analyze skin tone, undertone, and dominant colors"""
     
-    @staticmethod
-    def extract_skin_region(rgb_image):
+    # BlazePose landmark indices outlining the garment region
+    LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+    LEFT_HIP, RIGHT_HIP = 23, 24
+    LEFT_KNEE, RIGHT_KNEE = 25, 26
+    LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+    
+    # Landmarks below this visibility are treated as missing
+    MIN_LANDMARK_VISIBILITY = 0.5
+    
+    # Horizontal padding around the torso/legs, as a fraction of shoulder width
+    GARMENT_MARGIN = 0.15
+    
+    # Fall back to the whole frame if the garment region is smaller than this
+    MIN_GARMENT_PIXELS = 500
+    
+    # Face (nose..mouth) and hand (wrist..thumb) landmarks for skin regions
+    FACE_LANDMARKS = range(0, 11)
+    HAND_LANDMARKS = range(15, 23)
+    
+    # Padding around face/hand landmark boxes, normalized to the frame
+    SKIN_REGION_PADDING = 0.04
+    
+    # Fall back to the unrestricted skin mask below this many pixels
+    MIN_SKIN_PIXELS = 50
+    
+    def __init__(self, skin_engine=None):
+        """
+        Initialize the analyzer
+        
+        Args:
+            skin_engine: SkinMaskEngine instance (created if omitted)
+        """
+        self.skin_engine = skin_engine or SkinMaskEngine()
+    
+    def extract_skin_region(self, rgb_image):
         """
         Extract skin regions from image using color-based segmentation
         
         Args:
-            rgb_image: Image in RGB format
+            rgb_image: Frame or image in RGB format
+        
+        Returns:
+            numpy.ndarray: Mask of skin regions
+        """
+        return self.skin_engine.extract(rgb_image)
+    
+    @staticmethod
+    def extract_skin_region_ycrcb(rgb_image):
+        """
+        Reference full-resolution YCrCb skin segmentation
+        
+        Kept for agreement checks against SkinMaskEngine.
+        
+        Args:
+            rgb_image: Frame or image in RGB format
         
         Returns:
             numpy.ndarray: Mask of skin regions
         """
         # Convert to YCrCb color space (better for skin detection)
-        ycrcb = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2YCrCb)
+        if isinstance(rgb_image, Frame):
+            ycrcb = rgb_image.ycrcb()
+        else:
+            ycrcb = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2YCrCb)
         
         # Define skin color range in YCrCb
         lower = np.array([0, 133, 77], dtype=np.uint8)
@@ -36,32 +90,172 @@ class ColorAnalyzer:
         
         return skin_mask
     
+    @classmethod
+    def build_garment_mask(cls, image_shape, pose_landmarks):
+        """
+        Build a torso/legs polygon mask from pose landmarks
+        
+        Args:
+            image_shape: Shape of the image (height, width, ...)
+            pose_landmarks: (x, y, visibility) per pose landmark, normalized
+        
+        Returns:
+            numpy.ndarray: Mask of the garment region, or None if the
+                shoulders and hips are not visible
+        """
+        if not pose_landmarks:
+            return None
+        
+        height, width = image_shape[:2]
+        
+        def point(index):
+            x, y, visibility = pose_landmarks[index]
+            if visibility < cls.MIN_LANDMARK_VISIBILITY:
+                return None
+            return np.array([x * width, y * height], dtype=np.float32)
+        
+        left_shoulder = point(cls.LEFT_SHOULDER)
+        right_shoulder = point(cls.RIGHT_SHOULDER)
+        left_hip = point(cls.LEFT_HIP)
+        right_hip = point(cls.RIGHT_HIP)
+        
+        if any(p is None for p in (left_shoulder, right_shoulder, left_hip, right_hip)):
+            return None
+        
+        # Pad outward from the body midline (image left/right may be mirrored)
+        margin = abs(left_shoulder[0] - right_shoulder[0]) * cls.GARMENT_MARGIN
+        outward = np.array([margin, 0], dtype=np.float32)
+        if left_shoulder[0] < right_shoulder[0]:
+            outward = -outward
+        
+        torso = [
+            left_shoulder + outward, right_shoulder - outward,
+            right_hip - outward, left_hip + outward
+        ]
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.array(torso, dtype=np.int32)], 255)
+        
+        # Legs down to the ankles, or the knees when the ankles are hidden
+        left_end = point(cls.LEFT_ANKLE)
+        right_end = point(cls.RIGHT_ANKLE)
+        if left_end is None or right_end is None:
+            left_end = point(cls.LEFT_KNEE)
+            right_end = point(cls.RIGHT_KNEE)
+        
+        if left_end is not None and right_end is not None:
+            legs = [
+                left_hip + outward, right_hip - outward,
+                right_end - outward, left_end + outward
+            ]
+            cv2.fillPoly(mask, [np.array(legs, dtype=np.int32)], 255)
+        
+        return mask
+    
+    @classmethod
+    def skin_regions_from_pose(cls, pose_landmarks):
+        """
+        Boxes around the face and hands from pose landmarks
+        
+        Args:
+            pose_landmarks: (x, y, visibility) per pose landmark, normalized
+        
+        Returns:
+            list: (x0, y0, x1, y1) normalized boxes (empty if none are visible)
+        """
+        if not pose_landmarks:
+            return []
+        
+        regions = []
+        for indices in (cls.FACE_LANDMARKS, cls.HAND_LANDMARKS[0::2], cls.HAND_LANDMARKS[1::2]):
+            points = [
+                pose_landmarks[i][:2] for i in indices
+                if pose_landmarks[i][2] >= cls.MIN_LANDMARK_VISIBILITY
+            ]
+            if not points:
+                continue
+            
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            pad = cls.SKIN_REGION_PADDING
+            regions.append((min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad))
+        
+        return regions
+    
     @staticmethod
-    def get_dominant_color(image, mask=None, n_colors=1):
+    def sample_pixels(pixels, mask_flat, count, max_samples):
+        """
+        Draw a fixed-seed sample of (optionally masked) pixels
+        
+        Masked draws use rejection sampling over random positions, so no
+        full-frame index array or masked copy is ever built.
+        
+        Args:
+            pixels: Flat (N, 3) pixel view
+            mask_flat: Flat mask or None
+            count: Number of selected (nonzero) mask pixels
+            max_samples: Sample size
+        
+        Returns:
+            numpy.ndarray: Sampled (<= max_samples, 3) pixels
+        """
+        rng = np.random.default_rng(42)
+        total = len(pixels)
+        
+        if mask_flat is None:
+            positions = rng.choice(total, max_samples, replace=False)
+        else:
+            # Oversample so that about max_samples draws land inside the mask
+            draws = int(max_samples * total / count * 1.2) + 64
+            if draws >= total:
+                positions = rng.choice(np.flatnonzero(mask_flat), max_samples, replace=False)
+            else:
+                positions = rng.integers(0, total, draws)
+                positions = positions[mask_flat[positions] > 0][:max_samples]
+        
+        return pixels.take(positions, axis=0)
+    
+    @staticmethod
+    def get_dominant_color(image, mask=None, n_colors=1, max_samples=None, indices=None):
         """
         Extract dominant colors using K-means clustering
         
         Args:
-            image: RGB image
+            image: RGB image (or its flat (N, 3) pixels)
             mask: Optional mask to restrict analysis
             n_colors: Number of dominant colors to extract
+            max_samples: Optional cap on pixels clustered (random, seeded sample)
+            indices: Optional flat pixel indices to restrict analysis, used
+                instead of the mask (see Frame.partition)
         
         Returns:
             list: RGB values of dominant colors
         """
-        # Reshape image to be a list of pixels
+        # Flat (N, 3) view of the pixels - no copy for contiguous images
         pixels = image.reshape(-1, 3)
-        
-        # Apply mask if provided
-        if mask is not None:
-            mask_flat = mask.reshape(-1)
-            pixels = pixels[mask_flat > 0]
+        mask_flat = None if mask is None else mask.reshape(-1)
+        if indices is not None:
+            count = len(indices)
+        else:
+            count = len(pixels) if mask is None else cv2.countNonZero(mask)
         
         # Need at least some pixels
-        if len(pixels) < 10:
+        if count < 10:
             logger.warning("Not enough pixels for color analysis")
             return [(128, 128, 128)] * n_colors
         
+        # Cluster a fixed-seed sample instead of every pixel
+        if indices is not None:
+            if max_samples is not None and count > max_samples:
+                indices = np.random.default_rng(42).choice(indices, max_samples, replace=False)
+            pixels = pixels.take(indices, axis=0)
+        elif max_samples is not None and count > max_samples:
+            pixels = ColorAnalyzer.sample_pixels(pixels, mask_flat, count, max_samples)
+        elif mask_flat is not None:
+            pixels = pixels[mask_flat > 0]
+        
+        # float32 keeps K-means from promoting the pixels to float64
+        pixels = pixels.astype(np.float32)
+        
         # Perform K-means clustering
         kmeans = KMeans(n_clusters=n_colors, random_state=42, n_init=10)
         kmeans.fit(pixels)
@@ -139,31 +333,114 @@ class ColorAnalyzer:
         """
         return "#{:02x}{:02x}{:02x}".format(*rgb_color)
     
-    def analyze(self, rgb_image):
+    def analyze_skin(self, frame, max_samples=None, pose_landmarks=None, level=None):
+        """
+        Estimate skin tone and undertone
+        
+        Args:
+            frame: Frame being analyzed
+            max_samples: Optional cap on pixels clustered
+            pose_landmarks: Optional pose landmarks (for face/hand regions)
+            level: Pyramid level to segment at (defaults to the skin engine's)
+        
+        Returns:
+            tuple: (skin tone, undertone)
+        """
+        if level is None:
+            level = self.skin_engine.level
+        
+        # Extract skin regions at reduced resolution
+        small_rgb, small_skin_mask = self.skin_engine.segment(frame, level)
+        tone_mask = None
+        
+        # Optionally sample skin tone only around the face and hands
+        if Config.SKIN_MASK_LANDMARK_REGIONS:
+            regions = self.skin_regions_from_pose(pose_landmarks)
+            if regions:
+                restricted = self.skin_engine.restrict(small_skin_mask, regions)
+                if cv2.countNonZero(restricted) >= self.MIN_SKIN_PIXELS:
+                    tone_mask = restricted
+        
+        # Get dominant skin color
+        if tone_mask is None:
+            # Every skin pixel, from the skin/non-skin partition of this level
+            skin, _ = frame.partition(('skin', level, level), small_skin_mask)
+            skin_colors = self.get_dominant_color(
+                frame.pixels(level), n_colors=1, max_samples=max_samples, indices=skin
+            )
+        else:
+            skin_colors = self.get_dominant_color(small_rgb, tone_mask, n_colors=1, max_samples=max_samples)
+        dominant_skin = skin_colors[0]
+        
+        # Classify skin tone and undertone
+        return self.classify_skin_tone(dominant_skin), self.detect_undertone(dominant_skin)
+    
+    def analyze_clothing(self, frame, max_samples=None, pose_landmarks=None, level=0, skin_level=None):
+        """
+        Extract dominant clothing colors (excluding skin regions)
+        
+        Args:
+            frame: Frame being analyzed
+            max_samples: Optional cap on pixels clustered
+            pose_landmarks: Optional pose landmarks for the garment region
+            level: Pyramid level to cluster at
+            skin_level: Pyramid level the skin mask is computed at
+        
+        Returns:
+            list: RGB tuples of the three dominant clothing colors
+        """
+        image = frame.level(level)
+        skin_mask = self.skin_engine.mask_for_level(frame, level, skin_level)
+        clothing_mask = None
+        clothing_samples = max_samples
+        
+        garment_mask = self.build_garment_mask(image.shape, pose_landmarks)
+        if garment_mask is not None:
+            # Inside the garment polygon and not skin (saturating 255 - 255 = 0)
+            garment_mask = cv2.subtract(garment_mask, skin_mask)
+            if cv2.countNonZero(garment_mask) >= self.MIN_GARMENT_PIXELS:
+                clothing_mask = garment_mask
+                clothing_samples = min(max_samples or Config.COLOR_MAX_SAMPLES, Config.COLOR_MAX_SAMPLES)
+            else:
+                logger.warning("Garment region too small - using all non-skin pixels")
+        
+        if clothing_mask is None:
+            if level == skin_level:
+                # Every non-skin pixel, from the partition analyze_skin already made
+                _, non_skin = frame.partition(('skin', level, level), skin_mask)
+                return self.get_dominant_color(
+                    frame.pixels(level), n_colors=3, max_samples=clothing_samples, indices=non_skin
+                )
+            clothing_mask = frame.memo(
+                ('non_skin_mask', skin_level, level), lambda: cv2.bitwise_not(skin_mask)
+            )
+        
+        return self.get_dominant_color(image, clothing_mask, n_colors=3, max_samples=clothing_samples)
+    
+    def analyze(self, rgb_image, max_samples=None, pose_landmarks=None, policy=None):
         """
         Perform complete color analysis
         
         Args:
-            rgb_image: Image in RGB format
+            rgb_image: Frame or image in RGB format
+            max_samples: Optional cap on pixels clustered per K-means pass
+            pose_landmarks: Optional pose landmarks; when given, clothing colors
+                come only from the torso/legs region instead of every non-skin pixel
+            policy: Optional ResolutionPolicy choosing the skin/clothing resolutions
         
         Returns:
             dict: Color analysis results
         """
         try:
-            # Extract skin regions
-            skin_mask = self.extract_skin_region(rgb_image)
-            
-            # Get dominant skin color
-            skin_colors = self.get_dominant_color(rgb_image, skin_mask, n_colors=1)
-            dominant_skin = skin_colors[0]
+            frame = rgb_image if isinstance(rgb_image, Frame) else Frame.from_rgb(rgb_image)
             
-            # Classify skin tone and undertone
-            skin_tone = self.classify_skin_tone(dominant_skin)
-            undertone = self.detect_undertone(dominant_skin)
+            skin_level = policy.level(frame, 'skin') if policy else self.skin_engine.level
+            clothing_level = policy.level(frame, 'clothing') if policy else 0
             
-            # Get dominant clothing colors (excluding skin regions)
-            clothing_mask = cv2.bitwise_not(skin_mask)
-            clothing_colors = self.get_dominant_color(rgb_image, clothing_mask, n_colors=3)
+            skin_tone, undertone = self.analyze_skin(frame, max_samples, pose_landmarks, skin_level)
+            clothing_colors = self.analyze_clothing(
+                frame, max_samples, pose_landmarks, clothing_level, skin_level
+            )
             
             # Convert to hex
             clothing_hex = [self.rgb_to_hex(color) for color in clothing_colors]
@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+import numpy as np
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.perceptual_hash import hamming, thumbnail_distance, THUMBNAIL_SIZE
+from .analysis_result import AnalysisResult
+
+logger = setup_logger(__name__)
+
+HASH_BITS = 64
+
+
+class NearDuplicateIndex:
+    """Bounded index of analyses keyed by perceptual hash
+
+    Finds a stored analysis whose image hash is within a Hamming radius of a
+    query hash. The 64-bit hash is split into radius + 1 chunks, each with
+    its own exact-match table: two hashes at most `radius` bits apart must
+    agree on at least one chunk, so a query only compares the full hash
+    against the entries sharing a chunk with it.
+
+    A 64-bit grayscale hash alone can match two different people photographed
+    in the same studio and pose, so a hash match is only reused once it is
+    confirmed: the images' aspect ratios and color thumbnails must agree too
+    (NEAR_DUPLICATE_MAX_ASPECT_DIFF, NEAR_DUPLICATE_MAX_COLOR_DIFF).
+
+    The least recently used entry is evicted when the index is full.
+    Analyses are kept in AnalysisResult's binary form.
+
+    Prefork workers each build their own index but share one file: only the
+    worker holding the file's lock (taken in load()) writes it back.
+    """
+
+    def __init__(self, max_entries=None, radius=None, path=None, max_color_diff=None, max_aspect_diff=None):
+        """
+        Args:
+            max_entries: Maximum indexed images (defaults to Config.NEAR_DUPLICATE_INDEX_SIZE)
+            radius: Largest Hamming distance treated as the same image
+                (defaults to Config.NEAR_DUPLICATE_RADIUS)
+            path: JSON file used by save() and load()
+                (defaults to Config.NEAR_DUPLICATE_INDEX_PATH; empty disables)
+            max_color_diff: Largest color thumbnail difference of a confirmed
+                match (defaults to Config.NEAR_DUPLICATE_MAX_COLOR_DIFF)
+            max_aspect_diff: Largest relative aspect ratio difference of a
+                confirmed match (defaults to Config.NEAR_DUPLICATE_MAX_ASPECT_DIFF)
+        """
+        self.max_entries = max_entries or Config.NEAR_DUPLICATE_INDEX_SIZE
+        self.radius = radius if radius is not None else Config.NEAR_DUPLICATE_RADIUS
+        self.max_color_diff = max_color_diff if max_color_diff is not None else Config.NEAR_DUPLICATE_MAX_COLOR_DIFF
+        self.max_aspect_diff = (max_aspect_diff if max_aspect_diff is not None
+                                else Config.NEAR_DUPLICATE_MAX_ASPECT_DIFF)
+        self.path = path if path is not None else Config.NEAR_DUPLICATE_INDEX_PATH
+
+        # (shift, mask) of each chunk, as evenly sized as possible
+        chunks = self.radius + 1
+        self._chunks = []
+        start = 0
+        for index in range(chunks):
+            width = HASH_BITS // chunks + (1 if index < HASH_BITS % chunks else 0)
+            self._chunks.append((start, (1 << width) - 1))
+            start += width
+
+        self._tables = [{} for _ in self._chunks]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writer_lock = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _keys(self, image_hash):
+        """Chunk value of a hash in every table"""
+        return [(image_hash >> shift) & mask for shift, mask in self._chunks]
+
+    def _index(self, image_hash):
+        for table, key in zip(self._tables, self._keys(image_hash)):
+            table.setdefault(key, set()).add(image_hash)
+
+    def _unindex(self, image_hash):
+        for table, key in zip(self._tables, self._keys(image_hash)):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(image_hash)
+                if not bucket:
+                    del table[key]
+
+    def _within_radius(self, image_hash):
+        """Indexed hashes within the radius, closest first"""
+        candidates = set()
+        for table, key in zip(self._tables, self._keys(image_hash)):
+            candidates.update(table.get(key, ()))
+        distances = [(hamming(image_hash, candidate), candidate) for candidate in candidates]
+        return [candidate for distance, candidate in sorted(distances) if distance <= self.radius]
+
+    def _confirmed(self, entry, thumbnail, aspect):
+        """Whether an entry's image really is the query image (not just a hash lookalike)"""
+        if abs(entry['aspect'] - aspect) > self.max_aspect_diff * aspect:
+            return False
+        return thumbnail_distance(entry['thumbnail'], thumbnail) <= self.max_color_diff
+
+    def lookup(self, image_hash, thumbnail, size, min_tier_rank=None):
+        """
+        Find the analysis of a near-identical image
+
+        Args:
+            image_hash: Perceptual hash of the query image
+            thumbnail: Color thumbnail of the query image (see color_thumbnail)
+            size: (height, width) of the query image
+            min_tier_rank: Only accept analyses produced by this tier or a
+                better one (index into Config.QUALITY_TIERS; None accepts any)
+
+        Returns:
+            dict: Decoded copy of the stored analysis, or None if there is no match
+        """
+        start = time.perf_counter()
+        aspect = size[1] / size[0]
+        entry = None
+        rejected = False
+        with self._lock:
+            for match in self._within_radius(image_hash):
+                candidate = self._entries[match]
+                if min_tier_rank is not None and candidate['tier_rank'] > min_tier_rank:
+                    continue
+                if not self._confirmed(candidate, thumbnail, aspect):
+                    rejected = True
+                    continue
+                entry = candidate
+                self._entries.move_to_end(match)
+                break
+        metrics.observe('near_duplicate.query_ms', (time.perf_counter() - start) * 1000.0)
+
+        if entry is None:
+            # Hash lookalikes of a different image are counted apart from plain misses
+            metrics.incr('near_duplicate.rejected' if rejected else 'near_duplicate.misses')
+            return None
+
+        metrics.incr('near_duplicate.hits')
+        return AnalysisResult.decode(entry['analysis'])
+
+    def add(self, image_hash, thumbnail, size, analysis, tier_rank=0):
+        """
+        Index an analysis under its image hash
+
+        Args:
+            image_hash: Perceptual hash of the analyzed image
+            thumbnail: Color thumbnail of the analyzed image (see color_thumbnail)
+            size: (height, width) of the analyzed image
+            analysis: Analysis dict (see AnalysisResult.from_dict)
+            tier_rank: Index into Config.QUALITY_TIERS of the tier that produced it
+        """
+        encoded = AnalysisResult.encode(analysis)
+        entry = {
+            'analysis': encoded,
+            'tier_rank': tier_rank,
+            'thumbnail': np.ascontiguousarray(thumbnail, dtype=np.uint8),
+            'aspect': size[1] / size[0]
+        }
+        with self._lock:
+            if image_hash in self._entries:
+                self._entries.move_to_end(image_hash)
+            else:
+                self._index(image_hash)
+            self._entries[image_hash] = entry
+
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._unindex(evicted)
+                metrics.incr('near_duplicate.evicted')
+            metrics.set_gauge('near_duplicate.size', len(self._entries))
+
+    def _claim_writer(self):
+        """
+        Take the lock that makes this process the one saving the index
+
+        The lock is held until the process exits, so a recycled worker's
+        replacement can take it over.
+
+        Returns:
+            bool: True if this process saves the index
+        """
+        if fcntl is None:
+            # No prefork workers to coordinate
+            return True
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(f"{self.path}.lock", 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._writer_lock = lock_file
+        return True
+
+    def save(self):
+        """Write the index to its JSON file (atomically replaced) if this process owns it"""
+        if not self.path or (fcntl is not None and self._writer_lock is None):
+            return
+
+        with self._lock:
+            entries = [
+                {
+                    'hash': f"{image_hash:016x}",
+                    'analysis': entry['analysis'].hex(),
+                    'tier_rank': entry['tier_rank'],
+                    'thumbnail': entry['thumbnail'].tobytes().hex(),
+                    'aspect': entry['aspect']
+                }
+                for image_hash, entry in self._entries.items()
+            ]
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(temp_path, self.path)
+        logger.info(f"Saved {len(entries)} near-duplicate entries to {self.path}")
+
+    def load(self):
+        """
+        Add the entries of the JSON file, oldest first, if it exists
+
+        Also decides whether this process saves the index on shutdown: the
+        first worker to load it does, the others leave the file alone.
+        """
+        if not self.path:
+            return
+        if self._writer_lock is None and not self._claim_writer():
+            logger.info(f"Near-duplicate index {self.path} is saved by another worker")
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load near-duplicate index: {str(e)}")
+            return
+
+        # Most recently used last; older entries would be evicted anyway
+        loaded = 0
+        for entry in entries[-self.max_entries:]:
+            # Entries saved without a thumbnail could never be confirmed
+            if 'thumbnail' not in entry:
+                continue
+            analysis = AnalysisResult.decode(bytes.fromhex(entry['analysis']))
+            thumbnail = np.frombuffer(bytes.fromhex(entry['thumbnail']), dtype=np.uint8)
+            thumbnail = thumbnail.reshape(THUMBNAIL_SIZE, THUMBNAIL_SIZE, 3)
+            self.add(int(entry['hash'], 16), thumbnail, (1.0, entry['aspect']), analysis, entry.get('tier_rank', 0))
+            loaded += 1
+        logger.info(f"Loaded {loaded} near-duplicate entries from {self.path}")
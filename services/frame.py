@@ -0,0 +1,146 @@
+from functools import cached_property
+import cv2
+import numpy as np
+
+class Frame:
+    """One decoded image with lazily computed, cached representations
+
+    Every representation (RGB, downscale pyramid, YCrCb, flattened pixels,
+    memoized masks such as the skin mask and their skin/non-skin index
+    partitions) is computed at most once per request and handed to the
+    analyzers as a view where possible.
+    """
+
+    def __init__(self, bgr=None, rgb=None):
+        """
+        Create a frame from a BGR (OpenCV) or RGB image
+
+        Args:
+            bgr: Image in BGR format
+            rgb: Image in RGB format (used instead of converting from BGR)
+        """
+        if bgr is None and rgb is None:
+            raise ValueError("Frame needs a BGR or RGB image")
+
+        self.bgr = bgr
+        if rgb is not None:
+            self.__dict__['rgb'] = rgb
+
+        self._levels = None
+        self._memo = {}
+
+    @classmethod
+    def from_rgb(cls, rgb_image):
+        """Wrap an RGB image without copying it"""
+        return cls(rgb=rgb_image)
+
+    @property
+    def shape(self):
+        """Shape of the full-resolution RGB image"""
+        return self.rgb.shape
+
+    @cached_property
+    def rgb(self):
+        """Image in RGB format"""
+        return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+
+    def level(self, index):
+        """
+        Get a level of the downscale pyramid
+
+        Level 0 is the full-resolution RGB image; each further level halves
+        both dimensions (INTER_AREA) of the one before it.
+
+        Args:
+            index: Pyramid level
+
+        Returns:
+            numpy.ndarray: RGB image at that level
+        """
+        if self._levels is None:
+            self._levels = [self.rgb]
+
+        while len(self._levels) <= index:
+            previous = self._levels[-1]
+            height, width = previous.shape[:2]
+            size = (max(1, width // 2), max(1, height // 2))
+            self._levels.append(cv2.resize(previous, size, interpolation=cv2.INTER_AREA))
+
+        return self._levels[index]
+
+    def level_for_size(self, max_width, max_height):
+        """
+        Largest pyramid level that fits within a target size
+
+        Args:
+            max_width: Maximum width in pixels
+            max_height: Maximum height in pixels
+
+        Returns:
+            int: Pyramid level (0 if the full image already fits)
+        """
+        height, width = self.rgb.shape[:2]
+        index = 0
+        while (width > max_width or height > max_height) and min(width, height) > 1:
+            width, height = max(1, width // 2), max(1, height // 2)
+            index += 1
+        return index
+
+    def ycrcb(self, level=0):
+        """
+        Get a pyramid level in YCrCb format
+
+        Args:
+            level: Pyramid level
+
+        Returns:
+            numpy.ndarray: YCrCb image at that level
+        """
+        return self.memo(('ycrcb', level), lambda: cv2.cvtColor(self.level(level), cv2.COLOR_RGB2YCrCb))
+
+    def pixels(self, level=0):
+        """
+        Get a pyramid level as a flat (N, 3) RGB pixel view (no copy)
+
+        Args:
+            level: Pyramid level
+
+        Returns:
+            numpy.ndarray: (height * width, 3) pixels
+        """
+        return self.level(level).reshape(-1, 3)
+
+    def partition(self, key, mask):
+        """
+        Split a mask into the flat indices of its selected and other pixels
+
+        Indices address pixels(level) of the level the mask matches; e.g.
+        the skin mask partitions a level into skin and non-skin pixels.
+
+        Args:
+            key: Hashable cache key naming the mask, e.g. ("skin", 1, 0)
+            mask: Mask (0/255) the size of a pyramid level
+
+        Returns:
+            tuple: (selected, unselected) flat index arrays
+        """
+        def split():
+            selected = mask.reshape(-1) > 0
+            return np.flatnonzero(selected), np.flatnonzero(~selected)
+
+        return self.memo(('partition', key), split)
+
+    def memo(self, key, compute):
+        """
+        Compute a derived value once per frame
+
+        Args:
+            key: Hashable cache key, e.g. ("skin_mask", 1)
+            compute: Zero-argument callable producing the value
+
+        Returns:
+            Cached value for the key
+        """
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
@@ -1,62 +1,68 @@
 import warnings
 warnings.filterwarnings('ignore', category=FutureWarning, module='google.generativeai')
 
+import asyncio
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+
 import google.generativeai as genai
+from google.generativeai import caching
 from config import Config
 from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.schema import SchemaError, compile_schema, response_schema
+from .palette_engine import PaletteEngine
 
 logger = setup_logger(__name__)
 
-class GeminiService:
-    """Generate fashion recommendations using Google Gemini API"""
-    
-    def __init__(self):
-        """Initialize Gemini API"""
-        if not Config.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        # Use the latest available model
-        self.model = genai.GenerativeModel('models/gemini-flash-latest')
+# Constant instructions of each kind of generation. They are each model's
+# system instruction (held in a Gemini context cache when
+# GEMINI_CONTEXT_CACHE is on), so a request only carries the attribute block.
+# recommended_colors come from the local palette engine unless it is
+# disabled; Gemini then only writes categories and tips
+_LLM_COLORS = not Config.PALETTE_ENGINE_ENABLED
+
+
+def _recommendation_tasks(tip_context=''):
+    """Numbered list of what to recommend"""
+    tasks = ["RECOMMENDED OUTFIT CATEGORIES (list 4-5 specific outfit types that would flatter this body and face shape)"]
+    if _LLM_COLORS:
+        tasks.append("RECOMMENDED COLOR PALETTE (list 6-8 specific colors with hex codes that complement this skin tone and undertone)")
+    tasks.append(f"STYLING TIPS (provide 3-4 actionable styling tips considering all attributes{tip_context})")
     
-    def create_dress_generation_prompt(self, analysis_data, personalization=None):
-        """
-        Create detailed prompt for dress design generation
-        
-        Args:
-            analysis_data: Dict containing body_shape, face_shape, skin_tone, undertone, colors
-            personalization: Optional dict with mood, occasion, weather, budget
-        
-        Returns:
-            str: Formatted prompt for dress generation
-        """
-        base_prompt = f"""You are a professional fashion designer AI specializing in dress creation. Based on the following analysis, create detailed dress design prompts for image generation.
+    brevity = "Keep category and color names" if _LLM_COLORS else "Keep category names"
+    numbered = '\n'.join(f"{number}. {task}" for number, task in enumerate(tasks, 1))
+    return f"{numbered}\n\n{brevity} to a few words and each tip to one sentence."
 
-PHYSICAL ATTRIBUTES:
-- Body Shape: {analysis_data.get('body_shape', 'unknown')}
-- Face Shape: {analysis_data.get('face_shape', 'unknown')}
-- Skin Tone: {analysis_data.get('skin_tone', 'unknown')}
-- Undertone: {analysis_data.get('undertone', 'unknown')}
-- Current Dominant Colors: {', '.join(analysis_data.get('dominant_colors', []))}
 
-"""
+def _recommendation_fields(indent):
+    """JSON fields of one set of recommendations, for the format example"""
+    fields = ['"recommended_categories": ["category1", "category2", ...],']
+    if _LLM_COLORS:
+        fields += ['"recommended_colors": [', '  {"name": "color_name", "hex": "#hexcode"},', '  ...', '],']
+    fields.append('"styling_tips": ["tip1", "tip2", ...]')
+    return '\n'.join(' ' * indent + field for field in fields)
 
-        # Add personalization if provided
-        if personalization:
-            base_prompt += "PERSONALIZATION CONTEXT:\n"
-            if personalization.get('mood'):
-                base_prompt += f"- Mood/Style Preference: {personalization['mood']}\n"
-            if personalization.get('occasion'):
-                base_prompt += f"- Occasion: {personalization['occasion']}\n"
-            if personalization.get('weather'):
-                base_prompt += f"- Weather Conditions: {personalization['weather']}\n"
-            if personalization.get('budget'):
-                base_prompt += f"- Budget Level: {personalization['budget']}\n"
-            base_prompt += "\n"
-        
-        base_prompt += """Create 3 detailed dress design prompts optimized for this person. Each prompt should be comprehensive enough for image generation AI.
 
-For each dress design, provide:
+RECOMMENDATION_INSTRUCTIONS = """You are a professional fashion stylist AI. Each request gives the physical attributes of a person, and sometimes a personalization context (mood, occasion, weather, budget). Provide personalized fashion recommendations for that person:
+
+""" + _recommendation_tasks() + """
+
+Format your response as JSON with this exact structure:
+{
+""" + _recommendation_fields(2) + """
+}
+
+Provide only the JSON response, no additional text."""
+
+_DRESS_ROLE = """You are a professional fashion designer AI specializing in dress creation. Each request gives the physical attributes of a person, and sometimes a personalization context (mood, occasion, weather, budget). Create detailed dress design prompts for image generation, optimized for that person."""
+
+_DRESS_GUIDE = """For each dress design, provide:
 
 1. DESIGN STYLE: Overall aesthetic (e.g., "elegant A-line cocktail dress", "bohemian maxi dress")
 2. SILHOUETTE: Body shape considerations (how it flatters their figure)
@@ -69,6 +75,20 @@ For each dress design, provide:
 9. FIT: How it should fit their body shape
 10. ACCESSORIES: Suggested complementary accessories
 
+Make the image_generation_prompt very detailed and specific, including:
+- Style and era (e.g., "modern elegant", "vintage 1950s")
+- Specific design elements
+- Color details
+- Fabric texture descriptions
+- Lighting and photography style
+- Professional fashion photography context
+
+Keep every other field to one or two sentences and the image_generation_prompt under 120 words. Give 2-4 colors in color_scheme and 1-4 accessories."""
+
+DRESS_INSTRUCTIONS = _DRESS_ROLE + """ Create 3 dress designs, each comprehensive enough for image generation AI.
+
+""" + _DRESS_GUIDE + """
+
 Format your response as JSON with this exact structure:
 {
   "dress_designs": [
@@ -89,30 +109,656 @@ Format your response as JSON with this exact structure:
   ]
 }
 
-Make the image_generation_prompt very detailed and specific, including:
-- Style and era (e.g., "modern elegant", "vintage 1950s")
-- Specific design elements
-- Color details
-- Fabric texture descriptions
-- Lighting and photography style
-- Professional fashion photography context
+Provide only the JSON response, no additional text."""
+
+DRESS_DESIGN_INSTRUCTIONS = _DRESS_ROLE + """ Create ONE dress design, comprehensive enough for image generation AI. The request names the style direction of this design and the directions of the other designs in the set; make this design clearly different from them.
+
+""" + _DRESS_GUIDE + """
+
+Format your response as JSON with this exact structure:
+{
+  "design_name": "Descriptive name of the dress",
+  "design_style": "Overall aesthetic description",
+  "silhouette": "Body-flattering shape description",
+  "neckline": "Face-complementing neckline style",
+  "sleeves": "Sleeve style and length",
+  "fabric": "Recommended materials",
+  "color_scheme": ["color1", "color2", "color3"],
+  "pattern_details": "Embellishments or patterns",
+  "length": "Dress length description",
+  "fit": "How it fits the body shape",
+  "accessories": ["accessory1", "accessory2"],
+  "image_generation_prompt": "Detailed prompt for image generation AI like DALL-E, Midjourney, or Stable Diffusion"
+}
 
 Provide only the JSON response, no additional text."""
 
-        return base_prompt
+LOOKBOOK_INSTRUCTIONS = """You are a professional fashion stylist AI. Each request gives the physical attributes of a person and a list of scenarios, each with an id and a personalization context. Provide personalized fashion recommendations for EACH scenario:
+
+""" + _recommendation_tasks(' and the scenario') + """
+
+Format your response as JSON with one entry per scenario, with this exact structure:
+{
+  "scenarios": [
+    {
+      "scenario_id": "id of the scenario",
+""" + _recommendation_fields(6) + """
+    },
+    ...
+  ]
+}
+
+Provide only the JSON response, no additional text."""
+
+INSTRUCTIONS = {
+    'recommendations': RECOMMENDATION_INSTRUCTIONS,
+    'dress': DRESS_INSTRUCTIONS,
+    'dress_design': DRESS_DESIGN_INSTRUCTIONS,
+    'lookbook': LOOKBOOK_INSTRUCTIONS
+}
+
+# Response schemas of each kind of generation. Gemini constrains its output
+# to them in structured-output mode (GEMINI_STRUCTURED_OUTPUT); every parsed
+# response is checked against them either way. max_length and pattern are
+# only checked locally, so the validator cuts over-long values to size and
+# drops non-matching list items instead of rejecting the response.
+_TEXT = {'type': 'string', 'max_length': 400}
+_NAME = {'type': 'string', 'max_length': 80}
+
+_RECOMMENDATION_PROPERTIES = {
+    'recommended_categories': {'type': 'array', 'items': _NAME, 'min_items': 4, 'max_items': 5},
+    'recommended_colors': {
+        'type': 'array',
+        'items': {
+            'type': 'object',
+            'properties': {
+                'name': _NAME,
+                'hex': {'type': 'string', 'pattern': r'^#[0-9A-Fa-f]{6}$'}
+            },
+            'required': ['name', 'hex']
+        },
+        'min_items': 6,
+        'max_items': 8
+    },
+    'styling_tips': {'type': 'array', 'items': _TEXT, 'min_items': 3, 'max_items': 4}
+}
+if not _LLM_COLORS:
+    del _RECOMMENDATION_PROPERTIES['recommended_colors']
+
+RECOMMENDATION_SCHEMA = {
+    'type': 'object',
+    'properties': _RECOMMENDATION_PROPERTIES,
+    'required': list(_RECOMMENDATION_PROPERTIES)
+}
+
+DRESS_DESIGN_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'design_name': _NAME,
+        'design_style': _TEXT,
+        'silhouette': _TEXT,
+        'neckline': _TEXT,
+        'sleeves': _TEXT,
+        'fabric': _TEXT,
+        'color_scheme': {'type': 'array', 'items': _NAME, 'min_items': 2, 'max_items': 4},
+        'pattern_details': _TEXT,
+        'length': _TEXT,
+        'fit': _TEXT,
+        'accessories': {'type': 'array', 'items': _NAME, 'min_items': 1, 'max_items': 4},
+        'image_generation_prompt': {'type': 'string', 'max_length': 1500}
+    },
+    'required': [
+        'design_name', 'design_style', 'silhouette', 'neckline', 'sleeves', 'fabric', 'color_scheme',
+        'pattern_details', 'length', 'fit', 'accessories', 'image_generation_prompt'
+    ]
+}
+
+DRESS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'dress_designs': {'type': 'array', 'items': DRESS_DESIGN_SCHEMA, 'min_items': 3, 'max_items': 3}
+    },
+    'required': ['dress_designs']
+}
+
+LOOKBOOK_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'scenarios': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                # Matched verbatim against the variant ids, so never cut to
+                # size (parse_lookbook_variants caps their length instead)
+                'properties': {'scenario_id': {'type': 'string'}, **_RECOMMENDATION_PROPERTIES},
+                'required': ['scenario_id', *_RECOMMENDATION_PROPERTIES]
+            },
+            'min_items': 1,
+            'max_items': Config.LOOKBOOK_BATCH_SIZE
+        }
+    },
+    'required': ['scenarios']
+}
+
+SCHEMAS = {
+    'recommendations': RECOMMENDATION_SCHEMA,
+    'dress': DRESS_SCHEMA,
+    'dress_design': DRESS_DESIGN_SCHEMA,
+    'lookbook': LOOKBOOK_SCHEMA
+}
+
+# Compiled once per process
+VALIDATORS = {kind: compile_schema(schema) for kind, schema in SCHEMAS.items()}
 
-    def generate_dress_prompts(self, analysis_data, personalization=None):
+class GeminiService:
+    """Generate fashion recommendations using Google Gemini API"""
+    
+    def __init__(self, shared_cache=None):
+        """
+        Initialize Gemini API
+        
+        Args:
+            shared_cache: Optional SharedCache; outputs are then generated once
+                per input across all worker processes on the host
+        """
+        if not Config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        # One model per kind of generation, carrying that kind's instructions
+        self.model_name = Config.GEMINI_MODEL
+        self.models = {
+            kind: genai.GenerativeModel(
+                self.model_name,
+                system_instruction=instructions,
+                generation_config=self._generation_config(kind)
+            )
+            for kind, instructions in INSTRUCTIONS.items()
+        }
+        
+        # Gemini context caches of the instructions: kind -> (CachedContent, expiry)
+        self._context_caches = {}
+        self._context_cache_enabled = Config.GEMINI_CONTEXT_CACHE
+        self._context_cache_lock = threading.Lock()
+        
+        # Bounded LRU of generated outputs, keyed by attributes + personalization
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.shared_cache = shared_cache
+        
+        # recommended_colors are computed locally instead of generated
+        self.palette_engine = PaletteEngine() if Config.PALETTE_ENGINE_ENABLED else None
+        
+        # Parallel per-design dress generation (threads start on first use)
+        self._design_executor = ThreadPoolExecutor(
+            max_workers=Config.DRESS_PARALLEL_WORKERS, thread_name_prefix='dress-design'
+        )
+    
+    @staticmethod
+    def _generation_config(kind):
+        """
+        Generation settings of a kind: output cap, plus JSON schema in structured-output mode
+        
+        Args:
+            kind: Key of INSTRUCTIONS
+        
+        Returns:
+            dict: GenerationConfig fields
+        """
+        config = {'max_output_tokens': Config.GEMINI_MAX_OUTPUT_TOKENS[kind]}
+        if Config.GEMINI_STRUCTURED_OUTPUT:
+            config['response_mime_type'] = 'application/json'
+            config['response_schema'] = response_schema(SCHEMAS[kind])
+        return config
+    
+    def _model(self, kind):
+        """
+        Model for a kind of generation
+        
+        With GEMINI_CONTEXT_CACHE on, the kind's instructions are stored once
+        as a Gemini context cache and every call references it instead of
+        resending them; the cache is extended before it expires. If the
+        cache cannot be created (e.g. the model does not support caching or
+        the instructions are below its minimum size), the plain system
+        instruction is used from then on.
+        
+        Args:
+            kind: Key of INSTRUCTIONS
+        
+        Returns:
+            GenerativeModel
+        """
+        if not self._context_cache_enabled:
+            return self.models[kind]
+        
+        ttl = Config.GEMINI_CONTEXT_CACHE_TTL
+        with self._context_cache_lock:
+            cached, expires = self._context_caches.get(kind, (None, 0))
+            # Refresh with a minute to spare so in-flight calls never see it expire
+            if time.time() < expires - 60:
+                return self.models[kind]
+            
+            try:
+                if cached is None:
+                    cached = caching.CachedContent.create(
+                        model=self.model_name,
+                        display_name=f"outfevibe-{kind}",
+                        system_instruction=INSTRUCTIONS[kind],
+                        ttl=datetime.timedelta(seconds=ttl)
+                    )
+                    self.models[kind] = genai.GenerativeModel.from_cached_content(
+                        cached, generation_config=self._generation_config(kind)
+                    )
+                    logger.info(f"Created Gemini context cache for {kind} instructions")
+                else:
+                    cached.update(ttl=datetime.timedelta(seconds=ttl))
+                self._context_caches[kind] = (cached, time.time() + ttl)
+            except Exception as e:
+                logger.warning(f"Gemini context caching unavailable, sending system instructions: {str(e)}")
+                self._context_cache_enabled = False
+                self.models[kind] = genai.GenerativeModel(
+                    self.model_name,
+                    system_instruction=INSTRUCTIONS[kind],
+                    generation_config=self._generation_config(kind)
+                )
+            return self.models[kind]
+    
+    @staticmethod
+    def _record_usage(kind, response):
+        """
+        Publish a call's token counts
+        
+        Input tokens include the instructions; cached tokens are the part
+        served from a context cache (explicit or Gemini's implicit prefix
+        caching), so uncached input is what the request actually paid for.
+        """
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return
+        
+        input_tokens = usage.prompt_token_count or 0
+        cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+        output_tokens = usage.candidates_token_count or 0
+        
+        metrics.observe(f'llm.{kind}.input_tokens', input_tokens)
+        metrics.observe(f'llm.{kind}.uncached_input_tokens', input_tokens - cached_tokens)
+        metrics.observe(f'llm.{kind}.output_tokens', output_tokens)
+        metrics.incr('llm.input_tokens', input_tokens)
+        metrics.incr('llm.cached_input_tokens', cached_tokens)
+        metrics.incr('llm.output_tokens', output_tokens)
+        
+        candidates = getattr(response, 'candidates', None) or []
+        if candidates and candidates[0].finish_reason == genai.protos.Candidate.FinishReason.MAX_TOKENS:
+            # Cut off by GEMINI_MAX_OUTPUT_TOKENS; the JSON will not parse
+            logger.warning(f"Gemini {kind} output hit the {Config.GEMINI_MAX_OUTPUT_TOKENS[kind]} token cap")
+            metrics.incr(f'llm.{kind}.truncated')
+        logger.info(
+            f"Gemini {kind} call: {input_tokens} input tokens ({cached_tokens} cached), "
+            f"{output_tokens} output tokens"
+        )
+    
+    def _call(self, kind, prompt):
+        """
+        Send a per-request prompt to the kind's model
+        
+        Args:
+            kind: Key of INSTRUCTIONS
+            prompt: Per-request prompt (the attribute block and request details)
+        
+        Returns:
+            Gemini response
+        """
+        response = self._model(kind).generate_content(prompt)
+        self._record_usage(kind, response)
+        return response
+    
+    async def _call_async(self, kind, prompt):
+        """Non-blocking variant of _call"""
+        if self._context_cache_enabled:
+            # Creating or extending a context cache is a blocking API call
+            model = await asyncio.to_thread(self._model, kind)
+        else:
+            model = self.models[kind]
+        response = await model.generate_content_async(prompt)
+        self._record_usage(kind, response)
+        return response
+    
+    @staticmethod
+    def _cache_key(kind, analysis_data, personalization=None):
+        """Build a hashable cache key for a generation request"""
+        return (
+            kind,
+            analysis_data.get('body_shape'),
+            analysis_data.get('face_shape'),
+            analysis_data.get('skin_tone'),
+            analysis_data.get('undertone'),
+            tuple(analysis_data.get('dominant_colors', [])),
+            tuple(sorted((personalization or {}).items()))
+        )
+    
+    def _cache_get(self, key):
+        """Return a cached output (or None) and mark it recently used"""
+        with self._cache_lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+    
+    def _cache_put(self, key, value):
+        """Store an output, evicting the least recently used entries"""
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > Config.RECOMMENDATION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    @staticmethod
+    def fallback_recommendations():
+        """Canned recommendations used when Gemini output is unavailable"""
+        return {
+            "recommended_categories": ["casual_wear", "smart_casual"],
+            "recommended_colors": [
+                {"name": "navy_blue", "hex": "#000080"},
+                {"name": "white", "hex": "#FFFFFF"}
+            ],
+            "styling_tips": ["Focus on well-fitted clothing", "Experiment with accessories"]
+        }
+    
+    @staticmethod
+    def fallback_dress_design():
+        """Canned single dress design used when a design generation fails"""
+        return {
+            "design_name": "Flattering A-line Dress",
+            "design_style": "Classic elegant silhouette",
+            "silhouette": "A-line shape that creates curves for rectangular body type",
+            "neckline": "Sweetheart neckline that complements oval face shape",
+            "sleeves": "Cap sleeves for balanced proportions",
+            "fabric": "Lightweight crepe or silk blend",
+            "color_scheme": ["warm beige", "terracotta", "deep teal"],
+            "pattern_details": "Minimal clean lines with subtle waist definition",
+            "length": "Knee-length for professional occasions",
+            "fit": "Fitted bodice with flowing skirt",
+            "accessories": ["pearl earrings", "delicate necklace"],
+            "image_generation_prompt": "Professional fashion photography of an elegant A-line dress with sweetheart neckline, cap sleeves, in warm beige color, lightweight fabric with subtle drape, photographed on a professional model with studio lighting, high fashion editorial style"
+        }
+    
+    @staticmethod
+    def fallback_dress_prompts():
+        """Canned dress design used when Gemini output is unavailable"""
+        return {
+            "dress_designs": [GeminiService.fallback_dress_design()]
+        }
+    
+    @staticmethod
+    def _attribute_block(analysis_data, personalization=None):
+        """
+        Compact per-request part of every prompt
+        
+        Args:
+            analysis_data: Dict containing body_shape, face_shape, skin_tone, undertone, colors
+            personalization: Optional dict with mood, occasion, weather, budget
+        
+        Returns:
+            str: One "Name: value" line per attribute and personalization field
+        """
+        lines = [
+            f"Body shape: {analysis_data.get('body_shape', 'unknown')}",
+            f"Face shape: {analysis_data.get('face_shape', 'unknown')}",
+            f"Skin tone: {analysis_data.get('skin_tone', 'unknown')}",
+            f"Undertone: {analysis_data.get('undertone', 'unknown')}",
+            f"Dominant colors: {', '.join(analysis_data.get('dominant_colors', []))}"
+        ]
+        for key, value in (personalization or {}).items():
+            if value:
+                lines.append(f"{key.capitalize()}: {value}")
+        return '\n'.join(lines)
+    
+    def create_dress_generation_prompt(self, analysis_data, personalization=None):
+        """
+        Create the per-request prompt for dress design generation
+        
+        The instructions are DRESS_INSTRUCTIONS, the 'dress' model's system
+        instruction.
+        
+        Args:
+            analysis_data: Dict containing body_shape, face_shape, skin_tone, undertone, colors
+            personalization: Optional dict with mood, occasion, weather, budget
+        
+        Returns:
+            str: Formatted prompt for dress generation
+        """
+        return self._attribute_block(analysis_data, personalization)
+    
+    def create_dress_design_prompt(self, analysis_data, personalization, index, count):
+        """
+        Create the per-request prompt for one dress design of a parallel set
+        
+        Each design gets its own style direction from DRESS_STYLE_DIRECTIONS
+        and is told which directions the other designs take, so the parallel
+        calls do not return the same dress. The instructions are
+        DRESS_DESIGN_INSTRUCTIONS, the 'dress_design' model's system instruction.
+        
+        Args:
+            analysis_data: Dict containing body_shape, face_shape, skin_tone, undertone, colors
+            personalization: Optional dict with mood, occasion, weather, budget
+            index: Position of this design in the set (0-based)
+            count: Number of designs in the set
+        
+        Returns:
+            str: Formatted prompt for one dress design
+        """
+        directions = Config.DRESS_STYLE_DIRECTIONS
+        others = [directions[i % len(directions)] for i in range(count) if i != index]
+        
+        prompt = self._attribute_block(analysis_data, personalization)
+        prompt += f"\nDesign: {index + 1} of {count}"
+        prompt += f"\nStyle direction: {directions[index % len(directions)]}"
+        if others:
+            prompt += f"\nOther designs: {'; '.join(others)}"
+        return prompt
+    
+    def _generate_design(self, prompt):
+        """One design from Gemini, or None if the call or parsing failed"""
+        start = time.perf_counter()
+        try:
+            return self._parse_generation(self._call('dress_design', prompt), 'dress design', 'dress_design')
+        except Exception as e:
+            logger.error(f"Error generating dress design: {str(e)}")
+            return None
+        finally:
+            metrics.observe('dress.design_ms', (time.perf_counter() - start) * 1000.0)
+    
+    async def _generate_design_async(self, prompt):
+        """Non-blocking variant of _generate_design"""
+        start = time.perf_counter()
+        try:
+            response = await self._call_async('dress_design', prompt)
+            return self._parse_generation(response, 'dress design', 'dress_design')
+        except Exception as e:
+            logger.error(f"Error generating dress design: {str(e)}")
+            return None
+        finally:
+            metrics.observe('dress.design_ms', (time.perf_counter() - start) * 1000.0)
+    
+    def _cached_dress_designs(self, cache_key, llm_mode):
+        """
+        Dress designs that need no Gemini call, as (index, design) pairs
+        
+        Returns:
+            list: Cached (or, for llm_mode 'cached', precomputed) designs, or
+                None if the designs should be generated
+        """
+        result = self._cached_or_offline(cache_key, llm_mode, self.fallback_dress_prompts)
+        if result is None:
+            return None
+        return self._design_items(result)
+    
+    @staticmethod
+    def _design_items(result):
+        """(index, design) pairs of a design set; a fallback set's designs carry its flag"""
+        if result.get('fallback'):
+            return [(index, dict(design, fallback=True)) for index, design in enumerate(result['dress_designs'])]
+        return list(enumerate(result['dress_designs']))
+    
+    def _remember_designs(self, cache_key, designs, failures):
+        """
+        Cache an assembled design set unless some designs fell back
+        
+        Returns:
+            dict: The set to share with other workers, or None
+        """
+        if failures:
+            metrics.incr('dress.design_fallbacks', failures)
+            return None
+        
+        result = {'dress_designs': designs}
+        self._cache_put(cache_key, result)
+        return result
+    
+    def iter_dress_designs(self, analysis_data, personalization=None, llm_mode='live'):
+        """
+        Generate dress designs with one parallel Gemini call per design
+        
+        Output length drives generation latency, so DRESS_DESIGN_COUNT short
+        calls in parallel finish in about the time of one design. Designs are
+        yielded as their calls finish; a failed design is replaced by the
+        fallback design. With a shared cache, the first worker to miss holds
+        the set's lease while it streams and the others wait for its result.
+        With DRESS_GENERATION_MODE 'single' the whole set comes from one call.
+        
+        Args:
+            analysis_data: Physical attribute analysis
+            personalization: Optional personalization parameters
+            llm_mode: 'live' or 'cached' (see generate_dress_prompts)
+        
+        Yields:
+            tuple: (index, design dict) in completion order
+        """
+        if Config.DRESS_GENERATION_MODE != 'parallel':
+            yield from self._design_items(self.generate_dress_prompts(analysis_data, personalization, llm_mode))
+            return
+        
+        cache_key = self._cache_key('dress', analysis_data, personalization)
+        cached = self._cached_dress_designs(cache_key, llm_mode)
+        if cached is not None:
+            yield from cached
+            return
+        
+        owner = None
+        if self.shared_cache is not None:
+            shared_key = self.shared_cache.make_key('llm', cache_key)
+            result, owner = self.shared_cache.acquire(shared_key)
+            if result is not None:
+                # Generated by another worker while this one waited
+                self._cache_put(cache_key, result)
+                yield from self._design_items(result)
+                return
+        
+        count = Config.DRESS_DESIGN_COUNT
+        logger.info(f"Sending {count} parallel dress design requests to Gemini API...")
+        futures = {
+            self._design_executor.submit(
+                self._generate_design, self.create_dress_design_prompt(analysis_data, personalization, index, count)
+            ): index
+            for index in range(count)
+        }
+        
+        designs, failures, result = [None] * count, 0, None
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                design = future.result()
+                if design is None:
+                    failures += 1
+                    design = self.flagged_fallback(self.fallback_dress_design)
+                designs[index] = design
+                yield index, design
+            result = self._remember_designs(cache_key, designs, failures)
+        finally:
+            # Client went away: drop calls that have not started
+            for future in futures:
+                future.cancel()
+            if owner is not None:
+                self.shared_cache.release(shared_key, owner, result)
+    
+    async def iter_dress_designs_async(self, analysis_data, personalization=None, llm_mode='live'):
+        """
+        Async variant of iter_dress_designs; the calls share the event loop
+        
+        Yields:
+            tuple: (index, design dict) in completion order
+        """
+        if Config.DRESS_GENERATION_MODE != 'parallel':
+            result = await self.generate_dress_prompts_async(analysis_data, personalization, llm_mode)
+            for item in self._design_items(result):
+                yield item
+            return
+        
+        cache_key = self._cache_key('dress', analysis_data, personalization)
+        cached = await self._cached_or_offline_async(cache_key, llm_mode, self.fallback_dress_prompts)
+        if cached is not None:
+            for item in self._design_items(cached):
+                yield item
+            return
+        
+        owner = None
+        if self.shared_cache is not None:
+            shared_key = self.shared_cache.make_key('llm', cache_key)
+            result, owner = await self.shared_cache.acquire_async(shared_key)
+            if result is not None:
+                self._cache_put(cache_key, result)
+                for item in self._design_items(result):
+                    yield item
+                return
+        
+        count = Config.DRESS_DESIGN_COUNT
+        logger.info(f"Sending {count} parallel async dress design requests to Gemini API...")
+        
+        async def generate(index):
+            prompt = self.create_dress_design_prompt(analysis_data, personalization, index, count)
+            return index, await self._generate_design_async(prompt)
+        
+        tasks = [asyncio.ensure_future(generate(index)) for index in range(count)]
+        designs, failures, result = [None] * count, 0, None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, design = await next_done
+                if design is None:
+                    failures += 1
+                    design = self.flagged_fallback(self.fallback_dress_design)
+                designs[index] = design
+                yield index, design
+            result = self._remember_designs(cache_key, designs, failures)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if owner is not None:
+                await self.shared_cache.release_async(shared_key, owner, result)
+
+    def generate_dress_prompts(self, analysis_data, personalization=None, llm_mode='live'):
         """
         Generate dress design prompts for image generation
         
+        With DRESS_GENERATION_MODE 'parallel' each design is its own Gemini
+        call (see iter_dress_designs); 'single' asks for all designs at once.
+        
         Args:
             analysis_data: Physical attribute analysis
             personalization: Optional personalization parameters
+            llm_mode: 'live' to call Gemini on a cache miss, 'cached' to only
+                serve cached or precomputed output
         
         Returns:
             dict: Dress design prompts
         """
-        import json
+        if Config.DRESS_GENERATION_MODE == 'parallel':
+            designs = dict(self.iter_dress_designs(analysis_data, personalization, llm_mode))
+            return {'dress_designs': [designs[index] for index in sorted(designs)]}
+        
+        cache_key = self._cache_key('dress', analysis_data, personalization)
+        result = self._cached_or_offline(cache_key, llm_mode, self.fallback_dress_prompts)
+        if result is not None:
+            return result
         
         try:
             # Create dress generation prompt
@@ -121,56 +767,52 @@ Provide only the JSON response, no additional text."""
             logger.info("Sending dress generation request to Gemini API...")
             
             # Generate response
-            response = self.model.generate_content(prompt)
-            
-            # Parse response
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            
-            # Parse JSON
-            dress_prompts = json.loads(response_text.strip())
-            
-            logger.info("Successfully generated dress design prompts")
-            return dress_prompts
+            return self._generate(cache_key, prompt, self.fallback_dress_prompts, 'dress design prompts')
         
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse dress generation response: {str(e)}")
-            if 'response_text' in locals():
-                logger.error(f"Response text: {response_text}")
+        except Exception as e:
+            logger.error(f"Error generating dress prompts: {str(e)}")
+            raise
+    
+    async def generate_dress_prompts_async(self, analysis_data, personalization=None, llm_mode='live'):
+        """
+        Non-blocking variant of generate_dress_prompts for the async server
+        
+        Args:
+            analysis_data: Physical attribute analysis
+            personalization: Optional personalization parameters
+            llm_mode: 'live' or 'cached' (see generate_dress_prompts)
+        
+        Returns:
+            dict: Dress design prompts
+        """
+        if Config.DRESS_GENERATION_MODE == 'parallel':
+            designs = {index: design async for index, design in self.iter_dress_designs_async(
+                analysis_data, personalization, llm_mode
+            )}
+            return {'dress_designs': [designs[index] for index in sorted(designs)]}
+        
+        cache_key = self._cache_key('dress', analysis_data, personalization)
+        result = await self._cached_or_offline_async(cache_key, llm_mode, self.fallback_dress_prompts)
+        if result is not None:
+            return result
+        
+        try:
+            prompt = self.create_dress_generation_prompt(analysis_data, personalization)
             
-            # Return fallback structure
-            return {
-                "dress_designs": [
-                    {
-                        "design_name": "Flattering A-line Dress",
-                        "design_style": "Classic elegant silhouette",
-                        "silhouette": "A-line shape that creates curves for rectangular body type",
-                        "neckline": "Sweetheart neckline that complements oval face shape",
-                        "sleeves": "Cap sleeves for balanced proportions",
-                        "fabric": "Lightweight crepe or silk blend",
-                        "color_scheme": ["warm beige", "terracotta", "deep teal"],
-                        "pattern_details": "Minimal clean lines with subtle waist definition",
-                        "length": "Knee-length for professional occasions",
-                        "fit": "Fitted bodice with flowing skirt",
-                        "accessories": ["pearl earrings", "delicate necklace"],
-                        "image_generation_prompt": "Professional fashion photography of an elegant A-line dress with sweetheart neckline, cap sleeves, in warm beige color, lightweight fabric with subtle drape, photographed on a professional model with studio lighting, high fashion editorial style"
-                    }
-                ]
-            }
+            logger.info("Sending async dress generation request to Gemini API...")
+            
+            return await self._generate_async(cache_key, prompt, self.fallback_dress_prompts, 'dress design prompts')
         
         except Exception as e:
             logger.error(f"Error generating dress prompts: {str(e)}")
             raise
+    
     def create_prompt(self, analysis_data, personalization=None):
         """
-        Create detailed prompt for Gemini
+        Create the per-request prompt for recommendations
+        
+        The instructions are RECOMMENDATION_INSTRUCTIONS, the
+        'recommendations' model's system instruction.
         
         Args:
             analysis_data: Dict containing body_shape, face_shape, skin_tone, undertone, colors
@@ -179,62 +821,226 @@ Provide only the JSON response, no additional text."""
         Returns:
             str: Formatted prompt
         """
-        base_prompt = f"""You are a professional fashion stylist AI. Based on the following analysis of a person's physical attributes, provide personalized fashion recommendations.
-
-PHYSICAL ATTRIBUTES:
-- Body Shape: {analysis_data.get('body_shape', 'unknown')}
-- Face Shape: {analysis_data.get('face_shape', 'unknown')}
-- Skin Tone: {analysis_data.get('skin_tone', 'unknown')}
-- Undertone: {analysis_data.get('undertone', 'unknown')}
-- Current Dominant Colors: {', '.join(analysis_data.get('dominant_colors', []))}
-
-"""
-
-        # Add personalization if provided
-        if personalization:
-            base_prompt += "PERSONALIZATION:\n"
-            if personalization.get('mood'):
-                base_prompt += f"- Mood: {personalization['mood']}\n"
-            if personalization.get('occasion'):
-                base_prompt += f"- Occasion: {personalization['occasion']}\n"
-            if personalization.get('weather'):
-                base_prompt += f"- Weather: {personalization['weather']}\n"
-            if personalization.get('budget'):
-                base_prompt += f"- Budget: {personalization['budget']}\n"
-            base_prompt += "\n"
+        return self._attribute_block(analysis_data, personalization)
+    
+    def _cached_or_offline(self, cache_key, llm_mode, fallback):
+        """
+        Serve a generation without calling Gemini when possible
         
-        base_prompt += """Please provide:
-
-1. RECOMMENDED OUTFIT CATEGORIES (list 4-5 specific outfit types that would flatter this body and face shape)
-2. RECOMMENDED COLOR PALETTE (list 6-8 specific colors with hex codes that complement this skin tone and undertone)
-3. STYLING TIPS (provide 3-4 actionable styling tips considering all attributes)
-
-Format your response as JSON with this exact structure:
-{
-  "recommended_categories": ["category1", "category2", ...],
-  "recommended_colors": [
-    {"name": "color_name", "hex": "#hexcode"},
-    ...
-  ],
-  "styling_tips": ["tip1", "tip2", ...]
-}
-
-Provide only the JSON response, no additional text."""
-
-        return base_prompt
+        Args:
+            cache_key: Key from _cache_key
+            llm_mode: 'live' or 'cached'
+            fallback: Callable returning the precomputed output
+        
+        Returns:
+            dict: Cached or precomputed output, or None if Gemini should be called
+        """
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Serving {cache_key[0]} from cache")
+            return cached
+        
+        if llm_mode == 'cached':
+            # Another worker may have generated it
+            return self._offline(cache_key, self._shared_get(cache_key), fallback)
+        
+        return None
+    
+    async def _cached_or_offline_async(self, cache_key, llm_mode, fallback):
+        """Variant of _cached_or_offline that reads the shared cache off the event loop"""
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"Serving {cache_key[0]} from cache")
+            return cached
+        
+        if llm_mode == 'cached':
+            shared = await asyncio.to_thread(self._shared_get, cache_key)
+            return self._offline(cache_key, shared, fallback)
+        
+        return None
+    
+    def _offline(self, cache_key, shared, fallback):
+        """Output for the 'cached' LLM mode: another worker's, or the precomputed one"""
+        if shared is not None:
+            self._cache_put(cache_key, shared)
+            return shared
+        logger.info(f"LLM disabled for this tier - using precomputed {cache_key[0]}")
+        return self.flagged_fallback(fallback)
+    
+    def _shared_get(self, cache_key):
+        """
+        Output another worker stored in the shared cache
+        
+        Returns:
+            dict: Stored output, or None if there is none or the shared cache
+                is disabled or unavailable (e.g. locked past its timeout)
+        """
+        if self.shared_cache is None:
+            return None
+        try:
+            return self.shared_cache.get(self.shared_cache.make_key('llm', cache_key))
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache unavailable, skipping lookup: {str(e)}")
+            metrics.incr('shared_cache.errors')
+            return None
+    
+    def _parse_generation(self, response, label, kind):
+        """
+        Parse a JSON generation and check it against the kind's schema
+        
+        Args:
+            response: Gemini response
+            label: Human-readable name for log messages
+            kind: Key of SCHEMAS
+        
+        Returns:
+            dict: Parsed output, or None if the response is not valid JSON or
+                does not match the schema
+        """
+        # Parse response
+        response_text = response.text.strip()
+        
+        # Remove markdown code blocks if present
+        if response_text.startswith('```json'):
+            response_text = response_text[7:]
+        if response_text.startswith('```'):
+            response_text = response_text[3:]
+        if response_text.endswith('```'):
+            response_text = response_text[:-3]
+        
+        try:
+            result = json.loads(response_text.strip())
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse Gemini {label} response: {str(e)}")
+            logger.error(f"Response text: {response_text}")
+            metrics.incr(f'llm.{kind}.parse_errors')
+            return None
+        
+        try:
+            result, repairs = VALIDATORS[kind](result)
+        except SchemaError as e:
+            logger.error(f"Gemini {label} response does not match its schema: {str(e)}")
+            metrics.incr(f'llm.{kind}.schema_errors')
+            return None
+        
+        if repairs:
+            # Over-long fields and lists are cut to size rather than discarded
+            logger.warning(f"Repaired Gemini {label} response: {'; '.join(repairs)}")
+            metrics.incr(f'llm.{kind}.repaired')
+        
+        logger.info(f"Successfully generated {label}")
+        return result
     
-    def generate_recommendations(self, analysis_data, personalization=None):
+    @staticmethod
+    def flagged_fallback(fallback):
+        """
+        Canned output standing in for a generation that failed or was skipped
+        (the 'cached' LLM mode of degraded tiers)
+        
+        Marked with "fallback": true, so clients can tell it from a generated
+        result and retry.
+        
+        Args:
+            fallback: Callable returning the canned output
+        
+        Returns:
+            dict: The canned output with the fallback flag
+        """
+        return dict(fallback(), fallback=True)
+    
+    def _remember(self, cache_key, result, fallback):
+        """Cache a parsed output, or return the flagged fallback if parsing failed"""
+        if result is None:
+            metrics.incr(f'llm.{cache_key[0]}.fallbacks')
+            return self.flagged_fallback(fallback)
+        
+        self._cache_put(cache_key, result)
+        return result
+    
+    def _generate(self, cache_key, prompt, fallback, label):
+        """
+        Call Gemini on a cache miss and cache the parsed output
+        
+        With a shared cache, workers asking for the same output at once wait
+        for the first one's call instead of each calling Gemini.
+        
+        Args:
+            cache_key: Key from _cache_key
+            prompt: Prompt text
+            fallback: Callable returning the output used when parsing fails
+            label: Human-readable name for log messages
+        
+        Returns:
+            dict: Parsed output (or the fallback)
+        """
+        def compute():
+            return self._parse_generation(self._call(cache_key[0], prompt), label, cache_key[0])
+        
+        if self.shared_cache is None:
+            result = compute()
+        else:
+            result = self.shared_cache.get_or_compute(self.shared_cache.make_key('llm', cache_key), compute)
+        return self._remember(cache_key, result, fallback)
+    
+    async def _generate_async(self, cache_key, prompt, fallback, label):
+        """Non-blocking variant of _generate"""
+        async def compute():
+            return self._parse_generation(await self._call_async(cache_key[0], prompt), label, cache_key[0])
+        
+        if self.shared_cache is None:
+            result = await compute()
+        else:
+            result = await self.shared_cache.get_or_compute_async(
+                self.shared_cache.make_key('llm', cache_key), compute
+            )
+        return self._remember(cache_key, result, fallback)
+    
+    def _with_palette(self, analysis_data, recommendations):
+        """
+        Fill in recommended_colors from the palette engine
+        
+        The colors depend only on the analysis, so they are added to every
+        result (cached, generated or fallback) rather than cached with it.
+        
+        Args:
+            analysis_data: Physical attribute analysis
+            recommendations: Categories and tips (from Gemini, a cache or the fallback)
+        
+        Returns:
+            dict: Recommendations with recommended_colors
+        """
+        if self.palette_engine is None:
+            return recommendations
+        
+        result = {
+            'recommended_categories': recommendations.get('recommended_categories', []),
+            'recommended_colors': self.palette_engine.recommend(analysis_data),
+            'styling_tips': recommendations.get('styling_tips', [])
+        }
+        if recommendations.get('fallback'):
+            result['fallback'] = True
+        return result
+    
+    def generate_recommendations(self, analysis_data, personalization=None, llm_mode='live'):
         """
         Generate fashion recommendations
         
+        Gemini writes the categories and tips; with PALETTE_ENGINE_ENABLED
+        the colors come from the local palette engine.
+        
         Args:
             analysis_data: Physical attribute analysis
             personalization: Optional personalization parameters
+            llm_mode: 'live' to call Gemini on a cache miss, 'cached' to only
+                serve cached or precomputed output
         
         Returns:
             dict: Recommendations
         """
-        import json  # Move import to function level
+        cache_key = self._cache_key('recommendations', analysis_data, personalization)
+        result = self._cached_or_offline(cache_key, llm_mode, self.fallback_recommendations)
+        if result is not None:
+            return self._with_palette(analysis_data, result)
         
         try:
             # Create prompt
@@ -243,53 +1049,222 @@ Provide only the JSON response, no additional text."""
             logger.info("Sending request to Gemini API...")
             
             # Generate response
-            response = self.model.generate_content(prompt)
-            
-            # Parse response
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            
-            # Parse JSON
-            recommendations = json.loads(response_text.strip())
-            
-            logger.info("Successfully generated recommendations")
-            return recommendations
+            result = self._generate(cache_key, prompt, self.fallback_recommendations, 'recommendations')
+            return self._with_palette(analysis_data, result)
         
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Gemini response: {str(e)}")
-            if 'response_text' in locals():
-                logger.error(f"Response text: {response_text}")
+        except Exception as e:
+            logger.error(f"Error generating recommendations: {str(e)}")
+            raise
+    
+    async def generate_recommendations_async(self, analysis_data, personalization=None, llm_mode='live'):
+        """
+        Non-blocking variant of generate_recommendations for the async server
+        
+        Uses the SDK's async client, which keeps one long-lived channel per
+        event loop, so many calls can be in flight without holding threads.
+        
+        Args:
+            analysis_data: Physical attribute analysis
+            personalization: Optional personalization parameters
+            llm_mode: 'live' or 'cached' (see generate_recommendations)
+        
+        Returns:
+            dict: Recommendations
+        """
+        cache_key = self._cache_key('recommendations', analysis_data, personalization)
+        result = await self._cached_or_offline_async(cache_key, llm_mode, self.fallback_recommendations)
+        if result is not None:
+            return self._with_palette(analysis_data, result)
+        
+        try:
+            prompt = self.create_prompt(analysis_data, personalization)
+            
+            logger.info("Sending async request to Gemini API...")
             
-            # Return fallback structure
-            return {
-                "recommended_categories": ["casual_wear", "smart_casual"],
-                "recommended_colors": [
-                    {"name": "navy_blue", "hex": "#000080"},
-                    {"name": "white", "hex": "#FFFFFF"}
-                ],
-                "styling_tips": ["Focus on well-fitted clothing", "Experiment with accessories"]
-            }
+            result = await self._generate_async(cache_key, prompt, self.fallback_recommendations, 'recommendations')
+            return self._with_palette(analysis_data, result)
         
         except Exception as e:
             logger.error(f"Error generating recommendations: {str(e)}")
             raise
     
-    def generate_personalized_recommendations(self, analysis_data, personalization):
+    def generate_personalized_recommendations(self, analysis_data, personalization, llm_mode='live'):
         """
         Generate recommendations with personalization
         
         Args:
             analysis_data: Physical attribute analysis
             personalization: Personalization parameters (mood, occasion, weather, budget)
+            llm_mode: 'live' or 'cached' (see generate_recommendations)
         
         Returns:
             dict: Personalized recommendations
         """
-        return self.generate_recommendations(analysis_data, personalization)
+        return self.generate_recommendations(analysis_data, personalization, llm_mode)
+    
+    async def generate_personalized_recommendations_async(self, analysis_data, personalization, llm_mode='live'):
+        """
+        Non-blocking variant of generate_personalized_recommendations
+        
+        Args:
+            analysis_data: Physical attribute analysis
+            personalization: Personalization parameters (mood, occasion, weather, budget)
+            llm_mode: 'live' or 'cached' (see generate_recommendations)
+        
+        Returns:
+            dict: Personalized recommendations
+        """
+        return await self.generate_recommendations_async(analysis_data, personalization, llm_mode)
+    
+    def create_lookbook_prompt(self, analysis_data, variants):
+        """
+        Create the per-request prompt asking for recommendations for several scenarios
+        
+        The instructions are LOOKBOOK_INSTRUCTIONS, the 'lookbook' model's
+        system instruction.
+        
+        Args:
+            analysis_data: Dict containing body_shape, face_shape, skin_tone, undertone, colors
+            variants: {variant id: personalization dict}
+        
+        Returns:
+            str: Formatted prompt
+        """
+        prompt = self._attribute_block(analysis_data) + "\nScenarios:"
+        for variant_id, personalization in variants.items():
+            details = [f"{key.capitalize()}: {value}" for key, value in personalization.items()]
+            prompt += f"\n- \"{variant_id}\": {'; '.join(details) or 'everyday wear'}"
+        return prompt
+    
+    def _lookbook_cached(self, analysis_data, variants, llm_mode):
+        """
+        Split lookbook variants into cached results and ones that need Gemini
+        
+        Returns:
+            tuple: ({variant id: recommendations}, {variant id: personalization} to generate)
+        """
+        results, missing = {}, {}
+        for variant_id, personalization in variants.items():
+            cache_key = self._cache_key('recommendations', analysis_data, personalization)
+            result = self._cache_get(cache_key)
+            if result is None:
+                result = self._shared_get(cache_key)
+                if result is not None:
+                    self._cache_put(cache_key, result)
+            if result is None and llm_mode == 'cached':
+                result = self.flagged_fallback(self.fallback_recommendations)
+            
+            if result is None:
+                missing[variant_id] = personalization
+            else:
+                results[variant_id] = result
+        
+        metrics.incr('lookbook.variants', len(variants))
+        metrics.incr('lookbook.cached_variants', len(results))
+        return results, missing
+    
+    @staticmethod
+    def _lookbook_batches(missing):
+        """Split uncached variants into LOOKBOOK_BATCH_SIZE groups, one Gemini call each"""
+        items = list(missing.items())
+        size = max(1, Config.LOOKBOOK_BATCH_SIZE)
+        return [dict(items[start:start + size]) for start in range(0, len(items), size)]
+    
+    def _store_lookbook_batch(self, analysis_data, batch, parsed):
+        """
+        Cache each variant of a parsed lookbook response under its own key
+        
+        Variants the response is missing (including every variant when the
+        response failed to parse or validate) get the fallback
+        recommendations and are not cached.
+        
+        Returns:
+            dict: {variant id: recommendations} for the batch
+        """
+        metrics.incr('lookbook.llm_calls')
+        entries = {}
+        for entry in (parsed or {}).get('scenarios', []):
+            entry = dict(entry)
+            entries[entry.pop('scenario_id')] = entry
+        
+        results = {}
+        for variant_id, personalization in batch.items():
+            result = entries.get(variant_id)
+            if result is None:
+                logger.warning(f"Lookbook response has no usable entry for {variant_id}")
+                metrics.incr('llm.lookbook.fallbacks')
+                results[variant_id] = self.flagged_fallback(self.fallback_recommendations)
+                continue
+            
+            cache_key = self._cache_key('recommendations', analysis_data, personalization)
+            self._cache_put(cache_key, result)
+            if self.shared_cache is not None:
+                try:
+                    self.shared_cache.put(self.shared_cache.make_key('llm', cache_key), result)
+                except Exception as e:
+                    logger.error(f"Could not share lookbook entry: {str(e)}")
+            results[variant_id] = result
+        return results
+    
+    def generate_lookbook(self, analysis_data, variants, llm_mode='live'):
+        """
+        Generate recommendations for several personalization variants at once
+        
+        Cached variants are served from the recommendation cache; the rest are
+        generated with one Gemini call per LOOKBOOK_BATCH_SIZE variants, and
+        each result is cached as if it came from generate_recommendations.
+        
+        Args:
+            analysis_data: Physical attribute analysis
+            variants: {variant id: personalization dict}
+            llm_mode: 'live' or 'cached' (see generate_recommendations)
+        
+        Returns:
+            dict: {variant id: recommendations}
+        """
+        results, missing = self._lookbook_cached(analysis_data, variants, llm_mode)
+        
+        try:
+            for batch in self._lookbook_batches(missing):
+                logger.info(f"Sending lookbook request for {len(batch)} variant(s) to Gemini API...")
+                response = self._call('lookbook', self.create_lookbook_prompt(analysis_data, batch))
+                parsed = self._parse_generation(response, 'lookbook', 'lookbook')
+                results.update(self._store_lookbook_batch(analysis_data, batch, parsed))
+        
+        except Exception as e:
+            logger.error(f"Error generating lookbook: {str(e)}")
+            raise
+        
+        return {variant_id: self._with_palette(analysis_data, results[variant_id]) for variant_id in variants}
+    
+    async def generate_lookbook_async(self, analysis_data, variants, llm_mode='live'):
+        """
+        Non-blocking variant of generate_lookbook; batches are generated concurrently
+        
+        Args:
+            analysis_data: Physical attribute analysis
+            variants: {variant id: personalization dict}
+            llm_mode: 'live' or 'cached' (see generate_recommendations)
+        
+        Returns:
+            dict: {variant id: recommendations}
+        """
+        # Shared cache reads are blocking SQLite calls
+        results, missing = await asyncio.to_thread(self._lookbook_cached, analysis_data, variants, llm_mode)
+        
+        async def generate(batch):
+            response = await self._call_async('lookbook', self.create_lookbook_prompt(analysis_data, batch))
+            return self._store_lookbook_batch(analysis_data, batch, self._parse_generation(response, 'lookbook', 'lookbook'))
+        
+        try:
+            batches = self._lookbook_batches(missing)
+            if batches:
+                logger.info(f"Sending {len(batches)} async lookbook request(s) to Gemini API...")
+            for batch_results in await asyncio.gather(*(generate(batch) for batch in batches)):
+                results.update(batch_results)
+        
+        except Exception as e:
+            logger.error(f"Error generating lookbook: {str(e)}")
+            raise
+        
+        return {variant_id: self._with_palette(analysis_data, results[variant_id]) for variant_id in variants}
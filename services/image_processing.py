@@ -3,25 +3,67 @@ import numpy as np
 from PIL import Image
 from config import Config
 from utils.logger import setup_logger
+from utils.image_probe import oriented_size
+from .frame import Frame
 
 logger = setup_logger(__name__)
 
 class ImageProcessor:
     """Handle image validation, loading, and preprocessing"""
     
+    # JPEG DCT scaling: decode directly at 1/2, 1/4 or 1/8 size
+    REDUCED_DECODE_FLAGS = {
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8
+    }
+    
     @staticmethod
-    def load_image(image_path):
+    def decode_reduction(header, max_width=None, max_height=None):
+        """
+        Pick how much to shrink a JPEG while decoding it
+        
+        The largest factor whose output still covers the target size is used,
+        so the final resize quality is unchanged while the decoder never
+        allocates the full frame.
+        
+        Args:
+            header: ImageHeader from the upload probe
+            max_width: Target width (defaults to Config.IMAGE_MAX_WIDTH)
+            max_height: Target height (defaults to Config.IMAGE_MAX_HEIGHT)
+        
+        Returns:
+            int: 1, 2, 4 or 8
+        """
+        if header is None or header.format != 'jpeg':
+            return 1
+        
+        width, height = oriented_size(header)
+        scale = min((max_width or Config.IMAGE_MAX_WIDTH) / width,
+                    (max_height or Config.IMAGE_MAX_HEIGHT) / height)
+        
+        for factor in (8, 4, 2):
+            if scale * factor <= 1.0:
+                return factor
+        return 1
+    
+    @staticmethod
+    def load_image(image_path, reduction=1):
         """
         Load image from file path
         
         Args:
             image_path: Path to image file
+            reduction: Decode at 1/reduction size (JPEG only, see decode_reduction)
         
         Returns:
             numpy.ndarray: Image in BGR format (OpenCV)
         """
         try:
-            image = cv2.imread(image_path)
+            if reduction > 1:
+                image = cv2.imread(image_path, ImageProcessor.REDUCED_DECODE_FLAGS[reduction])
+            else:
+                image = cv2.imread(image_path)
             if image is None:
                 raise ValueError("Failed to load image")
             
@@ -32,6 +74,23 @@ class ImageProcessor:
             logger.error(f"Error loading image: {str(e)}")
             raise
     
+    @staticmethod
+    def is_normalized(header):
+        """
+        Check whether an upload already fits the advertised upload size
+        
+        Clients following /capabilities downscale before uploading; such
+        images need no resize at full quality.
+        
+        Args:
+            header: ImageHeader from the upload probe
+        
+        Returns:
+            bool: True if the image is within IMAGE_MAX_WIDTH x IMAGE_MAX_HEIGHT
+        """
+        width, height = oriented_size(header)
+        return width <= Config.IMAGE_MAX_WIDTH and height <= Config.IMAGE_MAX_HEIGHT
+    
     @staticmethod
     def resize_image(image, max_width=None, max_height=None):
         """
@@ -80,24 +139,41 @@ class ImageProcessor:
         return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     
     @staticmethod
-    def preprocess_for_mediapipe(image):
+    def preprocess_for_mediapipe(image, max_width=None, max_height=None):
         """
         Prepare image for MediaPipe processing
         
         Args:
             image: OpenCV image (BGR)
+            max_width: Optional maximum width (defaults to Config.IMAGE_MAX_WIDTH)
+            max_height: Optional maximum height (defaults to Config.IMAGE_MAX_HEIGHT)
         
         Returns:
             numpy.ndarray: RGB image ready for MediaPipe
         """
         # Resize if needed
-        resized = ImageProcessor.resize_image(image)
+        resized = ImageProcessor.resize_image(image, max_width, max_height)
         
         # Convert to RGB (MediaPipe requires RGB)
         rgb_image = ImageProcessor.convert_to_rgb(resized)
         
         return rgb_image
     
+    @staticmethod
+    def create_frame(image, max_width=None, max_height=None):
+        """
+        Resize an image and wrap it in a Frame for the analyzers
+        
+        Args:
+            image: OpenCV image (BGR)
+            max_width: Optional maximum width (defaults to Config.IMAGE_MAX_WIDTH)
+            max_height: Optional maximum height (defaults to Config.IMAGE_MAX_HEIGHT)
+        
+        Returns:
+            Frame: Frame whose RGB and derived representations are computed on demand
+        """
+        return Frame(bgr=ImageProcessor.resize_image(image, max_width, max_height))
+    
     @staticmethod
     def save_processed_image(image, output_path):
         """
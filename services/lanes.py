@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+class LaneFullError(Exception):
+    """Raised when a lane already has its maximum of queued work"""
+
+
+class ExecutorLane:
+    """Dedicated worker threads for one class of work
+
+    Work submitted to a lane only ever queues behind work of the same lane, so
+    fast requests never wait for threads held by slow (e.g. LLM-bound) ones.
+    """
+
+    def __init__(self, name, workers, max_queue):
+        """
+        Args:
+            name: Lane name used in metrics ("lane.<name>.*")
+            workers: Threads serving the lane
+            max_queue: Submitted-but-unfinished tasks accepted before rejecting
+        """
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"lane-{name}")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _reserve(self):
+        """Count a task in, or reject it if the lane is full"""
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                metrics.incr(f"lane.{self.name}.rejected")
+                raise LaneFullError(f"Lane '{self.name}' is full")
+            self._pending += 1
+            metrics.set_gauge(f"lane.{self.name}.pending", self._pending)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            metrics.set_gauge(f"lane.{self.name}.pending", self._pending)
+
+    def _wrap(self, fn, args, submitted):
+        """Run a task on a lane thread, recording queue and run time"""
+        started = time.perf_counter()
+        metrics.observe(f"lane.{self.name}.queue_ms", (started - submitted) * 1000.0)
+        try:
+            return fn(*args)
+        finally:
+            metrics.observe(f"lane.{self.name}.run_ms", (time.perf_counter() - started) * 1000.0)
+            self._release()
+
+    def run(self, fn, *args):
+        """
+        Run a callable on the lane and wait for its result
+
+        Args:
+            fn: Callable to run
+            *args: Positional arguments for fn
+
+        Returns:
+            The callable's result
+
+        Raises:
+            LaneFullError: If the lane is full
+        """
+        self._reserve()
+        try:
+            future = self._executor.submit(self._wrap, fn, args, time.perf_counter())
+        except BaseException:
+            self._release()
+            raise
+        return future.result()
+
+    async def run_async(self, fn, *args):
+        """
+        Async variant of run() that awaits the lane without blocking the loop
+
+        Raises:
+            LaneFullError: If the lane is full
+        """
+        self._reserve()
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, self._wrap, fn, args, time.perf_counter())
+        except BaseException:
+            self._release()
+            raise
+        return await future
+
+    def close(self):
+        """Finish running tasks and stop the lane's threads"""
+        self._executor.shutdown(wait=True)
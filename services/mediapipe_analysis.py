@@ -7,6 +7,11 @@ logger = setup_logger(__name__)
 class MediaPipeAnalyzer:
     """Analyze body and face shape using MediaPipe"""
     
+    # Pose-guided face crop: side = head landmark span * scale, in pixels
+    FACE_ROI_SCALE = 2.2
+    FACE_ROI_MIN_SIZE = 96
+    FACE_ROI_MIN_VISIBILITY = 0.5
+    
     def __init__(self):
         """Initialize MediaPipe solutions"""
         try:
@@ -25,12 +30,13 @@ class MediaPipeAnalyzer:
                 self.mp_pose = mp.solutions.pose
                 self.mp_face_mesh = mp.solutions.face_mesh
                 
-                # Initialize pose detector
+                # Initialize pose detector (other complexities are built on demand)
                 self.pose = self.mp_pose.Pose(
                     static_image_mode=True,
                     model_complexity=2,
                     min_detection_confidence=0.5
                 )
+                self._poses = {2: self.pose}
                 
                 # Initialize face mesh detector
                 self.face_mesh = self.mp_face_mesh.FaceMesh(
@@ -43,12 +49,61 @@ class MediaPipeAnalyzer:
                 logger.warning("MediaPipe solutions not available - using fallback analysis")
                 self.use_legacy_api = False
     
-    def analyze_body_shape(self, rgb_image):
+    def get_pose(self, model_complexity=None):
+        """
+        Get the pose detector for a model complexity
+        
+        Args:
+            model_complexity: 0 (lite), 1 (full) or 2 (heavy); None for the default
+        
+        Returns:
+            Pose detector instance
+        """
+        if model_complexity is None:
+            return self.pose
+        
+        if model_complexity not in self._poses:
+            self._poses[model_complexity] = self.mp_pose.Pose(
+                static_image_mode=True,
+                model_complexity=model_complexity,
+                min_detection_confidence=0.5
+            )
+        return self._poses[model_complexity]
+    
+    def detect_pose_landmarks(self, rgb_image, model_complexity=None):
+        """
+        Run pose detection once and return its landmarks
+        
+        Args:
+            rgb_image: Image in RGB format
+            model_complexity: Optional pose model complexity override
+        
+        Returns:
+            list: (x, y, visibility) per pose landmark, normalized to the
+                image size, or None if no pose was found
+        """
+        if not self.use_legacy_api:
+            return None
+        
+        try:
+            results = self.get_pose(model_complexity).process(rgb_image)
+        except Exception as e:
+            logger.error(f"Error detecting pose: {str(e)}")
+            return None
+        
+        if not results.pose_landmarks:
+            logger.warning("No pose detected in image")
+            return None
+        
+        return [(lm.x, lm.y, lm.visibility) for lm in results.pose_landmarks.landmark]
+    
+    def analyze_body_shape(self, rgb_image, model_complexity=None):
         """
         Detect body shape from pose landmarks
         
         Args:
             rgb_image: Image in RGB format
+            model_complexity: Optional pose model complexity override
         
         Returns:
             str: Body shape (rectangle, triangle, inverted_triangle, oval, hourglass)
@@ -66,24 +121,32 @@ class MediaPipeAnalyzer:
             else:
                 return "hourglass"
         
+        pose_landmarks = self.detect_pose_landmarks(rgb_image, model_complexity)
+        return self.body_shape_from_landmarks(pose_landmarks)
+    
+    def body_shape_from_landmarks(self, pose_landmarks):
+        """
+        Classify body shape from already detected pose landmarks
+        
+        Args:
+            pose_landmarks: Landmarks from detect_pose_landmarks (or None)
+        
+        Returns:
+            str: Body shape (rectangle, triangle, inverted_triangle, oval) or unknown
+        """
+        if pose_landmarks is None:
+            return "unknown"
+        
         try:
-            results = self.pose.process(rgb_image)
-            
-            if not results.pose_landmarks:
-                logger.warning("No pose detected in image")
-                return "unknown"
-            
-            landmarks = results.pose_landmarks.landmark
-            
             # Get key body points
-            left_shoulder = landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER]
-            right_shoulder = landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER]
-            left_hip = landmarks[self.mp_pose.PoseLandmark.LEFT_HIP]
-            right_hip = landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP]
+            left_shoulder = pose_landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER]
+            right_shoulder = pose_landmarks[self.mp_pose.PoseLandmark.RIGHT_SHOULDER]
+            left_hip = pose_landmarks[self.mp_pose.PoseLandmark.LEFT_HIP]
+            right_hip = pose_landmarks[self.mp_pose.PoseLandmark.RIGHT_HIP]
             
             # Calculate widths
-            shoulder_width = abs(right_shoulder.x - left_shoulder.x)
-            hip_width = abs(right_hip.x - left_hip.x)
+            shoulder_width = abs(right_shoulder[0] - left_shoulder[0])
+            hip_width = abs(right_hip[0] - left_hip[0])
             
             # Calculate ratio
             if shoulder_width == 0:
@@ -108,12 +171,93 @@ class MediaPipeAnalyzer:
             logger.error(f"Error analyzing body shape: {str(e)}")
             return "unknown"
     
-    def analyze_face_shape(self, rgb_image):
+    def face_roi_from_pose(self, pose_landmarks, image_width, image_height):
+        """
+        Derive a square face crop from the pose head landmarks
+        
+        Args:
+            pose_landmarks: Landmarks from detect_pose_landmarks
+            image_width: Frame width in pixels
+            image_height: Frame height in pixels
+        
+        Returns:
+            tuple: (x0, y0, x1, y1) pixel box, or None if the head is not visible
+        """
+        if not pose_landmarks:
+            return None
+        
+        # Nose, eyes, ears and mouth corners
+        head_points = [
+            (x * image_width, y * image_height)
+            for x, y, visibility in pose_landmarks[:self.mp_pose.PoseLandmark.MOUTH_RIGHT + 1]
+            if visibility >= self.FACE_ROI_MIN_VISIBILITY
+        ]
+        if len(head_points) < 3:
+            return None
+        
+        xs = [point[0] for point in head_points]
+        ys = [point[1] for point in head_points]
+        center_x = (min(xs) + max(xs)) / 2
+        center_y = (min(ys) + max(ys)) / 2
+        
+        # Ears/eyes span roughly the face width; pad for forehead and chin
+        side = max(max(xs) - min(xs), max(ys) - min(ys)) * self.FACE_ROI_SCALE
+        side = max(side, self.FACE_ROI_MIN_SIZE)
+        
+        x0 = max(0, int(center_x - side / 2))
+        y0 = max(0, int(center_y - side / 2))
+        x1 = min(image_width, int(center_x + side / 2))
+        y1 = min(image_height, int(center_y + side / 2))
+        
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        
+        return (x0, y0, x1, y1)
+    
+    def detect_face_landmarks(self, rgb_image, face_roi=None):
+        """
+        Run FaceMesh, optionally on a crop, and return full-frame landmarks
+        
+        Args:
+            rgb_image: Image in RGB format
+            face_roi: Optional (x0, y0, x1, y1) pixel box to run the mesh on
+        
+        Returns:
+            list: (x, y) per face landmark, normalized to the full frame,
+                or None if no face was found
+        """
+        height, width = rgb_image.shape[:2]
+        
+        if face_roi is not None:
+            x0, y0, x1, y1 = face_roi
+            crop = np.ascontiguousarray(rgb_image[y0:y1, x0:x1])
+            results = self.face_mesh.process(crop)
+            
+            if results.multi_face_landmarks:
+                crop_width = x1 - x0
+                crop_height = y1 - y0
+                return [
+                    ((x0 + lm.x * crop_width) / width, (y0 + lm.y * crop_height) / height)
+                    for lm in results.multi_face_landmarks[0].landmark
+                ]
+            
+            logger.info("No face found in pose-guided crop - retrying on full frame")
+        
+        results = self.face_mesh.process(rgb_image)
+        
+        if not results.multi_face_landmarks:
+            return None
+        
+        return [(lm.x, lm.y) for lm in results.multi_face_landmarks[0].landmark]
+    
+    def analyze_face_shape(self, rgb_image, pose_landmarks=None):
         """
         Detect face shape from face mesh landmarks
         
         Args:
             rgb_image: Image in RGB format
+            pose_landmarks: Optional pose landmarks used to crop the face
+                before running the mesh (full frame if omitted or no head found)
         
         Returns:
             str: Face shape (oval, round, square, heart, long)
@@ -124,15 +268,14 @@ class MediaPipeAnalyzer:
             return "oval"
         
         try:
-            results = self.face_mesh.process(rgb_image)
+            height, width = rgb_image.shape[:2]
+            face_roi = self.face_roi_from_pose(pose_landmarks, width, height)
+            landmarks = self.detect_face_landmarks(rgb_image, face_roi)
             
-            if not results.multi_face_landmarks:
+            if landmarks is None:
                 logger.warning("No face detected in image")
                 return "unknown"
             
-            face_landmarks = results.multi_face_landmarks[0]
-            landmarks = face_landmarks.landmark
-            
             # Get key facial points (simplified estimation)
             # Top of face (forehead)
             top = landmarks[10]
@@ -144,8 +287,8 @@ class MediaPipeAnalyzer:
             right = landmarks[454]
             
             # Calculate dimensions
-            face_height = abs(bottom.y - top.y)
-            face_width = abs(right.x - left.x)
+            face_height = abs(bottom[1] - top[1])
+            face_width = abs(right[0] - left[0])
             
             if face_width == 0:
                 return "unknown"
@@ -160,8 +303,8 @@ class MediaPipeAnalyzer:
                 face_shape = "round"
             elif 1.1 <= ratio <= 1.25:
                 # Check forehead vs jaw width for heart/square
-                forehead_width = abs(landmarks[108].x - landmarks[337].x)
-                jaw_width = abs(landmarks[172].x - landmarks[397].x)
+                forehead_width = abs(landmarks[108][0] - landmarks[337][0])
+                jaw_width = abs(landmarks[172][0] - landmarks[397][0])
                 
                 if forehead_width > jaw_width * 1.1:
                     face_shape = "heart"
@@ -177,30 +320,79 @@ class MediaPipeAnalyzer:
             logger.error(f"Error analyzing face shape: {str(e)}")
             return "unknown"
     
-    def analyze(self, rgb_image):
+    def analyze_pose(self, rgb_image, model_complexity=None):
         """
-        Perform complete MediaPipe analysis
+        Detect pose once and classify body shape
         
         Args:
             rgb_image: Image in RGB format
+            model_complexity: Optional pose model complexity override
         
         Returns:
-            dict: Analysis results
+            tuple: (body shape, pose landmarks or None)
         """
-        body_shape = self.analyze_body_shape(rgb_image)
-        face_shape = self.analyze_face_shape(rgb_image)
+        if not self.use_legacy_api:
+            return self.analyze_body_shape(rgb_image, model_complexity), None
+        
+        pose_landmarks = self.detect_pose_landmarks(rgb_image, model_complexity)
+        return self.body_shape_from_landmarks(pose_landmarks), pose_landmarks
+    
+    def analyze_with_landmarks(self, rgb_image, model_complexity=None, face_image=None):
+        """
+        Perform complete MediaPipe analysis and keep the pose landmarks
+        
+        Pose runs once; its head landmarks narrow the face mesh to a crop.
+        
+        Args:
+            rgb_image: Image in RGB format (used for pose)
+            model_complexity: Optional pose model complexity override
+            face_image: Optional image for the face stage, e.g. at a different
+                resolution (landmarks are normalized, so any size works)
+        
+        Returns:
+            tuple: (analysis results dict, pose landmarks or None)
+        """
+        body_shape, pose_landmarks = self.analyze_pose(rgb_image, model_complexity)
+        face_shape = self.analyze_face_shape(
+            rgb_image if face_image is None else face_image,
+            pose_landmarks
+        )
         
         return {
             "body_shape": body_shape,
             "face_shape": face_shape
-        }
+        }, pose_landmarks
+    
+    def analyze(self, rgb_image, model_complexity=None):
+        """
+        Perform complete MediaPipe analysis
+        
+        Args:
+            rgb_image: Image in RGB format
+            model_complexity: Optional pose model complexity override
+        
+        Returns:
+            dict: Analysis results
+        """
+        results, _ = self.analyze_with_landmarks(rgb_image, model_complexity)
+        return results
+    
+    def close(self):
+        """Release MediaPipe graphs (safe to call more than once)"""
+        if getattr(self, 'closed', False):
+            return
+        self.closed = True
+        
+        if self.use_legacy_api and hasattr(self, '_poses'):
+            for pose in self._poses.values():
+                pose.close()
+            self._poses = {}
+        if self.use_legacy_api and hasattr(self, 'face_mesh'):
+            self.face_mesh.close()
     
     def __del__(self):
         """Clean up MediaPipe resources"""
         try:
-            if self.use_legacy_api and hasattr(self, 'pose'):
-                self.pose.close()
-            if self.use_legacy_api and hasattr(self, 'face_mesh'):
-                self.face_mesh.close()
+            self.close()
         except Exception:
             pass  # Ignore cleanup errors
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.workers import process_rss_bytes
+
+logger = setup_logger(__name__)
+
+class MemoryBudgetError(Exception):
+    """Raised when a reservation does not fit the budget within the wait timeout"""
+
+
+class MemoryReservation:
+    """Bytes held by one request, plus the process RSS seen while it ran"""
+
+    def __init__(self, nbytes, solo):
+        """
+        Args:
+            nbytes: Reserved (estimated peak) bytes
+            solo: True if no other reservation was held when this one started
+        """
+        self.nbytes = nbytes
+        self.solo = solo
+        self.baseline_rss = process_rss_bytes()
+        self.peak_rss = self.baseline_rss
+
+    def sample(self):
+        """Record the current process RSS (called between pipeline stages)"""
+        rss = process_rss_bytes()
+        if rss > self.peak_rss:
+            self.peak_rss = rss
+
+    @property
+    def peak_delta(self):
+        """Peak RSS growth over the RSS at reservation time"""
+        return self.peak_rss - self.baseline_rss
+
+
+class MemoryBudget:
+    """Process-wide budget for the working set of in-flight image analyses
+
+    Each analysis reserves its estimated peak bytes before decoding and
+    releases them when done. Reservations are granted in arrival order; a
+    burst of large images therefore queues instead of decoding all at once
+    and exhausting memory.
+    """
+
+    def __init__(self, budget_bytes=None, timeout=None):
+        """
+        Args:
+            budget_bytes: Bytes shared by concurrent analyses
+                (defaults to Config.MEMORY_BUDGET_MB)
+            timeout: Seconds to wait for a reservation before giving up
+                (defaults to Config.MEMORY_BUDGET_TIMEOUT)
+        """
+        self.budget_bytes = budget_bytes or Config.MEMORY_BUDGET_MB * 1024 * 1024
+        self.timeout = timeout if timeout is not None else Config.MEMORY_BUDGET_TIMEOUT
+
+        self._cond = threading.Condition()
+        self._waiters = deque()
+        self._reserved = 0
+        self._holders = 0
+
+        metrics.set_gauge('memory.budget_bytes', self.budget_bytes)
+
+    @property
+    def reserved_bytes(self):
+        """Bytes currently reserved"""
+        return self._reserved
+
+    def _acquire(self, nbytes, timeout):
+        """Wait until nbytes fit and this request is first in line"""
+        ticket = object()
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                while self._waiters[0] is not ticket or self._reserved + nbytes > self.budget_bytes:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.incr('memory.rejected')
+                        raise MemoryBudgetError(
+                            f"No memory budget for {nbytes / (1024 * 1024):.1f}MB within {timeout:.1f}s"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters.remove(ticket)
+                # The next waiter may now be at the head of the line
+                self._cond.notify_all()
+
+            solo = self._holders == 0
+            self._reserved += nbytes
+            self._holders += 1
+            metrics.set_gauge('memory.reserved_bytes', self._reserved)
+        return solo
+
+    def _release(self, nbytes):
+        with self._cond:
+            self._reserved -= nbytes
+            self._holders -= 1
+            metrics.set_gauge('memory.reserved_bytes', self._reserved)
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes, timeout=None):
+        """
+        Hold part of the budget for the duration of a block
+
+        A request larger than the whole budget is clamped to it, so it still
+        runs, but only on its own.
+
+        Args:
+            nbytes: Estimated peak bytes of the work
+            timeout: Seconds to wait (defaults to the budget's)
+
+        Yields:
+            MemoryReservation: Call sample() between stages to track peak RSS
+
+        Raises:
+            MemoryBudgetError: If the reservation is not granted in time
+        """
+        nbytes = min(int(nbytes), self.budget_bytes)
+        start = time.perf_counter()
+        try:
+            solo = self._acquire(nbytes, self.timeout if timeout is None else timeout)
+        finally:
+            metrics.observe('memory.wait_ms', (time.perf_counter() - start) * 1000.0)
+
+        reservation = MemoryReservation(nbytes, solo)
+        try:
+            yield reservation
+        finally:
+            reservation.sample()
+            self._release(nbytes)
+            self._report(reservation)
+
+    @staticmethod
+    def _report(reservation):
+        """Publish actual versus estimated memory for calibrating the estimator"""
+        metrics.observe('memory.estimate_bytes', reservation.nbytes)
+        metrics.observe('memory.peak_rss_delta_bytes', reservation.peak_delta)
+        # Only a request that ran alone can be blamed for the whole RSS growth
+        if reservation.solo and reservation.nbytes:
+            metrics.observe('memory.peak_to_estimate', reservation.peak_delta / reservation.nbytes)
+
+        logger.debug(
+            f"Request memory: estimated {reservation.nbytes // 1024}KB, "
+            f"peak RSS +{reservation.peak_delta // 1024}KB{' (solo)' if reservation.solo else ''}"
+        )
@@ -0,0 +1,197 @@
+import numpy as np
+from config import Config
+from utils.color_space import hex_to_lab
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+# Seasonal color analysis: each season's flattering colors as (name, hex)
+SEASON_PALETTES = {
+    # Warm and light: clear, warm colors
+    'spring': [
+        ('coral', '#FF7F50'), ('peach', '#FFCBA4'), ('warm_ivory', '#FFF8E7'),
+        ('golden_yellow', '#FFDF00'), ('light_camel', '#C8A165'), ('turquoise', '#40E0D0'),
+        ('leaf_green', '#5CA904'), ('salmon', '#FA8072'), ('poppy_red', '#E35335'),
+        ('warm_pink', '#F9829B'), ('bright_navy', '#2D4E8A'), ('apricot', '#FBCEB1')
+    ],
+    # Cool and light: soft, muted cool colors
+    'summer': [
+        ('powder_blue', '#B0E0E6'), ('lavender', '#B57EDC'), ('mauve', '#C08081'),
+        ('soft_navy', '#3B4A6B'), ('slate_grey', '#708090'), ('cool_mint', '#98D7C2'),
+        ('raspberry', '#B3446C'), ('soft_white', '#F5F5F5'), ('periwinkle', '#CCCCFF'),
+        ('dusty_blue', '#6C8EA4'), ('rose_pink', '#E7A1B0'), ('plum_grey', '#8E7F8E')
+    ],
+    # Warm and deep: rich, earthy colors
+    'autumn': [
+        ('olive', '#808000'), ('mustard', '#E1AD01'), ('rust', '#B7410E'),
+        ('terracotta', '#E2725B'), ('camel', '#C19A6B'), ('chocolate', '#7B3F00'),
+        ('forest_green', '#228B22'), ('teal', '#008080'), ('burnt_orange', '#CC5500'),
+        ('warm_beige', '#D8B48F'), ('burgundy', '#800020'), ('bronze', '#CD7F32')
+    ],
+    # Cool and deep: clear, high-contrast colors
+    'winter': [
+        ('black', '#000000'), ('pure_white', '#FFFFFF'), ('true_red', '#BF0A30'),
+        ('royal_blue', '#4169E1'), ('emerald', '#50C878'), ('fuchsia', '#C71585'),
+        ('icy_pink', '#F8D7E3'), ('charcoal', '#36454F'), ('navy_blue', '#000080'),
+        ('sapphire', '#0F52BA'), ('plum', '#8E4585'), ('icy_blue', '#D6ECEF')
+    ]
+}
+
+# Skin depth of each ColorAnalyzer skin tone
+SKIN_DEPTH = {
+    'very_light': 'light', 'light': 'light', 'medium': 'medium',
+    'tan': 'deep', 'dark': 'deep', 'very_dark': 'deep'
+}
+
+# Seasons flattering each (undertone, depth)
+SEASONS = {
+    ('warm', 'light'): ('spring',),
+    ('warm', 'medium'): ('spring', 'autumn'),
+    ('warm', 'deep'): ('autumn',),
+    ('cool', 'light'): ('summer',),
+    ('cool', 'medium'): ('summer', 'winter'),
+    ('cool', 'deep'): ('winter',),
+    ('neutral', 'light'): ('spring', 'summer'),
+    ('neutral', 'medium'): ('spring', 'summer', 'autumn', 'winter'),
+    ('neutral', 'deep'): ('autumn', 'winter')
+}
+
+# Typical CIELAB lightness of each skin tone, for contrast scoring
+SKIN_LIGHTNESS = {
+    'very_light': 85.0, 'light': 75.0, 'medium': 62.0,
+    'tan': 52.0, 'dark': 40.0, 'very_dark': 28.0
+}
+
+
+class _Candidates:
+    """Colors of a season combination with their Lab values and pairwise distances"""
+
+    def __init__(self, seasons):
+        entries = {}
+        for season in seasons:
+            for name, hex_color in SEASON_PALETTES[season]:
+                entries.setdefault(name, hex_color)
+
+        self.names = list(entries)
+        self.hex = [hex_color.lower() for hex_color in entries.values()]
+        self.lab = hex_to_lab(self.hex)
+        self.lightness = self.lab[:, 0]
+        self.chroma = np.hypot(self.lab[:, 1], self.lab[:, 2])
+        self.hue = np.arctan2(self.lab[:, 2], self.lab[:, 1])
+        self.distance = np.linalg.norm(self.lab[:, None, :] - self.lab[None, :, :], axis=2)
+
+
+class PaletteEngine:
+    """Rule-based color recommendations from skin tone and undertone
+
+    The (undertone, skin depth) pair picks seasonal palettes; their colors
+    are scored against the person's detected dominant colors and skin
+    lightness, and the best colors that are visibly different from each
+    other are returned. All tables are converted to CIELAB once, so a
+    recommendation is a few small NumPy operations and needs no LLM.
+    """
+
+    # Score weights
+    HARMONY_WEIGHT = 0.4
+    CONTRAST_WEIGHT = 0.3
+    DUPLICATE_PENALTY = 0.5
+
+    # CIE76 distances: closer than DUPLICATE_DELTA_E to a color already worn
+    # is a duplicate; picked colors are at least MIN_DELTA_E apart
+    DUPLICATE_DELTA_E = 12.0
+    MIN_DELTA_E = 25.0
+
+    # Colors below this chroma have no meaningful hue (greys, black, white)
+    NEUTRAL_CHROMA = 10.0
+
+    def __init__(self, size=None):
+        """
+        Args:
+            size: Colors per recommendation (defaults to Config.PALETTE_SIZE)
+        """
+        self.size = size or Config.PALETTE_SIZE
+        self._candidates = {seasons: _Candidates(seasons) for seasons in set(SEASONS.values())}
+
+    @staticmethod
+    def seasons(skin_tone, undertone):
+        """
+        Seasonal palettes for a skin tone and undertone
+
+        Unknown values are treated as a neutral undertone and medium depth.
+
+        Returns:
+            tuple: Season names
+        """
+        depth = SKIN_DEPTH.get(skin_tone, 'medium')
+        return SEASONS[(undertone if undertone in ('warm', 'cool') else 'neutral', depth)]
+
+    def score(self, candidates, skin_tone, dominant_colors):
+        """
+        Score every candidate color
+
+        Harmony rewards hues analogous or complementary to the colors the
+        person wears (cos 2*delta: 1 at 0 and 180 degrees, -1 at 90); hueless
+        colors on either side score neutrally. Contrast rewards lightness
+        away from the skin. Near-copies of a worn color are penalized.
+
+        Args:
+            candidates: _Candidates of the season combination
+            skin_tone: ColorAnalyzer skin tone label
+            dominant_colors: '#rrggbb' strings (may be empty)
+
+        Returns:
+            numpy.ndarray: One score per candidate
+        """
+        skin_lightness = SKIN_LIGHTNESS.get(skin_tone, SKIN_LIGHTNESS['medium'])
+        contrast = np.clip(np.abs(candidates.lightness - skin_lightness) / 50.0, 0.0, 1.0)
+        scores = self.CONTRAST_WEIGHT * contrast
+
+        if dominant_colors:
+            worn = hex_to_lab(dominant_colors)
+            worn_chroma = np.hypot(worn[:, 1], worn[:, 2])
+            worn_hue = np.arctan2(worn[:, 2], worn[:, 1])
+
+            harmony = 0.5 * (1.0 + np.cos(2.0 * (candidates.hue[:, None] - worn_hue[None, :])))
+            hueless = (candidates.chroma[:, None] < self.NEUTRAL_CHROMA) | \
+                (worn_chroma[None, :] < self.NEUTRAL_CHROMA)
+            harmony = np.where(hueless, 0.5, harmony)
+            scores += self.HARMONY_WEIGHT * harmony.max(axis=1)
+
+            distance = np.linalg.norm(candidates.lab[:, None, :] - worn[None, :, :], axis=2)
+            scores -= self.DUPLICATE_PENALTY * (distance.min(axis=1) < self.DUPLICATE_DELTA_E)
+        else:
+            scores += self.HARMONY_WEIGHT * 0.5
+
+        return scores
+
+    def recommend(self, analysis_data, size=None):
+        """
+        Recommend a color palette
+
+        Args:
+            analysis_data: Dict with skin_tone, undertone and dominant_colors
+            size: Number of colors (defaults to the engine's size)
+
+        Returns:
+            list: [{"name": ..., "hex": "#rrggbb"}, ...] best first
+        """
+        size = size or self.size
+        skin_tone = analysis_data.get('skin_tone')
+        candidates = self._candidates[self.seasons(skin_tone, analysis_data.get('undertone'))]
+        scores = self.score(candidates, skin_tone, analysis_data.get('dominant_colors') or [])
+        order = np.argsort(-scores, kind='stable')
+
+        # Greedy pick of the best colors at least MIN_DELTA_E from those already picked
+        close = candidates.distance < self.MIN_DELTA_E
+        blocked = np.zeros(len(order), dtype=bool)
+        picked = []
+        for index in order.tolist():
+            if not blocked[index]:
+                picked.append(index)
+                if len(picked) == size:
+                    break
+                blocked |= close[index]
+
+        metrics.incr('palette.recommendations')
+        return [{'name': candidates.names[i], 'hex': candidates.hex[i]} for i in picked]
@@ -0,0 +1,461 @@
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+
+def build_record(endpoint, analysis, recommendations=None, personalization=None,
+                 dress_prompts=None, quality_tier=None):
+    """
+    Build an analysis history record
+
+    Args:
+        endpoint: Route that produced the result
+        analysis: Physical attribute analysis
+        recommendations: Generated recommendations
+        personalization: Personalization parameters
+        dress_prompts: Generated dress design prompts
+        quality_tier: Name of the tier that served the request
+
+    Returns:
+        dict: Record ready for AnalysisPersistence.submit()
+    """
+    return {
+        'id': uuid.uuid4().hex,
+        'created_at': time.time(),
+        'endpoint': endpoint,
+        'quality_tier': quality_tier,
+        'analysis': analysis,
+        'personalization': personalization or {},
+        'recommendations': recommendations,
+        'dress_prompts': dress_prompts
+    }
+
+
+class SQLiteBackend:
+    """Local SQLite table of analysis records (default stand-in for a database)"""
+
+    JSON_COLUMNS = ('analysis', 'personalization', 'recommendations', 'dress_prompts')
+    COLUMNS = ('id', 'created_at', 'endpoint', 'quality_tier') + JSON_COLUMNS
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: Database file (defaults to Config.PERSISTENCE_SQLITE_PATH)
+        """
+        self.path = path or Config.PERSISTENCE_SQLITE_PATH
+        self._conn = None
+
+    def _connect(self):
+        """Open the connection in the calling (flusher) thread"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "id TEXT PRIMARY KEY, created_at REAL, endpoint TEXT, quality_tier TEXT, "
+                "analysis TEXT, personalization TEXT, recommendations TEXT, dress_prompts TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created_at ON analyses (created_at)")
+            self._conn.commit()
+        return self._conn
+
+    def write_batch(self, records):
+        """
+        Insert records in one transaction
+
+        Args:
+            records: List of record dicts
+        """
+        conn = self._connect()
+        rows = [
+            tuple(
+                json.dumps(record.get(column)) if column in self.JSON_COLUMNS else record.get(column)
+                for column in self.COLUMNS
+            )
+            for record in records
+        ]
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO analyses ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                rows
+            )
+
+    def close(self):
+        """Close the connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SupabaseBackend:
+    """Supabase (PostgREST) table of analysis records"""
+
+    def __init__(self, url=None, key=None, table=None):
+        """
+        Args:
+            url: Supabase project URL (defaults to Config.SUPABASE_URL)
+            key: Supabase API key (defaults to Config.SUPABASE_KEY)
+            table: Table name (defaults to Config.SUPABASE_TABLE)
+        """
+        self.url = url or Config.SUPABASE_URL
+        self.key = key or Config.SUPABASE_KEY
+        self.table = table or Config.SUPABASE_TABLE
+        if not self.url or not self.key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY are required for the Supabase backend")
+        self._client = None
+
+    def write_batch(self, records):
+        """
+        Insert records with a single bulk request
+
+        Args:
+            records: List of record dicts (JSON columns map to jsonb)
+        """
+        if self._client is None:
+            from supabase import create_client
+            self._client = create_client(self.url, self.key)
+
+        rows = [
+            {**record, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(record['created_at']))}
+            for record in records
+        ]
+        self._client.table(self.table).upsert(rows, ignore_duplicates=True).execute()
+
+    def close(self):
+        """Nothing to release (HTTP client)"""
+        self._client = None
+
+
+class AnalysisPersistence:
+    """Write-behind store for analysis records
+
+    submit() never blocks the request: records go into a bounded queue and a
+    background thread writes them in batches. When the queue is full (the
+    backend is slow or down), records are either dropped or spilled to a local
+    JSON-lines file that is replayed once the backend keeps up again. Spilling
+    is done by the background thread too: submit() only hands the record over
+    (up to another max_queue records, beyond which they are dropped).
+
+    Each process spills to its own file (spill_path + '.<pid>'), so prefork
+    workers never touch each other's records. A spill file left behind by a
+    process that has exited is claimed with an atomic rename and replayed by
+    whichever live worker gets to it first.
+    """
+
+    OVERFLOW_POLICIES = ('spill', 'drop')
+
+    # Seconds to wait after a failed write before replaying, doubled on each
+    # further failure up to the maximum
+    RETRY_BACKOFF = 5.0
+    MAX_RETRY_BACKOFF = 300.0
+
+    def __init__(self, backend, max_queue=None, batch_size=None, flush_interval=None,
+                 overflow=None, spill_path=None):
+        """
+        Start the background flusher
+
+        Args:
+            backend: Object with write_batch(records) and close()
+            max_queue: Records buffered in memory (defaults to Config.PERSISTENCE_QUEUE_SIZE)
+            batch_size: Maximum records per write (defaults to Config.PERSISTENCE_BATCH_SIZE)
+            flush_interval: Seconds to wait for a batch to fill
+                (defaults to Config.PERSISTENCE_FLUSH_INTERVAL)
+            overflow: 'spill' or 'drop' when the queue is full
+                (defaults to Config.PERSISTENCE_OVERFLOW)
+            spill_path: Prefix of the per-process JSON-lines spill files
+                (defaults to Config.PERSISTENCE_SPILL_PATH)
+        """
+        self.backend = backend
+        self.batch_size = batch_size or Config.PERSISTENCE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else Config.PERSISTENCE_FLUSH_INTERVAL
+        self.overflow = overflow or Config.PERSISTENCE_OVERFLOW
+        self.spill_path = spill_path or Config.PERSISTENCE_SPILL_PATH
+        if self.overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {self.overflow}")
+
+        self._queue = queue.Queue(maxsize=max_queue or Config.PERSISTENCE_QUEUE_SIZE)
+        # Records the flusher spills on its next pass
+        self._overflow = deque()
+        self._max_overflow = self._queue.maxsize
+        self._backoff = self.RETRY_BACKOFF
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='persistence-flusher', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """
+        Queue a record without waiting on the backend
+
+        Args:
+            record: Record from build_record()
+
+        Returns:
+            bool: True if queued, False if spilled or dropped
+        """
+        try:
+            self._queue.put_nowait(record)
+            metrics.set_gauge('persistence.queue_depth', self._queue.qsize())
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow == 'spill' and len(self._overflow) < self._max_overflow:
+            # Written to the spill file by the flusher, never on the request path
+            self._overflow.append(record)
+        else:
+            metrics.incr('persistence.dropped')
+        return False
+
+    def _own_spill_path(self):
+        """This process's spill file (evaluated per call, so it is correct after a fork)"""
+        return f"{self.spill_path}.{os.getpid()}"
+
+    def _spill(self, records):
+        """Append records to this process's spill file (flusher thread only)"""
+        try:
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self._own_spill_path(), 'a') as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            metrics.incr('persistence.spilled', len(records))
+        except OSError as e:
+            logger.error(f"Could not spill {len(records)} record(s): {str(e)}")
+            metrics.incr('persistence.dropped', len(records))
+
+    def _spill_overflow(self):
+        """Spill the records submit() could not queue"""
+        records = []
+        while self._overflow:
+            records.append(self._overflow.popleft())
+        if records:
+            self._spill(records)
+
+    def _next_batch(self):
+        """Wait up to flush_interval for a batch of records"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        """Everything currently queued, without waiting"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _write(self, records):
+        """
+        Write records in batch_size chunks
+
+        Returns:
+            bool: True if every chunk was written
+        """
+        for start in range(0, len(records), self.batch_size):
+            chunk = records[start:start + self.batch_size]
+            began = time.perf_counter()
+            try:
+                self.backend.write_batch(chunk)
+            except Exception as e:
+                logger.error(f"Persistence flush of {len(chunk)} record(s) failed: {str(e)}")
+                metrics.incr('persistence.flush_errors')
+                # Hold replays back while the backend is failing
+                self._retry_at = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, self.MAX_RETRY_BACKOFF)
+                remaining = records[start:]
+                if self.overflow == 'spill':
+                    self._spill(remaining)
+                else:
+                    metrics.incr('persistence.dropped', len(remaining))
+                return False
+
+            metrics.observe('persistence.flush_ms', (time.perf_counter() - began) * 1000.0)
+            metrics.observe('persistence.batch_size', len(chunk))
+            metrics.incr('persistence.written', len(chunk))
+        self._backoff = self.RETRY_BACKOFF
+        return True
+
+    @staticmethod
+    def _process_alive(pid):
+        """Whether a process with this pid exists"""
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _claim_spill_file(self):
+        """
+        Atomically take over one spill file to replay
+
+        Candidates are this process's own spill file and the spill or replay
+        files of processes that have exited. Live processes' files are never
+        touched. The rename fails harmlessly if another worker claimed the
+        file first.
+
+        Returns:
+            str: Claimed file (renamed to '<spill>.<pid>.replay'), or None
+        """
+        directory = os.path.dirname(self.spill_path) or '.'
+        prefix = os.path.basename(self.spill_path) + '.'
+        if not os.path.isdir(directory):
+            return None
+
+        pid = os.getpid()
+        target = f"{self._own_spill_path()}.replay"
+        for name in sorted(os.listdir(directory)):
+            if not name.startswith(prefix):
+                continue
+            owner, _, suffix = name[len(prefix):].partition('.')
+            if not owner.isdigit() or suffix not in ('', 'replay'):
+                continue
+            owner = int(owner)
+            if owner == pid:
+                if suffix:
+                    continue
+            elif self._process_alive(owner):
+                continue
+
+            try:
+                os.rename(os.path.join(directory, name), target)
+            except FileNotFoundError:
+                continue
+            return target
+        return None
+
+    def _replay_spill(self):
+        """Write back one spill file once the queue is idle and the backend healthy"""
+        if time.monotonic() < self._retry_at:
+            return
+
+        replay_path = self._claim_spill_file()
+        if replay_path is None:
+            return
+
+        logger.info(f"Replaying spilled records from {replay_path}")
+        # Streamed batch_size lines at a time; records that fail again are
+        # spilled to this process's file
+        with open(replay_path) as f:
+            batch = []
+            for line in f:
+                try:
+                    batch.append(json.loads(line))
+                except ValueError:
+                    # Torn write from a crash
+                    metrics.incr('persistence.dropped')
+                if len(batch) < self.batch_size:
+                    continue
+                if not self._replay_batch(batch, f):
+                    break
+                batch = []
+            else:
+                if batch:
+                    self._replay_batch(batch, f)
+        os.remove(replay_path)
+
+    def _replay_batch(self, batch, rest):
+        """
+        Write one batch of a spill file being replayed
+
+        Args:
+            batch: Parsed records
+            rest: The spill file, positioned after the batch
+
+        Returns:
+            bool: True if written; otherwise the rest of the file has been
+                moved to this process's spill file
+        """
+        if self._write(batch):
+            metrics.incr('persistence.replayed', len(batch))
+            return True
+
+        try:
+            with open(self._own_spill_path(), 'a') as f:
+                shutil.copyfileobj(rest, f)
+        except OSError as e:
+            logger.error(f"Could not re-spill the rest of a replay: {str(e)}")
+            metrics.incr('persistence.flush_errors')
+        return False
+
+    def _run(self):
+        """Flusher loop"""
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            metrics.set_gauge('persistence.queue_depth', self._queue.qsize())
+            self._spill_overflow()
+            if batch:
+                self._write(batch)
+            elif self.overflow == 'spill':
+                self._replay_spill()
+
+        # Final flush on shutdown
+        remaining = self._drain()
+        if remaining:
+            self._write(remaining)
+        self._spill_overflow()
+        self.backend.close()
+
+    def close(self, timeout=10):
+        """
+        Flush what is queued and stop the flusher
+
+        Args:
+            timeout: Seconds to wait for the final flush
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+
+def create_persistence():
+    """
+    Build the configured persistence layer
+
+    Returns:
+        AnalysisPersistence: Write-behind store, or None if disabled
+    """
+    backend_name = Config.PERSISTENCE_BACKEND
+    if backend_name == 'none':
+        return None
+
+    if backend_name == 'supabase':
+        backend = SupabaseBackend()
+    elif backend_name == 'sqlite':
+        backend = SQLiteBackend()
+    else:
+        raise ValueError(f"Unknown persistence backend: {backend_name}")
+
+    logger.info(f"Persisting analyses to {backend_name} (write-behind)")
+    return AnalysisPersistence(backend)
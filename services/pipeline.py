@@ -0,0 +1,293 @@
+import hashlib
+import math
+import time
+from contextlib import contextmanager, nullcontext
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.image_probe import probe_file, oriented_size
+from utils.perceptual_hash import dhash, color_thumbnail
+from .image_processing import ImageProcessor
+from .mediapipe_analysis import MediaPipeAnalyzer
+from .color_analysis import ColorAnalyzer
+from .resolution import ResolutionPolicy
+from .analysis_result import AnalysisResult
+
+logger = setup_logger(__name__)
+
+class VisionPipeline:
+    """Run image loading, MediaPipe and color analysis as one unit"""
+
+    def __init__(self, image_processor=None, mediapipe_analyzer=None, color_analyzer=None,
+                 stage_observer=None, resolution_policy=None, analyzer_pool=None,
+                 memory_budget=None, duplicate_index=None, shared_cache=None):
+        """
+        Initialize the pipeline
+
+        Args:
+            image_processor: ImageProcessor instance (created if omitted)
+            mediapipe_analyzer: MediaPipeAnalyzer instance (created if omitted
+                and no analyzer_pool is given)
+            color_analyzer: ColorAnalyzer instance (created if omitted)
+            stage_observer: Optional callable(stage, elapsed_ms) notified after each stage
+            resolution_policy: ResolutionPolicy for per-stage sizes (defaults to Config)
+            analyzer_pool: Optional AnalyzerPool; each analysis checks out its
+                own MediaPipeAnalyzer instead of sharing one
+            memory_budget: Optional MemoryBudget; analyze_file() reserves each
+                image's estimated working set before decoding it
+            duplicate_index: Optional NearDuplicateIndex; near-identical images
+                reuse a stored analysis instead of running MediaPipe and color
+            shared_cache: Optional SharedCache; an image any worker process has
+                already analyzed (same bytes, same tier) is not analyzed again
+        """
+        self.image_processor = image_processor or ImageProcessor()
+        self.analyzer_pool = analyzer_pool
+        if analyzer_pool is None:
+            mediapipe_analyzer = mediapipe_analyzer or MediaPipeAnalyzer()
+        self.mediapipe_analyzer = mediapipe_analyzer
+        self.color_analyzer = color_analyzer or ColorAnalyzer()
+        self.stage_observer = stage_observer
+        self.resolution_policy = resolution_policy or ResolutionPolicy()
+        self.memory_budget = memory_budget
+        self.duplicate_index = duplicate_index
+        self.shared_cache = shared_cache
+
+    @contextmanager
+    def stage(self, name, reservation=None):
+        """
+        Time a pipeline stage
+
+        Records the duration under "stage.<name>_ms" and notifies the observer.
+
+        Args:
+            name: Stage name (decode, preprocess, mediapipe, color, llm)
+            reservation: Optional MemoryReservation sampled when the stage ends
+        """
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            metrics.observe(f"stage.{name}_ms", elapsed_ms)
+            if name == 'llm':
+                # Upstream latency, tracked apart from the vision SLO
+                metrics.observe_slo('llm', elapsed_ms, Config.LLM_SLO_MS, ok)
+            if self.stage_observer is not None:
+                self.stage_observer(name, elapsed_ms)
+            if reservation is not None:
+                reservation.sample()
+
+    @staticmethod
+    def vision_only_tier(tier):
+        """
+        Tier for vision-only requests
+
+        Same pose and resolution settings as the given tier, but color
+        clustering is always sampled so the whole analysis stays fast.
+
+        Args:
+            tier: Quality tier dict
+
+        Returns:
+            dict: Tier with color_max_samples capped
+        """
+        cap = Config.VISION_ONLY_COLOR_SAMPLES
+        samples = tier['color_max_samples']
+        return dict(tier, color_max_samples=cap if samples is None else min(samples, cap))
+
+    @staticmethod
+    def estimate_peak_bytes(header, tier, reduction=1):
+        """
+        Estimate the peak working set of analyzing one image
+
+        The decoded image is held until the analysis ends; every pixel of the
+        resized frame costs MEMORY_BYTES_PER_FRAME_PIXEL across the pipeline's
+        copies (RGB, YCrCb, pyramid, masks, clustering samples).
+
+        Args:
+            header: ImageHeader from the upload probe
+            tier: Quality tier dict (frame size)
+            reduction: Decoder reduction factor (see decode_reduction)
+
+        Returns:
+            int: Estimated bytes
+        """
+        width, height = oriented_size(header)
+        width, height = math.ceil(width / reduction), math.ceil(height / reduction)
+        decoded = width * height * max(3, header.channels)
+
+        scale = min(1.0, tier['max_width'] / width, tier['max_height'] / height)
+        frame_pixels = int(width * scale) * int(height * scale)
+
+        return (decoded + frame_pixels * Config.MEMORY_BYTES_PER_FRAME_PIXEL +
+                Config.MEMORY_REQUEST_OVERHEAD_MB * 1024 * 1024)
+
+    def memory_reservation(self, header, tier, reduction):
+        """
+        Context manager reserving an image's working set from the memory budget
+
+        Returns:
+            Context manager: MemoryBudget reservation, or None without a budget
+        """
+        if self.memory_budget is None:
+            return nullcontext()
+        return self.memory_budget.reserve(self.estimate_peak_bytes(header, tier, reduction))
+
+    @staticmethod
+    def tier_rank(tier):
+        """
+        Position of a tier in Config.QUALITY_TIERS (0 = best)
+
+        Args:
+            tier: Quality tier dict
+
+        Returns:
+            int: Tier index (unknown tiers rank below every configured one)
+        """
+        names = [t['name'] for t in Config.QUALITY_TIERS]
+        return names.index(tier['name']) if tier['name'] in names else len(names)
+
+    @staticmethod
+    def image_hash(frame):
+        """
+        Perceptual hash of a frame, from its smallest useful pyramid level
+
+        Args:
+            frame: Frame being analyzed
+
+        Returns:
+            int: 64-bit dHash
+        """
+        return frame.memo('dhash', lambda: dhash(frame.level(frame.level_for_size(64, 64))))
+
+    @staticmethod
+    def image_thumbnail(frame):
+        """
+        Color thumbnail of a frame, confirming near-duplicate hash matches
+
+        Args:
+            frame: Frame being analyzed
+
+        Returns:
+            numpy.ndarray: Thumbnail (see color_thumbnail)
+        """
+        return frame.memo('thumbnail', lambda: color_thumbnail(frame.level(frame.level_for_size(64, 64))))
+
+    def mediapipe_checkout(self):
+        """
+        Context manager yielding the MediaPipeAnalyzer for one analysis
+
+        Returns:
+            Context manager: pool check-out, or the shared instance
+        """
+        if self.analyzer_pool is not None:
+            return self.analyzer_pool.checkout()
+        return nullcontext(self.mediapipe_analyzer)
+
+    def analyze_image(self, image, tier=None, reservation=None):
+        """
+        Analyze a decoded image
+
+        Args:
+            image: OpenCV image (BGR)
+            tier: Quality tier dict (defaults to the best tier)
+            reservation: Optional MemoryReservation sampled after each stage
+
+        Returns:
+            dict: Combined body/face shape and color analysis
+        """
+        if tier is None:
+            tier = Config.QUALITY_TIERS[0]
+
+        policy = self.resolution_policy
+
+        with self.stage('preprocess', reservation):
+            frame = self.image_processor.create_frame(image, tier['max_width'], tier['max_height'])
+
+        # A re-upload of an already analyzed photo skips the CV stages
+        if self.duplicate_index is not None:
+            with self.stage('dedup', reservation):
+                image_hash = self.image_hash(frame)
+                thumbnail = self.image_thumbnail(frame)
+                duplicate = self.duplicate_index.lookup(
+                    image_hash, thumbnail, frame.shape[:2], self.tier_rank(tier)
+                )
+            if duplicate is not None:
+                return duplicate
+
+        with self.mediapipe_checkout() as mediapipe_analyzer, self.stage('mediapipe', reservation):
+            mediapipe_results, pose_landmarks = mediapipe_analyzer.analyze_with_landmarks(
+                policy.image(frame, 'pose'),
+                tier['pose_complexity'],
+                face_image=policy.image(frame, 'face')
+            )
+
+        with self.stage('color', reservation):
+            color_results = self.color_analyzer.analyze(
+                frame, tier['color_max_samples'], pose_landmarks, policy
+            )
+
+        analysis = {
+            **mediapipe_results,
+            **color_results
+        }
+
+        if self.duplicate_index is not None:
+            self.duplicate_index.add(image_hash, thumbnail, frame.shape[:2], analysis, self.tier_rank(tier))
+
+        return analysis
+
+    def analyze_file(self, image_path, tier=None, header=None):
+        """
+        Load and analyze an image file
+
+        Args:
+            image_path: Path to image file
+            tier: Quality tier dict (defaults to the best tier)
+            header: ImageHeader from an earlier probe (probed here if omitted)
+
+        Returns:
+            dict: Combined body/face shape and color analysis
+
+        Raises:
+            MemoryBudgetError: If the image's working set does not fit the
+                memory budget in time
+        """
+        if tier is None:
+            tier = Config.QUALITY_TIERS[0]
+
+        if self.shared_cache is None:
+            return self._analyze_file(image_path, tier, header)
+
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        key = self.shared_cache.make_key('analysis', (digest, tier['name'], tier['color_max_samples']))
+        return self.shared_cache.get_or_compute(
+            key, lambda: self._analyze_file(image_path, tier, header), codec=AnalysisResult
+        )
+
+    def _analyze_file(self, image_path, tier, header):
+        """Probe, decode and analyze an image file (see analyze_file)"""
+        if header is None:
+            with self.stage('probe'):
+                header = probe_file(image_path)
+
+        # Client-downscaled uploads go straight to analysis (no resize at full quality)
+        metrics.incr('uploads.normalized' if self.image_processor.is_normalized(header) else 'uploads.oversized')
+
+        # Large JPEGs are shrunk by the decoder instead of after a full decode
+        reduction = self.image_processor.decode_reduction(header, tier['max_width'], tier['max_height'])
+        if reduction > 1:
+            metrics.incr(f"decode.reduced_{reduction}x")
+
+        # Large images wait here for memory instead of decoding all at once
+        with self.memory_reservation(header, tier, reduction) as reservation:
+            with self.stage('decode', reservation):
+                image = self.image_processor.load_image(image_path, reduction)
+
+            return self.analyze_image(image, tier, reservation)
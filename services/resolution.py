@@ -0,0 +1,48 @@
+from config import Config
+
+class ResolutionPolicy:
+    """Target size per analysis stage, served from one Frame pyramid"""
+
+    STAGES = ('pose', 'face', 'skin', 'clothing')
+
+    def __init__(self, sizes=None):
+        """
+        Initialize the policy
+
+        Args:
+            sizes: Optional {stage: (max_width, max_height)} overrides on top of
+                Config.STAGE_RESOLUTIONS
+        """
+        self.sizes = dict(Config.STAGE_RESOLUTIONS)
+        if sizes:
+            self.sizes.update(sizes)
+
+    def level(self, frame, stage):
+        """
+        Pyramid level a stage should run at
+
+        Picks the largest pyramid level that fits within the stage's target
+        size, so stages never trigger a resize of their own.
+
+        Args:
+            frame: Frame being analyzed
+            stage: One of STAGES
+
+        Returns:
+            int: Pyramid level
+        """
+        max_width, max_height = self.sizes[stage]
+        return frame.level_for_size(max_width, max_height)
+
+    def image(self, frame, stage):
+        """
+        RGB image for a stage
+
+        Args:
+            frame: Frame being analyzed
+            stage: One of STAGES
+
+        Returns:
+            numpy.ndarray: Pyramid level image for the stage
+        """
+        return frame.level(self.level(frame, stage))
@@ -0,0 +1,334 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import metrics
+
+logger = setup_logger(__name__)
+
+
+class SharedCache:
+    """Cache shared by every worker process on the host, in one SQLite file
+
+    WAL mode lets all workers read concurrently while one writes. Values are
+    stored as zlib-compressed compact JSON unless the caller passes a codec
+    (any object with encode(value) -> bytes and decode(bytes) -> value, such
+    as AnalysisResult). get_or_compute() coalesces concurrent misses across
+    processes: the first caller takes a lease on the key and computes, later
+    callers wait for its value instead of repeating the work. Entries beyond
+    max_entries are evicted least recently used first.
+    """
+
+    # Each process checks the size only every this many puts, so the table
+    # may briefly run over max_entries by about this much per worker
+    EVICT_INTERVAL = 100
+
+    # Reads only refresh an entry's recency after this many seconds, so hot
+    # keys do not turn every read into a write
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path=None, max_entries=None, lease_seconds=None, poll_interval=None):
+        """
+        Args:
+            path: SQLite database file (defaults to Config.SHARED_CACHE_PATH)
+            max_entries: Entries kept (defaults to Config.SHARED_CACHE_MAX_ENTRIES)
+            lease_seconds: How long a computing worker owns a missing key before
+                another may take over (defaults to Config.SHARED_CACHE_LEASE_SECONDS)
+            poll_interval: Seconds between checks while waiting on another
+                worker's computation (defaults to Config.SHARED_CACHE_POLL_INTERVAL)
+        """
+        self.path = path or Config.SHARED_CACHE_PATH
+        self.max_entries = max_entries or Config.SHARED_CACHE_MAX_ENTRIES
+        self.lease_seconds = lease_seconds or Config.SHARED_CACHE_LEASE_SECONDS
+        self.poll_interval = poll_interval or Config.SHARED_CACHE_POLL_INTERVAL
+
+        # One connection per thread, reopened after fork
+        self._local = threading.local()
+        self._puts = itertools.count(1)
+
+    @staticmethod
+    def make_key(namespace, key):
+        """
+        Fixed-size key for any repr-stable value
+
+        Args:
+            namespace: Kind of cached value, e.g. 'analysis'
+            key: Tuple/str identifying the input
+
+        Returns:
+            bytes: 20-byte digest
+        """
+        return hashlib.sha1(f"{namespace}:{key!r}".encode()).digest()
+
+    @staticmethod
+    def encode(value):
+        """Compact binary form of a JSON-serializable value"""
+        return zlib.compress(json.dumps(value, separators=(',', ':')).encode())
+
+    @staticmethod
+    def decode(blob):
+        """Inverse of encode()"""
+        return json.loads(zlib.decompress(blob))
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key BLOB PRIMARY KEY, value BLOB NOT NULL, accessed REAL NOT NULL) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "key BLOB PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, codec=None):
+        """
+        Look up a value
+
+        Args:
+            key: Key from make_key()
+            codec: Codec the value was stored with (defaults to compressed JSON)
+
+        Returns:
+            Cached value, or None
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT value, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        if now - row[1] > self.TOUCH_INTERVAL:
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return (codec or self).decode(row[0])
+
+    def put(self, key, value, codec=None):
+        """
+        Store a value; every EVICT_INTERVAL puts, evict the least recently used
+        entries beyond max_entries
+
+        Args:
+            key: Key from make_key()
+            value: Value the codec can encode (JSON-serializable by default)
+            codec: Optional codec (defaults to compressed JSON)
+        """
+        conn = self._connection()
+        evict = next(self._puts) % self.EVICT_INTERVAL == 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, accessed) VALUES (?, ?, ?)",
+                (key, (codec or self).encode(value), time.time())
+            )
+            if not evict:
+                return
+            excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (excess,)
+                )
+                metrics.incr('shared_cache.evicted', excess)
+
+    def _try_lease(self, key, owner):
+        """Take the compute lease on a key if nobody holds a live one"""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.expires < ?",
+                (key, owner, now + self.lease_seconds, now)
+            )
+            return cursor.rowcount == 1
+
+    def _release_lease(self, key, owner):
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def _claim(self, key, owner, codec):
+        """
+        One step of get_or_compute: a hit, or the lease, or neither yet
+
+        Returns:
+            tuple: (value, leased) -- value is None unless cached
+        """
+        value = self.get(key, codec)
+        if value is not None:
+            return value, False
+        if self._try_lease(key, owner):
+            # The previous owner may have stored the value just before we took over
+            value = self.get(key, codec)
+            if value is not None:
+                self._release_lease(key, owner)
+            return value, value is None
+        return None, False
+
+    def _store(self, key, owner, value, codec):
+        try:
+            if value is not None:
+                self.put(key, value, codec)
+        finally:
+            self._release_lease(key, owner)
+
+    def acquire(self, key, codec=None):
+        """
+        Wait until a key is cached or this caller holds its compute lease
+
+        The two halves of get_or_compute(), for computations that are not a
+        single call (e.g. results streamed to the client as they finish).
+        A caller given the lease must call release() when done, value or not.
+
+        Args:
+            key: Key from make_key()
+            codec: Optional codec (defaults to compressed JSON)
+
+        Returns:
+            tuple: (value, None) on a hit, (None, owner) when the caller holds
+                the lease, or (None, None) if the cache is unavailable and the
+                caller should compute without storing
+        """
+        owner = uuid.uuid4().hex
+        waited = False
+        try:
+            while True:
+                value, leased = self._claim(key, owner, codec)
+                if value is not None:
+                    metrics.incr('shared_cache.coalesced' if waited else 'shared_cache.hits')
+                    return value, None
+                if leased:
+                    metrics.incr('shared_cache.misses')
+                    return None, owner
+                waited = True
+                time.sleep(self.poll_interval)
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache unavailable, computing locally: {str(e)}")
+            metrics.incr('shared_cache.errors')
+            return None, None
+
+    def release(self, key, owner, value=None, codec=None):
+        """
+        Store a leased key's value and release the lease
+
+        Args:
+            key: Key from make_key()
+            owner: Owner returned by acquire() (None does nothing)
+            value: Computed value; None releases without storing
+            codec: Optional codec (defaults to compressed JSON)
+        """
+        if owner is None:
+            return
+        try:
+            self._store(key, owner, value, codec)
+        except sqlite3.Error as e:
+            logger.error(f"Could not store shared cache entry: {str(e)}")
+            metrics.incr('shared_cache.errors')
+
+    def get_or_compute(self, key, compute, codec=None):
+        """
+        Return the cached value, computing it once across all workers on a miss
+
+        Args:
+            key: Key from make_key()
+            compute: Zero-argument callable; None results are returned but not cached
+            codec: Optional codec (defaults to compressed JSON)
+
+        Returns:
+            Cached or computed value
+        """
+        value, owner = self.acquire(key, codec)
+        if value is not None:
+            return value
+
+        try:
+            value = compute()
+            return value
+        finally:
+            self.release(key, owner, value, codec)
+
+    async def acquire_async(self, key, codec=None):
+        """
+        Async variant of acquire()
+
+        SQLite calls run on a worker thread and waiting uses asyncio.sleep,
+        so the loop is never blocked.
+        """
+        owner = uuid.uuid4().hex
+        waited = False
+        try:
+            while True:
+                value, leased = await asyncio.to_thread(self._claim, key, owner, codec)
+                if value is not None:
+                    metrics.incr('shared_cache.coalesced' if waited else 'shared_cache.hits')
+                    return value, None
+                if leased:
+                    metrics.incr('shared_cache.misses')
+                    return None, owner
+                waited = True
+                await asyncio.sleep(self.poll_interval)
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache unavailable, computing locally: {str(e)}")
+            metrics.incr('shared_cache.errors')
+            return None, None
+
+    async def release_async(self, key, owner, value=None, codec=None):
+        """Async variant of release()"""
+        if owner is not None:
+            await asyncio.to_thread(self.release, key, owner, value, codec)
+
+    async def get_or_compute_async(self, key, compute, codec=None):
+        """
+        Async variant of get_or_compute() for the event loop
+
+        Args:
+            key: Key from make_key()
+            compute: Zero-argument coroutine function
+            codec: Optional codec (defaults to compressed JSON)
+
+        Returns:
+            Cached or computed value
+        """
+        value, owner = await self.acquire_async(key, codec)
+        if value is not None:
+            return value
+
+        try:
+            value = await compute()
+            return value
+        finally:
+            await self.release_async(key, owner, value, codec)
+
+
+def create_shared_cache():
+    """
+    Build the configured shared cache
+
+    Returns:
+        SharedCache: Host-wide cache, or None if SHARED_CACHE_PATH is empty
+    """
+    if not Config.SHARED_CACHE_PATH:
+        return None
+    return SharedCache()
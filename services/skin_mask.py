@@ -0,0 +1,239 @@
+import threading
+import cv2
+import numpy as np
+from config import Config
+from utils.logger import setup_logger
+from .frame import Frame
+
+logger = setup_logger(__name__)
+
+class SkinMaskEngine:
+    """Skin segmentation through a precomputed RGB lookup table at reduced resolution"""
+
+    # YCrCb skin range (Y is unconstrained)
+    YCRCB_LOWER = np.array([0, 133, 77], dtype=np.uint8)
+    YCRCB_UPPER = np.array([255, 173, 127], dtype=np.uint8)
+
+    # Morphology kernel used at full resolution; scaled down with the mask
+    KERNEL_SIZE = 5
+
+    _lut = None
+    _lut_lock = threading.Lock()
+
+    def __init__(self, scale=None):
+        """
+        Initialize the engine
+
+        Args:
+            scale: Downscale factor for lookup and morphology, rounded down to
+                a power of two (defaults to Config.SKIN_MASK_SCALE)
+        """
+        # Powers of two map directly onto Frame pyramid levels
+        self.level = max(1, int(scale or Config.SKIN_MASK_SCALE)).bit_length() - 1
+        self.scale = 1 << self.level
+        self._kernels = {}
+
+    def kernel(self, level=None):
+        """
+        Morphology kernel for a pyramid level
+
+        The structuring element shrinks with the mask so its footprint stays
+        roughly constant in full-frame pixels.
+
+        Args:
+            level: Pyramid level (defaults to the engine's level)
+
+        Returns:
+            numpy.ndarray: Elliptical structuring element
+        """
+        if level is None:
+            level = self.level
+
+        if level not in self._kernels:
+            size = max(3, int(round(self.KERNEL_SIZE / (1 << level))) | 1)
+            self._kernels[level] = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+        return self._kernels[level]
+
+    @classmethod
+    def lookup_table(cls):
+        """
+        Get the RGB -> skin table, building it on first use
+
+        The table has one byte (0 or 255) per 24-bit color and is indexed by
+        the little-endian packed value r | g << 8 | b << 16. It is built by
+        running the YCrCb thresholds over every color, so lookups match
+        cv2.inRange on cv2.cvtColor exactly.
+
+        Returns:
+            numpy.ndarray: Flat uint8 table of 2**24 entries
+        """
+        if cls._lut is None:
+            with cls._lut_lock:
+                if cls._lut is None:
+                    codes = np.arange(1 << 24, dtype=np.uint32)
+                    colors = np.empty((1 << 24, 3), dtype=np.uint8)
+                    colors[:, 0] = codes & 0xFF
+                    colors[:, 1] = (codes >> 8) & 0xFF
+                    colors[:, 2] = codes >> 16
+
+                    ycrcb = cv2.cvtColor(colors.reshape(4096, 4096, 3), cv2.COLOR_RGB2YCrCb)
+                    cls._lut = cv2.inRange(ycrcb, cls.YCRCB_LOWER, cls.YCRCB_UPPER).reshape(-1)
+                    logger.info("Skin lookup table built (16 MB)")
+
+        return cls._lut
+
+    @classmethod
+    def preload(cls):
+        """Build the lookup table ahead of time (e.g. before forking workers)"""
+        cls.lookup_table()
+
+    @classmethod
+    def lookup(cls, rgb_image):
+        """
+        Threshold an RGB image with a single table lookup
+
+        Args:
+            rgb_image: Image in RGB format (uint8)
+
+        Returns:
+            numpy.ndarray: Skin mask (0/255) before morphology
+        """
+        # Pack each pixel into one uint32 (alpha masked off) and index the table
+        packed = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2RGBA).view(np.uint32)
+        packed = packed.reshape(rgb_image.shape[:2])
+        np.bitwise_and(packed, 0xFFFFFF, out=packed)
+        return np.take(cls.lookup_table(), packed)
+
+    def downscale(self, rgb_image):
+        """
+        Shrink an image by the engine's scale factor
+
+        Args:
+            rgb_image: Image in RGB format
+
+        Returns:
+            numpy.ndarray: Downscaled image (the input itself if scale is 1)
+        """
+        if self.scale == 1:
+            return rgb_image
+
+        height, width = rgb_image.shape[:2]
+        size = (max(1, width // self.scale), max(1, height // self.scale))
+        return cv2.resize(rgb_image, size, interpolation=cv2.INTER_AREA)
+
+    def clean(self, mask, level=None):
+        """
+        Close then open a mask to remove speckles and fill small holes
+
+        Args:
+            mask: Raw skin mask
+            level: Pyramid level the mask was computed at
+
+        Returns:
+            numpy.ndarray: Cleaned mask
+        """
+        kernel = self.kernel(level)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+    def segment(self, image, level=None):
+        """
+        Compute the cleaned skin mask at reduced resolution
+
+        For a Frame, the downscaled image comes from its pyramid and the mask
+        is cached on the frame.
+
+        Args:
+            image: Frame or image in RGB format
+            level: Pyramid level override for frames (defaults to the engine's)
+
+        Returns:
+            tuple: (downscaled RGB image, skin mask of the same size)
+        """
+        if isinstance(image, Frame):
+            if level is None:
+                level = self.level
+            small = image.level(level)
+            mask = image.memo(('skin_mask', level), lambda: self.clean(self.lookup(small), level))
+            return small, mask
+
+        small = self.downscale(image)
+        return small, self.clean(self.lookup(small))
+
+    @staticmethod
+    def restrict(mask, regions):
+        """
+        Keep only the parts of a mask inside the given regions
+
+        Args:
+            mask: Skin mask
+            regions: List of (x0, y0, x1, y1) boxes normalized to [0, 1]
+
+        Returns:
+            numpy.ndarray: Restricted mask
+        """
+        height, width = mask.shape[:2]
+        region_mask = np.zeros_like(mask)
+        for x0, y0, x1, y1 in regions:
+            region_mask[
+                max(0, int(y0 * height)):min(height, int(np.ceil(y1 * height))),
+                max(0, int(x0 * width)):min(width, int(np.ceil(x1 * width)))
+            ] = 255
+        return cv2.bitwise_and(mask, region_mask)
+
+    @staticmethod
+    def upsample(mask, image_shape):
+        """
+        Scale a reduced-resolution mask back to the full frame
+
+        Args:
+            mask: Skin mask from segment()
+            image_shape: Shape of the full-resolution image
+
+        Returns:
+            numpy.ndarray: Mask at full resolution
+        """
+        height, width = image_shape[:2]
+        if mask.shape[:2] == (height, width):
+            return mask
+        return cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    def extract(self, image, full_resolution=True):
+        """
+        Compute the skin mask for an image
+
+        Args:
+            image: Frame or image in RGB format
+            full_resolution: Upsample the mask to the input size
+
+        Returns:
+            numpy.ndarray: Skin mask (0/255)
+        """
+        if isinstance(image, Frame):
+            if not full_resolution:
+                return self.segment(image)[1]
+            return self.mask_for_level(image, 0)
+
+        _, mask = self.segment(image)
+        if not full_resolution:
+            return mask
+        return self.upsample(mask, image.shape)
+
+    def mask_for_level(self, frame, target_level, level=None):
+        """
+        Skin mask of a frame resized to another pyramid level
+
+        Args:
+            frame: Frame to segment
+            target_level: Pyramid level the mask should match
+            level: Level the mask is computed at (defaults to the engine's)
+
+        Returns:
+            numpy.ndarray: Skin mask the size of frame.level(target_level)
+        """
+        if level is None:
+            level = self.level
+
+        _, mask = self.segment(frame, level)
+        target_shape = frame.level(target_level).shape
+        return frame.memo(('skin_mask', level, target_level), lambda: self.upsample(mask, target_shape))
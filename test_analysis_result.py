@@ -0,0 +1,56 @@
+"""
+Binary codec checks for cached analyses
+
+Run with pytest:
+    python -m pytest -q test_analysis_result.py
+"""
+import pytest
+
+from services.analysis_result import AnalysisResult
+
+
+ANALYSIS = {
+    'body_shape': 'hourglass',
+    'face_shape': 'heart',
+    'skin_tone': 'tan',
+    'undertone': 'cool',
+    'dominant_colors': ['#1a2b3c', '#ffffff', '#000000']
+}
+
+
+def test_round_trip():
+    data = AnalysisResult.encode(ANALYSIS)
+    assert AnalysisResult.decode(data) == ANALYSIS
+    assert AnalysisResult.from_bytes(data) == AnalysisResult.from_dict(ANALYSIS)
+
+
+def test_missing_labels_round_trip_as_unknown():
+    decoded = AnalysisResult.decode(AnalysisResult.encode({'dominant_colors': []}))
+    assert decoded == {
+        'body_shape': 'unknown',
+        'face_shape': 'unknown',
+        'skin_tone': 'unknown',
+        'undertone': 'unknown',
+        'dominant_colors': []
+    }
+
+
+def test_byte_size():
+    # 5 header bytes plus 3 per color
+    assert len(AnalysisResult.encode(ANALYSIS)) == 14
+    assert len(AnalysisResult.encode(dict(ANALYSIS, dominant_colors=[]))) == 5
+
+
+def test_unknown_label_is_rejected():
+    with pytest.raises(ValueError):
+        AnalysisResult.encode(dict(ANALYSIS, body_shape='pear'))
+    with pytest.raises(ValueError):
+        AnalysisResult.encode(dict(ANALYSIS, dominant_colors=['red']))
+
+
+def test_corrupt_record_is_rejected():
+    data = AnalysisResult.encode(ANALYSIS)
+    with pytest.raises(ValueError):
+        AnalysisResult.decode(data[:-1])
+    with pytest.raises(ValueError):
+        AnalysisResult.decode(bytes([200]) + data[1:])
@@ -0,0 +1,96 @@
+"""
+Catalog color index checks: grid search agrees with a brute-force scan
+
+Run with pytest:
+    python -m pytest -q test_catalog_index.py
+"""
+import numpy as np
+import pytest
+
+from services.catalog_index import CatalogColorIndex
+from utils.color_space import ciede2000, hex_to_lab
+
+
+def random_catalog(count=400, seed=0):
+    rng = np.random.default_rng(seed)
+    products = []
+    for index in range(count):
+        colors = ['#{:06x}'.format(int(value)) for value in rng.integers(0, 1 << 24, rng.integers(1, 4))]
+        products.append({
+            'sku': f'SKU{index}',
+            'colors': colors,
+            'category': ('dress', 'top', 'skirt')[index % 3],
+            'price': float(10 + index % 90)
+        })
+    return products
+
+
+@pytest.fixture(scope='module')
+def catalog(tmp_path_factory):
+    products = random_catalog()
+    path = str(tmp_path_factory.mktemp('catalog') / 'index')
+    assert CatalogColorIndex.build(products + [{'sku': 'EMPTY', 'colors': []}], path, cell_size=6) == len(products)
+    return products, CatalogColorIndex(path)
+
+
+def brute_force(products, hex_color, max_distance):
+    """Skus with a color within max_distance (Lab): nearest first in Lab, and by CIEDE2000"""
+    query = hex_to_lab([hex_color])[0]
+    lab_distance, delta_e = {}, {}
+    for product in products:
+        lab = hex_to_lab(product['colors'])
+        distance = np.linalg.norm(lab - query, axis=1)
+        within = distance <= max_distance
+        if within.any():
+            lab_distance[product['sku']] = distance.min()
+            delta_e[product['sku']] = float(ciede2000(lab[within], query).min())
+    return sorted(lab_distance, key=lab_distance.get), sorted(delta_e, key=delta_e.get)
+
+
+def test_exact_color_is_found_first(catalog):
+    products, index = catalog
+    for product in products[:20]:
+        matches = index.nearest(product['colors'][0], k=3)
+        assert matches[0]['delta_e'] == 0.0
+        assert matches[0]['color'] == product['colors'][0]
+
+
+def test_nearest_agrees_with_brute_force(catalog):
+    products, index = catalog
+    rng = np.random.default_rng(1)
+    for value in rng.integers(0, 1 << 24, 20):
+        query = '#{:06x}'.format(int(value))
+        matches = index.nearest(query, k=5, max_distance=40)
+        by_lab, by_delta_e = brute_force(products, query, 40)
+        skus = [match['sku'] for match in matches]
+        # Lab-nearest candidates reranked by CIEDE2000: the best match is the global best
+        assert len(skus) == min(5, len(by_lab)) == len(set(skus))
+        assert skus[:1] == by_delta_e[:1]
+        assert [match['delta_e'] for match in matches] == sorted(match['delta_e'] for match in matches)
+
+
+def test_filters(catalog):
+    _, index = catalog
+    matches = index.nearest('#804020', k=10, category='dress', min_price=20, max_price=60, max_distance=60)
+    assert matches
+    for match in matches:
+        assert match['category'] == 'dress'
+        assert 20 <= match['price'] <= 60
+    assert index.nearest('#804020', category='shoes') == []
+
+
+def test_search_returns_every_query_color(catalog):
+    _, index = catalog
+    results = index.search(['#ff0000', '#00ff00'], k=2)
+    assert set(results) == {'#ff0000', '#00ff00'}
+    assert all(len(matches) <= 2 for matches in results.values())
+
+
+def test_rebuild_replaces_the_index(tmp_path):
+    path = str(tmp_path / 'index')
+    CatalogColorIndex.build([{'sku': 'A', 'colors': ['#ff0000']}], path)
+    CatalogColorIndex.build([{'sku': 'B', 'colors': ['#ff0000']}], path)
+    assert [match['sku'] for match in CatalogColorIndex(path).nearest('#ff0000')] == ['B']
+
+    with pytest.raises(ValueError):
+        CatalogColorIndex.build([{'sku': 'C', 'colors': []}], path)
@@ -0,0 +1,81 @@
+"""
+Near-duplicate index checks: lookalike photos must not share an analysis
+
+Run with pytest:
+    python -m pytest -q test_duplicate_index.py
+"""
+import cv2
+import numpy as np
+
+from services.duplicate_index import NearDuplicateIndex
+from utils.perceptual_hash import color_thumbnail, dhash, hamming
+
+
+def create_studio_image(garment, width=600, height=900, seed=0):
+    """Synthetic studio photo: plain backdrop, one person, a garment of the given RGB color"""
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[..., 0] = (200 - 40 * y / height).astype(np.uint8)
+    image[..., 1] = (200 - 40 * y / height).astype(np.uint8)
+    image[..., 2] = (210 - 30 * y / height).astype(np.uint8)
+
+    cv2.ellipse(image, (width // 2, height // 7), (60, 80), 0, 0, 360, (224, 172, 140), -1)
+    cv2.rectangle(image, (width // 2 - 120, height // 4), (width // 2 + 120, height * 3 // 4), garment, -1)
+    cv2.rectangle(image, (width // 2 - 170, height // 4), (width // 2 - 130, height // 2), (224, 172, 140), -1)
+    cv2.rectangle(image, (width // 2 + 130, height // 4), (width // 2 + 170, height // 2), (224, 172, 140), -1)
+
+    noise = np.random.default_rng(seed).integers(-4, 5, image.shape)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def reencode(rgb_image, quality=70):
+    """The same photo after a lossy JPEG round trip and a resize"""
+    ok, data = cv2.imencode('.jpg', cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    image = cv2.cvtColor(cv2.imdecode(data, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+    height, width = image.shape[:2]
+    return cv2.resize(image, (width * 2 // 3, height * 2 // 3), interpolation=cv2.INTER_AREA)
+
+
+def signature(rgb_image):
+    """Hash, thumbnail and size, as the pipeline computes them from a small pyramid level"""
+    height, width = rgb_image.shape[:2]
+    small = cv2.resize(rgb_image, (64, max(1, height * 64 // width)), interpolation=cv2.INTER_AREA)
+    return dhash(small), color_thumbnail(small), (height, width)
+
+
+def create_index():
+    return NearDuplicateIndex(max_entries=100, radius=6, path='', max_color_diff=6, max_aspect_diff=0.02)
+
+
+def test_lookalike_is_rejected():
+    # Red and green garments of equal luminance: the grayscale hashes agree
+    first = create_studio_image((200, 60, 60), seed=0)
+    second = create_studio_image((60, 113, 60), seed=1)
+    first_hash, first_thumbnail, first_size = signature(first)
+    second_hash, second_thumbnail, second_size = signature(second)
+    assert hamming(first_hash, second_hash) <= 6
+
+    index = create_index()
+    index.add(first_hash, first_thumbnail, first_size, {'body_shape': 'rectangle'})
+    assert index.lookup(second_hash, second_thumbnail, second_size) is None
+
+
+def test_reencoded_copy_is_reused():
+    image = create_studio_image((200, 60, 60))
+    image_hash, thumbnail, size = signature(image)
+    copy_hash, copy_thumbnail, copy_size = signature(reencode(image))
+
+    index = create_index()
+    index.add(image_hash, thumbnail, size, {'body_shape': 'rectangle'})
+    match = index.lookup(copy_hash, copy_thumbnail, copy_size)
+    assert match is not None and match['body_shape'] == 'rectangle'
+
+
+def test_other_aspect_ratio_is_rejected():
+    image = create_studio_image((200, 60, 60))
+    image_hash, thumbnail, size = signature(image)
+
+    index = create_index()
+    index.add(image_hash, thumbnail, size, {'body_shape': 'rectangle'})
+    assert index.lookup(image_hash, thumbnail, (size[0], size[1] * 5 // 4)) is None
@@ -0,0 +1,65 @@
+"""
+Header probe checks: size, channels and orientation without decoding pixels
+
+Run with pytest:
+    python -m pytest -q test_image_probe.py
+"""
+import io
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.image_probe import ImageProbeError, oriented_size, probe_file, probe_image
+
+
+def encode(extension, width=64, height=48, channels=3):
+    image = np.full((height, width, channels), 128, dtype=np.uint8)
+    ok, data = cv2.imencode(extension, image)
+    assert ok
+    return data.tobytes()
+
+
+def exif_segment(orientation):
+    """APP1 segment holding a little-endian TIFF header with one orientation tag"""
+    tiff = b'II*\x00' + struct.pack('<I', 8) + struct.pack('<H', 1)
+    tiff += struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0) + struct.pack('<I', 0)
+    payload = b'Exif\x00\x00' + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def test_jpeg_and_png_headers(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(encode('.jpg'))
+    assert probe_file(str(path)) == ('jpeg', 64, 48, 3, 1)
+
+    path = tmp_path / 'photo.png'
+    path.write_bytes(encode('.png', channels=4))
+    assert probe_file(str(path)) == ('png', 64, 48, 4, 1)
+
+
+def test_exif_orientation_swaps_displayed_size():
+    data = encode('.jpg')
+    data = data[:2] + exif_segment(6) + data[2:]
+    header = probe_image(io.BytesIO(data))
+    assert header.orientation == 6
+    assert oriented_size(header) == (48, 64)
+
+
+def test_stream_position_is_restored():
+    stream = io.BytesIO(encode('.jpg'))
+    probe_image(stream)
+    assert stream.tell() == 0
+
+
+@pytest.mark.parametrize('data', [
+    b'GIF89a' + b'\x00' * 32,
+    # A segment claiming more bytes than the file holds
+    b'\xff\xd8\xff\xe0' + struct.pack('>H', 4000) + b'\x00' * 16,
+    # Cut off before the frame header
+    encode('.jpg')[:20]
+])
+def test_unreadable_header_is_rejected(data):
+    with pytest.raises(ImageProbeError):
+        probe_image(io.BytesIO(data))
@@ -0,0 +1,63 @@
+"""
+Memory budget checks: reservations queue in order and time out instead of overcommitting
+
+Run with pytest:
+    python -m pytest -q test_memory_budget.py
+"""
+import threading
+import time
+
+import pytest
+
+from services.memory_budget import MemoryBudget, MemoryBudgetError
+
+MB = 1024 * 1024
+
+
+def test_reservation_is_released():
+    budget = MemoryBudget(budget_bytes=10 * MB, timeout=1)
+    with budget.reserve(4 * MB) as reservation:
+        assert budget.reserved_bytes == 4 * MB
+        assert reservation.solo
+    assert budget.reserved_bytes == 0
+
+
+def test_oversized_request_is_clamped():
+    budget = MemoryBudget(budget_bytes=10 * MB, timeout=1)
+    with budget.reserve(50 * MB) as reservation:
+        assert reservation.nbytes == 10 * MB
+
+
+def test_full_budget_times_out():
+    budget = MemoryBudget(budget_bytes=10 * MB, timeout=1)
+    with budget.reserve(8 * MB):
+        with pytest.raises(MemoryBudgetError):
+            with budget.reserve(4 * MB, timeout=0.05):
+                pass
+        # Fits beside the first reservation
+        with budget.reserve(2 * MB) as reservation:
+            assert not reservation.solo
+    assert budget.reserved_bytes == 0
+
+
+def test_waiters_are_served_in_arrival_order():
+    budget = MemoryBudget(budget_bytes=10 * MB, timeout=5)
+    order = []
+
+    def waiter(name, nbytes):
+        with budget.reserve(nbytes):
+            order.append(name)
+
+    with budget.reserve(10 * MB):
+        large = threading.Thread(target=waiter, args=('large', 9 * MB))
+        large.start()
+        time.sleep(0.05)
+        # Would fit once 1MB frees up, but must not jump ahead of the large request
+        small = threading.Thread(target=waiter, args=('small', 1 * MB))
+        small.start()
+        time.sleep(0.05)
+        assert order == []
+
+    large.join()
+    small.join()
+    assert order == ['large', 'small']
@@ -0,0 +1,54 @@
+"""
+Palette engine checks: seasonal candidates, distinct picks and worn-color handling
+
+Run with pytest:
+    python -m pytest -q test_palette_engine.py
+"""
+import numpy as np
+
+from services.palette_engine import SEASON_PALETTES, PaletteEngine
+from utils.color_space import hex_to_lab
+
+
+def palette_hexes(*seasons):
+    return {hex_color.lower() for season in seasons for _, hex_color in SEASON_PALETTES[season]}
+
+
+def test_colors_come_from_the_matching_seasons():
+    engine = PaletteEngine(size=6)
+    warm_deep = engine.recommend({'skin_tone': 'tan', 'undertone': 'warm', 'dominant_colors': []})
+    cool_light = engine.recommend({'skin_tone': 'light', 'undertone': 'cool', 'dominant_colors': []})
+
+    assert len(warm_deep) == 6 and len(cool_light) == 6
+    assert {color['hex'] for color in warm_deep} <= palette_hexes('autumn')
+    assert {color['hex'] for color in cool_light} <= palette_hexes('summer')
+
+
+def test_unknown_labels_fall_back_to_all_seasons():
+    colors = PaletteEngine(size=4).recommend({})
+    assert len(colors) == 4
+    assert {color['hex'] for color in colors} <= palette_hexes('spring', 'summer', 'autumn', 'winter')
+
+
+def test_picked_colors_are_visibly_different():
+    engine = PaletteEngine(size=6)
+    colors = engine.recommend({'skin_tone': 'medium', 'undertone': 'neutral', 'dominant_colors': ['#336699']})
+    lab = hex_to_lab([color['hex'] for color in colors])
+    distance = np.linalg.norm(lab[:, None, :] - lab[None, :, :], axis=2)
+    assert distance[np.triu_indices(len(colors), 1)].min() >= engine.MIN_DELTA_E
+
+
+def test_worn_color_is_not_recommended_again():
+    engine = PaletteEngine(size=3)
+    analysis = {'skin_tone': 'tan', 'undertone': 'warm', 'dominant_colors': []}
+    best = engine.recommend(analysis)[0]['hex']
+
+    worn = engine.recommend(dict(analysis, dominant_colors=[best]))
+    assert best not in {color['hex'] for color in worn}
+
+
+def test_recommendation_is_deterministic():
+    engine = PaletteEngine()
+    analysis = {'skin_tone': 'dark', 'undertone': 'cool', 'dominant_colors': ['#202020', '#c0c0c0']}
+    assert engine.recommend(analysis) == engine.recommend(analysis)
+    assert engine.recommend(analysis, size=2) == engine.recommend(analysis)[:2]
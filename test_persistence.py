@@ -0,0 +1,128 @@
+"""
+Write-behind persistence checks: batching, overflow handling and spill replay
+
+Run with pytest:
+    python -m pytest -q test_persistence.py
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from services.persistence import AnalysisPersistence, SQLiteBackend, build_record
+
+# Pid no live process has (above the Linux pid_max limit)
+DEAD_PID = 4194305
+
+
+class MemoryBackend:
+    """Backend keeping written records in a list; can be held or made to fail once"""
+
+    def __init__(self, fail_on_call=None):
+        self.records = []
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+        self.release = threading.Event()
+        self.release.set()
+
+    def write_batch(self, records):
+        self.calls += 1
+        self.release.wait()
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("backend unavailable")
+        self.records.extend(records)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(AnalysisPersistence, 'RETRY_BACKOFF', 0.05)
+    monkeypatch.setattr(AnalysisPersistence, 'MAX_RETRY_BACKOFF', 0.05)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def record(index):
+    return build_record('/analyze', {'index': index})
+
+
+def test_records_reach_sqlite_in_batches(tmp_path):
+    path = str(tmp_path / 'history.db')
+    persistence = AnalysisPersistence(
+        SQLiteBackend(path), max_queue=100, batch_size=8, flush_interval=0.05, overflow='drop'
+    )
+    for index in range(30):
+        assert persistence.submit(record(index))
+    persistence.close()
+
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT analysis FROM analyses").fetchall()
+    assert sorted(json.loads(row[0])['index'] for row in rows) == list(range(30))
+
+
+def test_overflow_is_spilled_by_the_flusher(tmp_path, fast_retry):
+    spill_path = str(tmp_path / 'spill')
+    backend = MemoryBackend()
+    backend.release.clear()
+    persistence = AnalysisPersistence(
+        backend, max_queue=4, batch_size=2, flush_interval=0.05, overflow='spill', spill_path=spill_path
+    )
+    # The flusher holds its first record in the stuck write; 4 queue, 4 overflow, the rest drop
+    assert persistence.submit(record(0))
+    assert wait_for(lambda: backend.calls == 1)
+    results = [persistence.submit(record(index)) for index in range(1, 20)]
+    assert results[:4] == [True] * 4 and not any(results[4:])
+    # Nothing was written to disk on the submitting thread
+    assert os.listdir(tmp_path) == []
+
+    backend.release.set()
+    assert wait_for(lambda: len(backend.records) == 9)
+    persistence.close()
+    assert sorted(r['analysis']['index'] for r in backend.records) == list(range(9))
+    assert os.listdir(tmp_path) == []
+
+
+def test_dead_workers_spill_file_is_replayed(tmp_path, fast_retry):
+    spill_path = str(tmp_path / 'spill')
+    with open(f"{spill_path}.{DEAD_PID}", 'w') as f:
+        for index in range(25):
+            f.write(json.dumps(record(index)) + "\n")
+        # Torn write from a crash
+        f.write('{"id": "to')
+
+    # One failed batch mid-replay: the unread rest moves to this worker's file
+    backend = MemoryBackend(fail_on_call=3)
+    persistence = AnalysisPersistence(
+        backend, max_queue=10, batch_size=4, flush_interval=0.05, overflow='spill', spill_path=spill_path
+    )
+    assert wait_for(lambda: len(backend.records) == 25)
+    persistence.close()
+
+    assert sorted(r['analysis']['index'] for r in backend.records) == list(range(25))
+    assert os.listdir(tmp_path) == []
+
+
+def test_live_workers_spill_file_is_left_alone(tmp_path):
+    spill_path = str(tmp_path / 'spill')
+    other = f"{spill_path}.{os.getppid()}"
+    with open(other, 'w') as f:
+        f.write(json.dumps(record(0)) + "\n")
+
+    backend = MemoryBackend()
+    persistence = AnalysisPersistence(
+        backend, max_queue=10, batch_size=4, flush_interval=0.05, overflow='spill', spill_path=spill_path
+    )
+    time.sleep(0.3)
+    persistence.close()
+    assert backend.records == []
+    assert os.path.exists(other)
@@ -0,0 +1,81 @@
+"""
+Response schema checks: repairs of limits the model missed, rejection of the rest
+
+Run with pytest:
+    python -m pytest -q test_schema.py
+"""
+import pytest
+
+from utils.schema import SchemaError, compile_schema, response_schema
+
+
+PALETTE_SCHEMA = {
+    'type': 'object',
+    'required': ['name', 'colors'],
+    'properties': {
+        'name': {'type': 'string', 'max_length': 10},
+        'season': {'type': 'string', 'enum': ['spring', 'summer', 'autumn', 'winter']},
+        'colors': {
+            'type': 'array',
+            'min_items': 2,
+            'max_items': 3,
+            'items': {'type': 'string', 'pattern': r'^#[0-9a-fA-F]{6}$'}
+        },
+        'score': {'type': 'integer'}
+    }
+}
+
+validate = compile_schema(PALETTE_SCHEMA)
+
+
+def test_valid_value_passes_unchanged():
+    value = {'name': 'Warm', 'season': 'autumn', 'colors': ['#aa5500', '#ffcc99'], 'score': 3}
+    repaired, repairs = validate(value)
+    assert repaired == value
+    assert repairs == []
+
+
+def test_long_string_is_truncated():
+    repaired, repairs = validate({'name': 'Terracotta and sand', 'colors': ['#aa5500', '#ffcc99']})
+    assert repaired['name'] == 'Terracotta'
+    assert len(repairs) == 1
+
+
+def test_long_list_is_trimmed():
+    colors = ['#aa5500', '#ffcc99', '#112233', '#445566']
+    repaired, repairs = validate({'name': 'Warm', 'colors': colors})
+    assert repaired['colors'] == colors[:3]
+    assert len(repairs) == 1
+
+
+def test_bad_items_are_dropped():
+    repaired, repairs = validate({'name': 'Warm', 'colors': ['#aa5500', 'orange', '#ffcc99']})
+    assert repaired['colors'] == ['#aa5500', '#ffcc99']
+    assert len(repairs) == 1
+
+
+def test_short_list_is_kept_with_a_note():
+    repaired, repairs = validate({'name': 'Warm', 'colors': ['#aa5500']})
+    assert repaired['colors'] == ['#aa5500']
+    assert len(repairs) == 1
+
+
+@pytest.mark.parametrize('value', [
+    {'colors': ['#aa5500', '#ffcc99']},                                   # missing required
+    {'name': 'Warm', 'colors': '#aa5500'},                                # wrong type
+    {'name': 'Warm', 'colors': ['orange', 'teal']},                       # no usable items
+    {'name': 'Warm', 'colors': ['#aa5500', '#ffcc99'], 'season': 'monsoon'},  # outside enum
+    {'name': 'Warm', 'colors': ['#aa5500', '#ffcc99'], 'score': True},    # bool is not an integer
+    ['Warm']
+])
+def test_mismatch_is_rejected(value):
+    with pytest.raises(SchemaError):
+        validate(value)
+
+
+def test_response_schema_drops_local_keywords():
+    schema = response_schema(PALETTE_SCHEMA)
+    assert 'max_length' not in schema['properties']['name']
+    assert 'pattern' not in schema['properties']['colors']['items']
+    assert schema['properties']['colors']['max_items'] == 3
+    assert 'max_length' in PALETTE_SCHEMA['properties']['name']
@@ -0,0 +1,112 @@
+"""
+Pixel-agreement checks and benchmark for the lookup-table skin mask
+
+Run with pytest for the agreement checks, or directly for a benchmark:
+    python test_skin_mask.py [/path/to/image.jpg]
+"""
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from services.color_analysis import ColorAnalyzer
+from services.skin_mask import SkinMaskEngine
+
+
+def create_test_image(width=800, height=1200):
+    """Synthetic portrait-like image: background gradient, skin blobs, clothing"""
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[..., 0] = (60 + 80 * x / width).astype(np.uint8)
+    image[..., 1] = (90 + 60 * y / height).astype(np.uint8)
+    image[..., 2] = 150
+
+    # Face, arms and a garment
+    cv2.ellipse(image, (width // 2, height // 8), (70, 95), 0, 0, 360, (224, 172, 140), -1)
+    cv2.rectangle(image, (width // 2 - 140, height // 4), (width // 2 + 140, height // 2 + 150), (40, 60, 150), -1)
+    cv2.rectangle(image, (width // 2 - 200, height // 4), (width // 2 - 150, height // 2), (198, 134, 110), -1)
+    cv2.rectangle(image, (width // 2 + 150, height // 4), (width // 2 + 200, height // 2), (141, 85, 60), -1)
+
+    # Sensor noise
+    noise = np.random.default_rng(0).integers(-6, 7, image.shape)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def reference_threshold(rgb_image):
+    """Full-resolution YCrCb thresholds without morphology"""
+    ycrcb = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2YCrCb)
+    return cv2.inRange(ycrcb, SkinMaskEngine.YCRCB_LOWER, SkinMaskEngine.YCRCB_UPPER)
+
+
+def test_lookup_matches_ycrcb_thresholds():
+    """The table lookup must reproduce cvtColor + inRange bit for bit"""
+    rng = np.random.default_rng(42)
+    random_image = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    for image in (random_image, create_test_image()):
+        assert np.array_equal(SkinMaskEngine.lookup(image), reference_threshold(image))
+
+
+def test_reduced_resolution_agreement():
+    """Downscaled mask + morphology should agree with the full-resolution pipeline"""
+    image = create_test_image()
+    reference = ColorAnalyzer.extract_skin_region_ycrcb(image)
+
+    for scale in (1, 2, 4):
+        mask = SkinMaskEngine(scale).extract(image)
+        assert mask.shape == reference.shape
+        agreement = np.mean(mask == reference)
+        assert agreement >= 0.98, f"scale {scale}: {agreement:.4f}"
+
+
+def test_restrict_to_regions():
+    """Restricting keeps skin pixels only inside the given boxes"""
+    image = create_test_image()
+    _, mask = SkinMaskEngine(2).segment(image)
+    restricted = SkinMaskEngine.restrict(mask, [(0.0, 0.0, 1.0, 0.25)])
+
+    height = mask.shape[0]
+    assert cv2.countNonZero(restricted[int(0.25 * height) + 1:]) == 0
+    assert cv2.countNonZero(restricted) > 0
+
+
+def benchmark(rgb_image, runs=50):
+    """Compare the reference pipeline with the lookup-table engine"""
+    def timed(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        return (time.perf_counter() - start) / runs * 1000
+
+    start = time.perf_counter()
+    SkinMaskEngine.preload()
+    print(f"Lookup table build: {(time.perf_counter() - start) * 1000:.1f} ms (once per process)")
+    print(f"Image: {rgb_image.shape[1]}x{rgb_image.shape[0]}, {runs} runs\n")
+
+    reference = ColorAnalyzer.extract_skin_region_ycrcb(rgb_image)
+    print(f"{'method':<34}{'ms':>8}{'agreement':>12}")
+    print(f"{'YCrCb + morphology (reference)':<34}{timed(lambda: ColorAnalyzer.extract_skin_region_ycrcb(rgb_image)):>8.2f}{1.0:>12.4f}")
+    print(f"{'YCrCb threshold only':<34}{timed(lambda: reference_threshold(rgb_image)):>8.2f}{'':>12}")
+    print(f"{'lookup threshold only':<34}{timed(lambda: SkinMaskEngine.lookup(rgb_image)):>8.2f}{'':>12}")
+
+    for scale in (1, 2, 4):
+        engine = SkinMaskEngine(scale)
+        agreement = np.mean(engine.extract(rgb_image) == reference)
+        print(f"{f'lookup engine, scale {scale} (low-res)':<34}{timed(lambda: engine.segment(rgb_image)):>8.2f}{'':>12}")
+        print(f"{f'lookup engine, scale {scale} (full-res)':<34}{timed(lambda: engine.extract(rgb_image)):>8.2f}{agreement:>12.4f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        bgr = cv2.imread(sys.argv[1])
+        if bgr is None:
+            print(f"✗ Could not read image: {sys.argv[1]}")
+            sys.exit(1)
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    else:
+        print("No image provided - using a synthetic 800x1200 test image")
+        rgb = create_test_image()
+
+    benchmark(rgb)
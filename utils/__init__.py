@@ -1,4 +1,18 @@
 from .logger import setup_logger
-from .validators import allowed_file, validate_file_size, sanitize_filename
+from .validators import (
+    allowed_file, validate_file_size, validate_image_header, parse_lookbook_variants, parse_catalog_query,
+    sanitize_filename
+)
+from .image_probe import ImageHeader, ImageProbeError, probe_image, probe_file, oriented_size
+from .perceptual_hash import dhash, hamming, color_thumbnail, thumbnail_distance
+from .color_space import hex_to_lab, ciede2000
+from .schema import SchemaError, compile_schema, response_schema
+from .metrics import metrics, Metrics
+from .workers import WorkerStats, plan_workers, process_rss_bytes
 
-__all__ = ['setup_logger', 'allowed_file', 'validate_file_size', 'sanitize_filename']
+__all__ = ['setup_logger', 'allowed_file', 'validate_file_size', 'validate_image_header',
+           'parse_lookbook_variants', 'parse_catalog_query', 'sanitize_filename', 'ImageHeader', 'ImageProbeError', 'probe_image',
+           'probe_file', 'oriented_size', 'dhash', 'hamming', 'color_thumbnail',
+           'thumbnail_distance', 'hex_to_lab', 'ciede2000', 'SchemaError',
+           'compile_schema', 'response_schema', 'metrics', 'Metrics',
+           'WorkerStats', 'plan_workers', 'process_rss_bytes']
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+
+
+def hex_to_lab(hex_colors):
+    """
+    CIELAB of hex color strings
+
+    Uses OpenCV's float conversion, so L is in 0..100 and a/b are roughly
+    -128..127, the same space as the analyzers' colors.
+
+    Args:
+        hex_colors: Sequence of '#rrggbb' strings
+
+    Returns:
+        numpy.ndarray: (n, 3) float32 array of L, a, b
+    """
+    rgb = np.array(
+        [[int(color[i:i + 2], 16) for i in (1, 3, 5)] for color in hex_colors], dtype=np.float32
+    ) / 255.0
+    return cv2.cvtColor(rgb.reshape(-1, 1, 3), cv2.COLOR_RGB2Lab).reshape(-1, 3)
+
+
+def ciede2000(lab1, lab2):
+    """
+    CIEDE2000 color difference, vectorized
+
+    Args:
+        lab1: (..., 3) Lab array
+        lab2: (..., 3) Lab array broadcastable against lab1
+
+    Returns:
+        numpy.ndarray: Delta E 2000 per pair
+    """
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    # Chroma-dependent stretch of the a axis
+    c_mean7 = ((np.hypot(a1, b1) + np.hypot(a2, b2)) / 2.0) ** 7
+    g = 0.5 * (1.0 - np.sqrt(c_mean7 / (c_mean7 + 25.0 ** 7)))
+    a1p, a2p = (1.0 + g) * a1, (1.0 + g) * a2
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360.0
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360.0
+    chromatic = (c1p * c2p) != 0
+
+    # Differences in lightness, chroma and hue
+    delta_l = L2 - L1
+    delta_c = c2p - c1p
+    delta_h = h2p - h1p
+    delta_h = np.where(delta_h > 180.0, delta_h - 360.0, np.where(delta_h < -180.0, delta_h + 360.0, delta_h))
+    delta_h = np.where(chromatic, delta_h, 0.0)
+    delta_big_h = 2.0 * np.sqrt(c1p * c2p) * np.sin(np.radians(delta_h / 2.0))
+
+    # Means, with the hue mean taken the short way around the circle
+    l_mean = (L1 + L2) / 2.0
+    c_mean = (c1p + c2p) / 2.0
+    h_sum = h1p + h2p
+    h_mean = np.where(
+        ~chromatic, h_sum,
+        np.where(np.abs(h1p - h2p) <= 180.0, h_sum / 2.0,
+                 np.where(h_sum < 360.0, (h_sum + 360.0) / 2.0, (h_sum - 360.0) / 2.0))
+    )
+
+    t = (1.0 - 0.17 * np.cos(np.radians(h_mean - 30.0)) + 0.24 * np.cos(np.radians(2.0 * h_mean))
+         + 0.32 * np.cos(np.radians(3.0 * h_mean + 6.0)) - 0.20 * np.cos(np.radians(4.0 * h_mean - 63.0)))
+    rotation = 30.0 * np.exp(-((h_mean - 275.0) / 25.0) ** 2)
+    c_mean7 = c_mean ** 7
+    r_c = 2.0 * np.sqrt(c_mean7 / (c_mean7 + 25.0 ** 7))
+    s_l = 1.0 + 0.015 * (l_mean - 50.0) ** 2 / np.sqrt(20.0 + (l_mean - 50.0) ** 2)
+    s_c = 1.0 + 0.045 * c_mean
+    s_h = 1.0 + 0.015 * c_mean * t
+    r_t = -np.sin(np.radians(2.0 * rotation)) * r_c
+
+    return np.sqrt(
+        (delta_l / s_l) ** 2 + (delta_c / s_c) ** 2 + (delta_big_h / s_h) ** 2
+        + r_t * (delta_c / s_c) * (delta_big_h / s_h)
+    )
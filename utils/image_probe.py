@@ -0,0 +1,187 @@
+import struct
+from collections import namedtuple
+
+# Image properties read from the header, without decoding any pixels
+ImageHeader = namedtuple('ImageHeader', ['format', 'width', 'height', 'channels', 'orientation'])
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Channels per PNG color type (grayscale, RGB, palette, gray+alpha, RGBA)
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+# JPEG start-of-frame markers (C4 = DHT, C8 = JPG extension, CC = DAC are not frames)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# JPEG markers without a length field
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xDA)) | {0x01}
+
+# Stop scanning a JPEG after this many bytes without finding a frame header
+MAX_JPEG_HEADER_BYTES = 1024 * 1024
+
+
+class ImageProbeError(ValueError):
+    """Raised when an upload is not a readable JPEG/PNG header"""
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ImageProbeError("Truncated image header")
+    return data
+
+
+def _exif_orientation(segment):
+    """
+    EXIF orientation from an APP1 segment payload
+
+    Returns:
+        int: Orientation 1-8 (1 if absent or unreadable)
+    """
+    if not segment.startswith(b'Exif\x00\x00') or len(segment) < 14:
+        return 1
+
+    tiff = segment[6:]
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return 1
+
+    try:
+        ifd_offset = struct.unpack(f'{endian}I', tiff[4:8])[0]
+        entries = struct.unpack(f'{endian}H', tiff[ifd_offset:ifd_offset + 2])[0]
+        for index in range(entries):
+            entry = ifd_offset + 2 + index * 12
+            tag, _, _, value = struct.unpack(f'{endian}HHIH', tiff[entry:entry + 10])
+            if tag == 0x0112:
+                return value if 1 <= value <= 8 else 1
+    except struct.error:
+        pass
+    return 1
+
+
+def _probe_png(stream):
+    # Signature already consumed; IHDR must come first
+    length, chunk_type = struct.unpack('>I4s', _read_exact(stream, 8))
+    if chunk_type != b'IHDR' or length < 13:
+        raise ImageProbeError("PNG without IHDR header")
+
+    width, height, _, color_type = struct.unpack('>IIBB', _read_exact(stream, 10))
+    if color_type not in PNG_CHANNELS:
+        raise ImageProbeError("Unsupported PNG color type")
+
+    return ImageHeader('png', width, height, PNG_CHANNELS[color_type], 1)
+
+
+def _probe_jpeg(stream):
+    # SOI already consumed; walk marker segments until a frame header
+    orientation = 1
+    consumed = 2
+
+    # Seeking past the end does not fail, so skipped segments are checked against the size
+    position = stream.tell()
+    end = stream.seek(0, 2)
+    stream.seek(position)
+
+    while consumed < MAX_JPEG_HEADER_BYTES:
+        byte = _read_exact(stream, 1)
+        consumed += 1
+        if byte != b'\xff':
+            continue
+
+        marker = _read_exact(stream, 1)[0]
+        consumed += 1
+        # Fill bytes
+        while marker == 0xFF:
+            marker = _read_exact(stream, 1)[0]
+            consumed += 1
+
+        if marker in JPEG_STANDALONE_MARKERS or marker == 0x00:
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image / start of scan before any frame header
+            break
+
+        # The length counts its own two bytes
+        length = struct.unpack('>H', _read_exact(stream, 2))[0]
+        consumed += 2
+        if length < 2:
+            raise ImageProbeError("Corrupt JPEG segment")
+
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width, channels = struct.unpack('>BHHB', _read_exact(stream, 6))
+            return ImageHeader('jpeg', width, height, channels, orientation)
+
+        if marker == 0xE1:
+            segment = _read_exact(stream, length - 2)
+            if orientation == 1:
+                orientation = _exif_orientation(segment)
+        elif stream.seek(length - 2, 1) > end:
+            raise ImageProbeError("Truncated image header")
+        consumed += length - 2
+
+    raise ImageProbeError("JPEG without frame header")
+
+
+def probe_image(stream):
+    """
+    Read format, dimensions, channels and EXIF orientation from an image header
+
+    Only the first bytes of the stream are read (plus any EXIF segment); no
+    pixels are decoded. The stream position is restored afterwards.
+
+    Args:
+        stream: Seekable binary file object (e.g. an upload's stream)
+
+    Returns:
+        ImageHeader: format ('jpeg' or 'png'), width, height, channels, orientation
+
+    Raises:
+        ImageProbeError: If the header is not a readable JPEG or PNG header
+    """
+    start = stream.tell()
+    try:
+        signature = stream.read(8)
+        if signature.startswith(b'\xff\xd8'):
+            stream.seek(start + 2)
+            header = _probe_jpeg(stream)
+        elif signature == PNG_SIGNATURE:
+            header = _probe_png(stream)
+        else:
+            raise ImageProbeError("Unrecognized image format")
+    finally:
+        stream.seek(start)
+
+    if header.width == 0 or header.height == 0:
+        raise ImageProbeError("Image has no pixels")
+    return header
+
+
+def probe_file(path):
+    """
+    Probe an image file's header
+
+    Args:
+        path: Path to image file
+
+    Returns:
+        ImageHeader: See probe_image()
+    """
+    with open(path, 'rb') as f:
+        return probe_image(f)
+
+
+def oriented_size(header):
+    """
+    Width and height after applying EXIF orientation
+
+    Args:
+        header: ImageHeader
+
+    Returns:
+        tuple: (width, height) as displayed
+    """
+    if header.orientation in (5, 6, 7, 8):
+        return header.height, header.width
+    return header.width, header.height
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def _pick(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class RollingWindow:
+    """Keep the most recent observations of a value for percentile queries"""
+
+    def __init__(self, size=512):
+        """
+        Args:
+            size: Number of recent observations to keep
+        """
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        """
+        Record an observation
+
+        Args:
+            value: Observed value
+        """
+        with self._lock:
+            self._values.append(value)
+            self.count += 1
+            self.total += value
+
+    def percentile(self, pct):
+        """
+        Percentile over the recent observations
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            float: Percentile value (0.0 if there are no observations)
+        """
+        with self._lock:
+            values = sorted(self._values)
+
+        return _pick(values, pct)
+
+    def summary(self):
+        """
+        Summarize the window
+
+        Returns:
+            dict: count, mean and p50/p95/p99 of recent observations
+        """
+        with self._lock:
+            values = sorted(self._values)
+            count = self.count
+            total = self.total
+
+        return {
+            "count": count,
+            "mean": round(total / count, 3) if count else 0.0,
+            "p50": round(_pick(values, 50), 3),
+            "p95": round(_pick(values, 95), 3),
+            "p99": round(_pick(values, 99), 3)
+        }
+
+
+class Metrics:
+    """Process-local registry of counters, gauges and latency windows"""
+
+    def __init__(self, window_size=512):
+        """
+        Args:
+            window_size: Observations kept per latency window
+        """
+        self.window_size = window_size
+        self._counters = {}
+        self._gauges = {}
+        self._windows = {}
+        self._slos = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def window(self, name):
+        """
+        Get (or create) the latency window for a name
+
+        Args:
+            name: Metric name, e.g. "stage.pose_ms"
+
+        Returns:
+            RollingWindow: Window for the metric
+        """
+        with self._lock:
+            window = self._windows.get(name)
+            if window is None:
+                window = RollingWindow(self.window_size)
+                self._windows[name] = window
+            return window
+
+    def observe(self, name, value):
+        """Record an observation in a latency window"""
+        self.window(name).add(value)
+
+    def observe_slo(self, name, value_ms, target_ms, ok=True):
+        """
+        Record a latency against its service-level objective
+
+        The latency goes into the "slo.<name>_ms" window and the observation is
+        counted as within or over the target. Failed operations always count
+        as breaches.
+
+        Args:
+            name: SLO name, e.g. "vision_only"
+            value_ms: Observed latency in milliseconds
+            target_ms: Latency objective in milliseconds
+            ok: False if the operation failed
+        """
+        self.observe(f"slo.{name}_ms", value_ms)
+        with self._lock:
+            slo = self._slos.get(name)
+            if slo is None:
+                slo = {'target_ms': target_ms, 'within': 0, 'breached': 0}
+                self._slos[name] = slo
+            slo['target_ms'] = target_ms
+            slo['within' if ok and value_ms <= target_ms else 'breached'] += 1
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Time a block and record its duration in milliseconds
+
+        Args:
+            name: Metric name to record under
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000.0)
+
+    def snapshot(self):
+        """
+        Get a JSON-serializable view of all metrics
+
+        Returns:
+            dict: counters, gauges, histogram summaries and SLO attainment
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            windows = dict(self._windows)
+            slos = {name: dict(slo) for name, slo in self._slos.items()}
+
+        for name, slo in slos.items():
+            total = slo['within'] + slo['breached']
+            slo['attainment'] = round(slo['within'] / total, 4) if total else None
+            slo['latency'] = windows[f"slo.{name}_ms"].summary()
+
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": {name: window.summary() for name, window in windows.items()},
+            "slos": slos
+        }
+
+
+# Shared registry for the process
+metrics = Metrics()
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+# dHash grid: 9x8 pixels give 8 horizontal gradients per row, 64 bits in all
+DHASH_WIDTH = 9
+DHASH_HEIGHT = 8
+
+# Color thumbnail used to confirm a hash match
+THUMBNAIL_SIZE = 16
+
+
+def dhash(rgb_image):
+    """
+    64-bit difference hash of an image
+
+    Each bit says whether a pixel of the 9x8 grayscale thumbnail is brighter
+    than its right neighbour. Re-compression, resizing, small crops and light
+    edits flip only a few bits, so near-duplicates are a small Hamming
+    distance apart.
+
+    Args:
+        rgb_image: Image in RGB format (any size; a small pyramid level is enough)
+
+    Returns:
+        int: Hash in the range [0, 2**64)
+    """
+    gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+    thumb = cv2.resize(gray, (DHASH_WIDTH, DHASH_HEIGHT), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    """
+    Number of differing bits between two hashes
+
+    Args:
+        a: Hash
+        b: Hash
+
+    Returns:
+        int: Hamming distance
+    """
+    return bin(a ^ b).count('1')
+
+
+def color_thumbnail(rgb_image):
+    """
+    Small color thumbnail of an image
+
+    dHash only sees grayscale gradients, so two photos with the same layout
+    (one studio, one pose) can hash alike; their colors still tell them apart.
+
+    Args:
+        rgb_image: Image in RGB format (a small pyramid level is enough)
+
+    Returns:
+        numpy.ndarray: THUMBNAIL_SIZE x THUMBNAIL_SIZE x 3 uint8 image
+    """
+    return cv2.resize(rgb_image, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def thumbnail_distance(a, b):
+    """
+    Mean absolute per-channel difference of two color thumbnails
+
+    Args:
+        a: Thumbnail from color_thumbnail()
+        b: Thumbnail from color_thumbnail()
+
+    Returns:
+        float: Difference in 0..255
+    """
+    return float(np.mean(np.abs(a.astype(np.int16) - b.astype(np.int16))))
@@ -0,0 +1,145 @@
+import re
+
+# Keywords only checked locally; Gemini's response schema does not accept them
+LOCAL_KEYWORDS = ('max_length', 'pattern')
+
+_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'integer': int,
+    'number': (int, float),
+    'boolean': bool
+}
+
+
+class SchemaError(ValueError):
+    """Raised when a value does not match its schema"""
+
+
+def compile_schema(schema):
+    """
+    Compile a response schema into a validation function
+
+    Schemas use the dict form of Gemini's response schema (type, properties,
+    required, items, min_items, max_items, enum) plus the local keywords
+    max_length and pattern. The schema is walked once; the returned function
+    only runs the checks it needs, so compile at startup and reuse it.
+
+    Limits the model may not have kept are repaired rather than rejected:
+    strings over max_length are cut, lists over max_items are trimmed, list
+    items that do not match (e.g. a color failing its pattern) are dropped,
+    and a list short of min_items is kept as long as it is not empty. Wrong
+    types, missing required fields, values outside an enum and empty lists
+    are errors.
+
+    Args:
+        schema: Schema dict
+
+    Returns:
+        callable: validate(value) -> (repaired value, list of repair notes);
+            raises SchemaError on the first mismatch it cannot repair
+    """
+    check = _compile(schema)
+
+    def validate(value):
+        repairs = []
+        return check(value, '$', repairs), repairs
+
+    return validate
+
+
+def response_schema(schema):
+    """
+    Copy of a schema without the local-only keywords, for the Gemini API
+
+    Args:
+        schema: Schema dict
+
+    Returns:
+        dict: Schema Gemini accepts as response_schema
+    """
+    result = {key: value for key, value in schema.items() if key not in LOCAL_KEYWORDS}
+    if 'properties' in result:
+        result['properties'] = {name: response_schema(sub) for name, sub in result['properties'].items()}
+    if 'items' in result:
+        result['items'] = response_schema(result['items'])
+    return result
+
+
+def _compile(schema):
+    """Build the check(value, path, repairs) function of one schema node; it returns the repaired value"""
+    kind = schema['type']
+    expected = _TYPES[kind]
+    checks = []
+
+    if kind == 'object':
+        required = tuple(schema.get('required', ()))
+        properties = [(name, _compile(sub)) for name, sub in schema.get('properties', {}).items()]
+
+        def check_object(value, path, repairs):
+            for name in required:
+                if name not in value:
+                    raise SchemaError(f"{path}: missing '{name}'")
+            value = dict(value)
+            for name, check in properties:
+                if name in value:
+                    value[name] = check(value[name], f"{path}.{name}", repairs)
+            return value
+        checks.append(check_object)
+
+    elif kind == 'array':
+        min_items = schema.get('min_items', 0)
+        max_items = schema.get('max_items')
+        item_check = _compile(schema['items']) if 'items' in schema else None
+
+        def check_array(value, path, repairs):
+            if item_check is not None:
+                items = []
+                for index, item in enumerate(value):
+                    try:
+                        items.append(item_check(item, f"{path}[{index}]", repairs))
+                    except SchemaError as e:
+                        repairs.append(f"dropped {e}")
+                value = items
+            if max_items is not None and len(value) > max_items:
+                repairs.append(f"{path}: trimmed {len(value)} items to {max_items}")
+                value = value[:max_items]
+            if min_items and not value:
+                raise SchemaError(f"{path}: no usable items, expected at least {min_items}")
+            if len(value) < min_items:
+                repairs.append(f"{path}: {len(value)} items, expected at least {min_items}")
+            return value
+        checks.append(check_array)
+
+    elif kind == 'string':
+        max_length = schema.get('max_length')
+        pattern = re.compile(schema['pattern']) if 'pattern' in schema else None
+
+        def check_string(value, path, repairs):
+            if pattern is not None and not pattern.match(value):
+                raise SchemaError(f"{path}: {value!r} does not match {pattern.pattern}")
+            if max_length is not None and len(value) > max_length:
+                repairs.append(f"{path}: cut {len(value)} characters to {max_length}")
+                value = value[:max_length].rstrip()
+            return value
+        checks.append(check_string)
+
+    if 'enum' in schema:
+        allowed = frozenset(schema['enum'])
+
+        def check_enum(value, path, repairs):
+            if value not in allowed:
+                raise SchemaError(f"{path}: {value!r} is not one of {sorted(allowed)}")
+            return value
+        checks.append(check_enum)
+
+    def check(value, path, repairs):
+        # bool is an int subclass; only accept it where booleans are expected
+        if not isinstance(value, expected) or (isinstance(value, bool) and kind != 'boolean'):
+            raise SchemaError(f"{path}: expected {kind}, got {type(value).__name__}")
+        for extra in checks:
+            value = extra(value, path, repairs)
+        return value
+
+    return check
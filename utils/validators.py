@@ -1,6 +1,14 @@
 import os
+import re
+import json
 from werkzeug.utils import secure_filename
 from config import Config
+from .image_probe import probe_image, ImageProbeError
+
+HEX_COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+# Longest lookbook variant id; Gemini echoes it back as scenario_id
+MAX_VARIANT_ID_LENGTH = 80
 
 def allowed_file(filename):
     """
@@ -32,6 +40,120 @@ def validate_file_size(file):
     
     return size <= Config.MAX_FILE_SIZE
 
+def validate_image_header(file):
+    """
+    Check an upload's image header before anything decodes it
+    
+    Reads only the header (format, dimensions, channels, orientation), so
+    crafted or huge images are rejected before cv2.imread allocates the frame.
+    
+    Args:
+        file: FileStorage object
+    
+    Returns:
+        tuple: (ImageHeader, None) if acceptable, or (None, error message)
+    """
+    try:
+        header = probe_image(file.stream)
+    except ImageProbeError as e:
+        return None, f'Invalid image: {str(e)}'
+    
+    if header.width * header.height > Config.MAX_IMAGE_PIXELS:
+        return None, (
+            f'Image dimensions too large ({header.width}x{header.height}). '
+            f'Maximum: {Config.MAX_IMAGE_PIXELS // 1_000_000} megapixels'
+        )
+    
+    return header, None
+
+def parse_lookbook_variants(raw):
+    """
+    Parse the personalization variants of a lookbook request
+    
+    Args:
+        raw: JSON list (or its string form) of objects with optional id, mood,
+            occasion, weather and budget
+    
+    Returns:
+        tuple: ({variant id: personalization}, None) if valid, or (None, error message)
+    """
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return None, 'variants must be a JSON list'
+    
+    if not isinstance(raw, list) or not raw:
+        return None, 'variants must be a non-empty JSON list'
+    if len(raw) > Config.LOOKBOOK_MAX_VARIANTS:
+        return None, f'Too many variants. Maximum: {Config.LOOKBOOK_MAX_VARIANTS}'
+    
+    variants = {}
+    for index, item in enumerate(raw):
+        if not isinstance(item, dict):
+            return None, 'Each variant must be a JSON object'
+        
+        variant_id = str(item.get('id') or f'variant_{index + 1}')
+        if len(variant_id) > MAX_VARIANT_ID_LENGTH:
+            return None, f'Variant id too long. Maximum: {MAX_VARIANT_ID_LENGTH} characters'
+        if variant_id in variants:
+            return None, f'Duplicate variant id: {variant_id}'
+        
+        # Same fields as /personalize, without empty values
+        variants[variant_id] = {
+            key: str(item[key]) for key in ('mood', 'occasion', 'weather', 'budget') if item.get(key)
+        }
+    
+    return variants, None
+
+def parse_catalog_query(payload):
+    """
+    Parse a catalog color match request
+    
+    Args:
+        payload: JSON object with either colors (list of '#rrggbb') or
+            analysis_id (with optional source: 'recommended' or 'dominant'),
+            and optional k, category, min_price and max_price
+    
+    Returns:
+        tuple: (query dict, None) if valid, or (None, error message)
+    """
+    if not isinstance(payload, dict):
+        return None, 'Request body must be a JSON object'
+    
+    query = {'filters': {}}
+    colors = payload.get('colors')
+    if colors is not None:
+        if not isinstance(colors, list) or not colors:
+            return None, 'colors must be a non-empty JSON list'
+        if len(colors) > Config.CATALOG_MAX_COLORS:
+            return None, f'Too many colors. Maximum: {Config.CATALOG_MAX_COLORS}'
+        if not all(isinstance(color, str) and HEX_COLOR.match(color) for color in colors):
+            return None, "colors must be '#rrggbb' strings"
+        query['colors'] = [color.lower() for color in colors]
+    elif payload.get('analysis_id'):
+        query['analysis_id'] = str(payload['analysis_id'])
+        query['source'] = payload.get('source') or 'recommended'
+        if query['source'] not in ('recommended', 'dominant'):
+            return None, "source must be 'recommended' or 'dominant'"
+    else:
+        return None, 'colors or analysis_id is required'
+    
+    try:
+        query['k'] = int(payload['k'] if payload.get('k') is not None else Config.CATALOG_MATCHES_PER_COLOR)
+        for key in ('min_price', 'max_price'):
+            if payload.get(key) is not None:
+                query['filters'][key] = float(payload[key])
+    except (TypeError, ValueError):
+        return None, 'k, min_price and max_price must be numbers'
+    if not 1 <= query['k'] <= Config.CATALOG_MAX_MATCHES:
+        return None, f'k must be between 1 and {Config.CATALOG_MAX_MATCHES}'
+    
+    if payload.get('category'):
+        query['filters']['category'] = str(payload['category'])
+    
+    return query, None
+
 def sanitize_filename(filename):
     """
     Create a safe filename
@@ -40,12 +162,14 @@ def sanitize_filename(filename):
         filename: Original filename
     
     Returns:
-        str: Sanitized filename with timestamp
+        str: Sanitized filename with timestamp and a random suffix
     """
     from datetime import datetime
+    from uuid import uuid4
     
     secure_name = secure_filename(filename)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     name, ext = os.path.splitext(secure_name)
     
-    return f"{name}_{timestamp}{ext}"
+    # Concurrent uploads of the same name within a second must not collide
+    return f"{name}_{timestamp}_{uuid4().hex[:8]}{ext}"
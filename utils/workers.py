@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+def process_rss_bytes():
+    """
+    Resident set size of the current process
+
+    Returns:
+        int: RSS in bytes (peak RSS where /proc is unavailable)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def plan_workers(cpu_count, cpu_ms=None, wall_ms=None, max_threads=32):
+    """
+    Size a prefork server from CPU count and per-request CPU time
+
+    One worker process per core keeps every core busy without GIL contention.
+    Each worker then needs enough threads to cover the time its requests spend
+    waiting (mostly on the LLM): wall time / CPU time threads keep one core
+    saturated.
+
+    Args:
+        cpu_count: Cores available to the server
+        cpu_ms: Mean CPU milliseconds per request
+        wall_ms: Mean wall-clock milliseconds per request
+        max_threads: Upper bound on threads per worker
+
+    Returns:
+        dict: workers, threads and the estimated CPU-bound capacity in req/s
+    """
+    cpu_count = max(1, cpu_count)
+
+    if not cpu_ms or not wall_ms:
+        # No measurements: the usual prefork rule of thumb
+        return {'workers': 2 * cpu_count + 1, 'threads': 4, 'capacity_rps': None}
+
+    threads = min(max_threads, max(1, math.ceil(wall_ms / cpu_ms)))
+    return {
+        'workers': cpu_count,
+        'threads': threads,
+        'capacity_rps': round(cpu_count * 1000.0 / cpu_ms, 1)
+    }
+
+
+class WorkerStats:
+    """Request rate and memory of one server process, shared through a directory
+
+    Each worker writes its own small JSON file; any worker can then report the
+    whole server by reading the directory.
+    """
+
+    # Seconds after which a worker file is considered stale
+    MAX_AGE = 30
+
+    def __init__(self, stats_dir=None, window_seconds=60, publish_interval=1.0):
+        """
+        Args:
+            stats_dir: Directory shared by all workers (None keeps stats local)
+            window_seconds: Window for the requests/sec rate
+            publish_interval: Minimum seconds between file writes
+        """
+        self.stats_dir = stats_dir
+        self.window_seconds = window_seconds
+        self.publish_interval = publish_interval
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start counting from zero (called in each worker after fork)"""
+        with self._lock:
+            self.pid = os.getpid()
+            self.started = time.time()
+            self.requests_total = 0
+            self._recent = deque()
+            self._last_publish = 0.0
+
+    def record_request(self):
+        """Count a finished request and publish if due"""
+        now = time.time()
+        with self._lock:
+            self.requests_total += 1
+            self._recent.append(now)
+            due = now - self._last_publish >= self.publish_interval
+            if due:
+                self._last_publish = now
+
+        if due:
+            self.publish()
+
+    def requests_per_sec(self):
+        """Requests per second over the recent window"""
+        now = time.time()
+        with self._lock:
+            while self._recent and now - self._recent[0] > self.window_seconds:
+                self._recent.popleft()
+            count = len(self._recent)
+
+        span = min(self.window_seconds, max(1.0, now - self.started))
+        return count / span
+
+    def local(self):
+        """
+        Stats of the current process
+
+        Returns:
+            dict: pid, rss_bytes, requests_total, requests_per_sec, updated
+        """
+        return {
+            'pid': self.pid,
+            'rss_bytes': process_rss_bytes(),
+            'requests_total': self.requests_total,
+            'requests_per_sec': round(self.requests_per_sec(), 3),
+            'updated': round(time.time(), 3)
+        }
+
+    def _path(self, pid):
+        return os.path.join(self.stats_dir, f"worker-{pid}.json")
+
+    def publish(self):
+        """Write this process's stats to the shared directory"""
+        if not self.stats_dir:
+            return
+
+        os.makedirs(self.stats_dir, exist_ok=True)
+        path = self._path(self.pid)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.local(), f)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """
+        Stats of every live worker
+
+        Returns:
+            list: One dict per worker, this process always included and fresh
+        """
+        workers = {self.pid: self.local()}
+        if not self.stats_dir or not os.path.isdir(self.stats_dir):
+            return list(workers.values())
+
+        now = time.time()
+        for name in os.listdir(self.stats_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.stats_dir, name)) as f:
+                    stats = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            if stats.get('pid') in workers or now - stats.get('updated', 0) > self.MAX_AGE:
+                continue
+            workers[stats['pid']] = stats
+
+        return sorted(workers.values(), key=lambda stats: stats['pid'])
+
+    def remove(self, pid=None):
+        """Delete a worker's file (e.g. when the master reaps it)"""
+        if not self.stats_dir:
+            return
+        try:
+            os.remove(self._path(pid or self.pid))
+        except FileNotFoundError:
+            pass